@@ -0,0 +1,323 @@
+"""
+Benchmark of the sampler overhead per trial across the registry.
+
+Every sampler under ``package/samplers`` is run against cheap analytic problems so that the
+elapsed time of each trial is dominated by the sampler itself. Each study is stored in SQLite
+files under the output directory, which can be passed to ``visualization/plot_sampling_speed``
+as they are, and the per-trial sampler time measured by ``samplers/profiled_sampler`` is
+written to ``latency.json``.
+
+Run it from the root of the registry:
+
+$ python benchmarks/sampler_overhead.py --samplers differential_evolution pso --problems knapsack
+
+To run this benchmark, you need to install the following packages:
+
+optproblems
+diversipy
+matplotlib
+scipy
+
+Samplers whose dependencies are not installed, which require constructor arguments, or which
+do not support a problem, e.g., single-objective samplers on multi-objective problems, are
+reported and skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from collections.abc import Callable
+import inspect
+import json
+import os
+import time
+import traceback
+from typing import Any
+
+import numpy as np
+import optuna
+from optuna.samplers import BaseSampler
+import optunahub
+
+
+REGISTRY_ROOT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "package"
+)
+# Wrappers that require other samplers as arguments are not benchmarked by themselves.
+EXCLUDED_SAMPLERS = ("ensembled", "profiled_sampler")
+STORAGE_MODES = ("inmemory", "sqlite")
+
+
+def _load(package: str) -> Any:
+    return optunahub.load_local_module(package=package, registry_root=REGISTRY_ROOT)
+
+
+PROBLEMS: dict[str, Callable[[], Any]] = {
+    "dtlz2": lambda: _load("benchmarks/dtlz").Problem(function_id=2, n_objectives=2, dimension=5),
+    "zdt1": lambda: _load("benchmarks/zdt").Problem(function_id=1),
+    "wfg4": lambda: _load("benchmarks/wfg").Problem(
+        function_id=4, n_objectives=2, dimension=6, k=2
+    ),
+    "knapsack": lambda: _load("benchmarks/multidimensional_knapsack").Problem(
+        n_items=20, n_dimensions=2, seed=0
+    ),
+}
+
+
+def discover_samplers(names: list[str] | None = None) -> dict[str, type[BaseSampler]]:
+    """Collect the sampler classes exported by the packages under ``package/samplers``.
+
+    Args:
+        names:
+            Package names to load, e.g., ``["differential_evolution"]``. If :obj:`None`, all the
+            packages with ``__init__.py`` are loaded.
+
+    Returns:
+        A dictionary mapping ``"{package}.{class}"`` to the sampler class.
+    """
+    samplers_dir = os.path.join(REGISTRY_ROOT, "samplers")
+    if names is None:
+        names = sorted(
+            name
+            for name in os.listdir(samplers_dir)
+            if os.path.isfile(os.path.join(samplers_dir, name, "__init__.py"))
+            and name not in EXCLUDED_SAMPLERS
+        )
+
+    sampler_classes: dict[str, type[BaseSampler]] = {}
+    for name in names:
+        try:
+            module = _load(f"samplers/{name}")
+        except Exception as e:
+            print(f"[skip] {name}: failed to load ({type(e).__name__}: {e})")
+            continue
+        for attr in getattr(module, "__all__", dir(module)):
+            obj = getattr(module, attr, None)
+            if (
+                isinstance(obj, type)
+                and issubclass(obj, BaseSampler)
+                and not inspect.isabstract(obj)
+                # Samplers imported from Optuna or other packages are not benchmarked.
+                and (obj.__module__ + ".").startswith(module.__name__ + ".")
+            ):
+                sampler_classes[f"{name}.{attr}"] = obj
+    return sampler_classes
+
+
+def _create_sampler(sampler_class: type[BaseSampler], seed: int) -> BaseSampler:
+    try:
+        return sampler_class(seed=seed)  # type: ignore[call-arg]
+    except TypeError:
+        return sampler_class()
+
+
+def _sampler_time_per_trial(records: list[Any], n_trials: int) -> list[float]:
+    sampler_time = np.zeros(n_trials)
+    for record in records:
+        if record.trial_number < n_trials:
+            sampler_time[record.trial_number] += record.elapsed_time
+    return sampler_time.tolist()
+
+
+def run_study(
+    sampler_name: str,
+    sampler_class: type[BaseSampler],
+    problem_name: str,
+    problem: Any,
+    storage_mode: str,
+    n_trials: int,
+    seed: int,
+    timeout: float | None,
+    output_dir: str,
+) -> dict[str, Any] | None:
+    """Run one study and store it in ``{output_dir}/{storage_mode}.db``.
+
+    Returns:
+        The per-trial sampler time and the metadata of the study, or :obj:`None` if the sampler
+        failed on the problem.
+    """
+    study_name = f"{sampler_name}/{problem_name}/{storage_mode}/{seed}"
+    result_storage = f"sqlite:///{os.path.join(output_dir, f'{storage_mode}.db')}"
+    storage: str | optuna.storages.BaseStorage = (
+        optuna.storages.InMemoryStorage() if storage_mode == "inmemory" else result_storage
+    )
+    if storage_mode == "sqlite" and study_name in optuna.get_all_study_names(result_storage):
+        optuna.delete_study(study_name=study_name, storage=result_storage)
+
+    try:
+        inner_sampler = _create_sampler(sampler_class, seed)
+    except Exception as e:
+        print(f"[skip] {study_name}: failed to create the sampler ({type(e).__name__}: {e})")
+        return None
+
+    ProfiledSampler = _load("samplers/profiled_sampler").ProfiledSampler
+    sampler = ProfiledSampler(
+        inner_sampler, buffer_size=n_trials * (len(problem.search_space) + 2)
+    )
+    study = optuna.create_study(
+        study_name=study_name, storage=storage, sampler=sampler, directions=problem.directions
+    )
+    for key, value in dict(
+        sampler=sampler_name, problem=problem_name, storage=storage_mode
+    ).items():
+        study.set_user_attr(key, value)
+
+    search_space = problem.search_space
+
+    def objective(trial: optuna.Trial) -> float | list[float]:
+        # NOTE: Constraints are not evaluated because only the sampler overhead matters here.
+        return problem.evaluate(
+            {name: trial._suggest(name, d) for name, d in search_space.items()}
+        )
+
+    start = time.perf_counter()
+    try:
+        study.optimize(objective, n_trials=n_trials, timeout=timeout)
+    except Exception as e:
+        print(f"[skip] {study_name}: {type(e).__name__}: {e}")
+        if os.environ.get("SAMPLER_OVERHEAD_DEBUG"):
+            traceback.print_exc()
+        if storage_mode == "sqlite":
+            optuna.delete_study(study_name=study_name, storage=result_storage)
+        return None
+    elapsed_time = time.perf_counter() - start
+
+    if storage_mode == "inmemory":
+        if study_name in optuna.get_all_study_names(result_storage):
+            optuna.delete_study(study_name=study_name, storage=result_storage)
+        optuna.copy_study(
+            from_study_name=study_name, from_storage=storage, to_storage=result_storage
+        )
+
+    n_finished = len(study.trials)
+    print(f"[done] {study_name}: {n_finished} trials in {elapsed_time:.1f} s")
+    return dict(
+        sampler=sampler_name,
+        problem=problem_name,
+        storage=storage_mode,
+        seed=seed,
+        sampler_time=_sampler_time_per_trial(sampler.records, n_finished),
+    )
+
+
+def load_studies(output_dir: str, problem_name: str) -> dict[str, list[optuna.Study]]:
+    """Load the benchmarked studies in the input format of ``plot_sampling_speed``.
+
+    Args:
+        output_dir:
+            The output directory of the benchmark.
+        problem_name:
+            The name of the problem to load.
+
+    Returns:
+        A dictionary mapping ``"{sampler} ({storage})"`` to the studies of all seeds.
+    """
+    studies: dict[str, list[optuna.Study]] = defaultdict(list)
+    for storage_mode in STORAGE_MODES:
+        path = os.path.join(output_dir, f"{storage_mode}.db")
+        if not os.path.exists(path):
+            continue
+        storage = f"sqlite:///{path}"
+        for summary in optuna.get_all_study_summaries(storage, include_best_trial=False):
+            attrs = summary.user_attrs
+            if attrs.get("problem") != problem_name or summary.n_trials < 2:
+                continue
+            label = f"{attrs['sampler']} ({attrs['storage']})"
+            studies[label].append(
+                optuna.load_study(study_name=summary.study_name, storage=storage)
+            )
+    return dict(studies)
+
+
+def summarize(results: list[dict[str, Any]], checkpoints: list[int]) -> None:
+    """Print the mean sampler time per trial around each checkpoint."""
+    header = "".join(f"{f'@{c} [ms]':>14}" for c in checkpoints)
+    print(f"\n{'sampler':<55}{'problem':>10}{'storage':>10}{header}")
+    grouped: dict[tuple[str, str, str], list[list[float]]] = defaultdict(list)
+    for r in results:
+        grouped[(r["sampler"], r["problem"], r["storage"])].append(r["sampler_time"])
+    for (sampler_name, problem_name, storage_mode), curves in grouped.items():
+        row = ""
+        for checkpoint in checkpoints:
+            # The mean over the last 10% of trials before the checkpoint.
+            start = checkpoint - max(1, checkpoint // 10)
+            values = [v for c in curves if len(c) >= checkpoint for v in c[start:checkpoint]]
+            row += f"{np.mean(values) * 1e3:>14.3f}" if len(values) > 0 else f"{'-':>14}"
+        print(f"{sampler_name:<55}{problem_name:>10}{storage_mode:>10}{row}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--samplers", nargs="*", default=None, help="Package names to run.")
+    parser.add_argument("--problems", nargs="*", default=list(PROBLEMS), choices=list(PROBLEMS))
+    parser.add_argument(
+        "--storages", nargs="*", default=list(STORAGE_MODES), choices=STORAGE_MODES
+    )
+    parser.add_argument(
+        "--n-trials",
+        nargs="*",
+        type=int,
+        default=[100, 1000, 10000],
+        help="Checkpoints of the number of trials. Each study runs until the largest one.",
+    )
+    parser.add_argument("--n-seeds", type=int, default=1)
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="Timeout of each study in seconds."
+    )
+    parser.add_argument("--output-dir", default="sampler_overhead_results")
+    parser.add_argument(
+        "--plot", action="store_true", help="Save plot_sampling_speed figures per problem."
+    )
+    args = parser.parse_args()
+
+    optuna.logging.set_verbosity(optuna.logging.ERROR)
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoints = sorted(args.n_trials)
+    sampler_classes = discover_samplers(args.samplers)
+
+    results = []
+    for problem_name in args.problems:
+        try:
+            problem = PROBLEMS[problem_name]()
+        except Exception as e:
+            print(f"[skip] {problem_name}: failed to load ({type(e).__name__}: {e})")
+            continue
+        for sampler_name, sampler_class in sampler_classes.items():
+            for storage_mode in args.storages:
+                for seed in range(args.n_seeds):
+                    result = run_study(
+                        sampler_name,
+                        sampler_class,
+                        problem_name,
+                        problem,
+                        storage_mode,
+                        checkpoints[-1],
+                        seed,
+                        args.timeout,
+                        args.output_dir,
+                    )
+                    if result is not None:
+                        results.append(result)
+
+    with open(os.path.join(args.output_dir, "latency.json"), "w") as f:
+        json.dump(results, f)
+    summarize(results, checkpoints)
+
+    if args.plot:
+        import matplotlib.pyplot as plt
+
+        plot_sampling_speed = _load("visualization/plot_sampling_speed").plot_sampling_speed
+        for problem_name in args.problems:
+            studies = load_studies(args.output_dir, problem_name)
+            if len(studies) == 0:
+                continue
+            _, ax = plt.subplots(figsize=(8, 6))
+            plot_sampling_speed(studies, ax=ax)
+            ax.set_title(f"Elapsed Time at Each Trial on {problem_name}")
+            plt.savefig(os.path.join(args.output_dir, f"{problem_name}.png"), bbox_inches="tight")
+            plt.close()
+
+
+if __name__ == "__main__":
+    main()
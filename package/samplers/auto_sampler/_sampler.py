@@ -1,11 +1,16 @@
 from __future__ import annotations
 
+from collections import deque
 from collections.abc import Callable
+from collections.abc import Container
+from collections.abc import Iterable
 from collections.abc import Sequence
 import threading
 from typing import Any
+from typing import cast
 from typing import TYPE_CHECKING
 
+import numpy as np
 from optuna.distributions import CategoricalDistribution
 from optuna.logging import get_logger
 from optuna.samplers import BaseSampler
@@ -15,14 +20,17 @@ from optuna.samplers import NSGAIIISampler
 from optuna.samplers import NSGAIISampler
 from optuna.samplers import RandomSampler
 from optuna.samplers import TPESampler
+from optuna.samplers._base import _CONSTRAINTS_KEY
 from optuna.samplers._base import _process_constraints_after_trial
 from optuna.samplers._lazy_random_state import LazyRandomState
-from optuna.search_space import IntersectionSearchSpace
+from optuna.study import StudyDirection
+from optuna.trial import create_trial
 from optuna.trial import TrialState
 
 
 if TYPE_CHECKING:
     from optuna.distributions import BaseDistribution
+    from optuna.storages import BaseStorage
     from optuna.study import Study
     from optuna.trial import FrozenTrial
 
@@ -53,6 +61,187 @@ class ThreadLocalSampler(threading.local):
     sampler: BaseSampler | None = None
 
 
+class _SearchSpaceTracker:
+    """Incrementally track the search space of finished trials for the sampler selection.
+
+    Only the trials finished since the last update are visited, so the selection costs
+    O(the number of new trials) per trial instead of O(the number of all trials).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, study: Study | None) -> None:
+        self._storage = None if study is None else study._storage
+        self._study_id = None if study is None else study._study_id
+        # Every trial before the cursor has been finished and processed. The trials after the
+        # cursor which finished before a running trial are kept in _processed_numbers.
+        self._cursor = 0
+        self._processed_numbers: set[int] = set()
+        self._param_names: set[str] | None = None
+        self._intersection: dict[str, BaseDistribution] | None = None
+        self.include_conditional_param = False
+        self.n_complete_trials = 0
+
+    def __getstate__(self) -> dict[Any, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[Any, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def search_space(self) -> dict[str, BaseDistribution]:
+        """The intersection search space of the complete trials sorted by parameter names."""
+        return dict(sorted((self._intersection or {}).items()))
+
+    def update(self, study: Study) -> None:
+        with self._lock:
+            if self._study_id != study._study_id or self._storage is not study._storage:
+                self._reset(study)
+
+            # NOTE: The trials are fetched from the storage without the state filter or the copy
+            # made by Study._get_trials, and only those after the cursor are visited.
+            trials = study._storage.get_all_trials(study._study_id, deepcopy=False)
+            next_cursor = len(trials)
+            for trial in trials[self._cursor :]:
+                if not trial.state.is_finished():
+                    next_cursor = min(next_cursor, trial.number)
+                    continue
+                if trial.number in self._processed_numbers:
+                    continue
+                self._processed_numbers.add(trial.number)
+                if trial.state not in (TrialState.COMPLETE, TrialState.PRUNED):
+                    continue
+
+                # The search space includes conditional parameters if the parameter names of any
+                # two complete or pruned trials differ.
+                if self._param_names is None:
+                    self._param_names = set(trial.params)
+                elif not self.include_conditional_param:
+                    self.include_conditional_param = self._param_names != trial.params.keys()
+
+                if trial.state != TrialState.COMPLETE:
+                    continue
+                self.n_complete_trials += 1
+                if self._intersection is None:
+                    self._intersection = dict(trial.distributions)
+                else:
+                    self._intersection = {
+                        name: dist
+                        for name, dist in self._intersection.items()
+                        if trial.distributions.get(name) == dist
+                    }
+
+            self._cursor = next_cursor
+            self._processed_numbers = {n for n in self._processed_numbers if n >= next_cursor}
+
+
+class _SharedSamplerState:
+    """The sampler shared by all the threads when ``share_sampler_across_threads=True``."""
+
+    def __init__(self) -> None:
+        self.sampler: BaseSampler | None = None
+        # The sampler selection and the sampling are serialized by different locks so that the
+        # selection for a new trial does not wait for the fitting of a surrogate model.
+        self.selection_lock = threading.Lock()
+        self.sampling_lock = threading.Lock()
+        # The parameters suggested in a batch and not handed out to any trials yet.
+        self.pending_params: deque[dict[str, Any]] = deque()
+        self.pending_search_space: dict[str, BaseDistribution] | None = None
+        # The parameters handed out to the trials still running, keyed by trial ID.
+        self.running_params: dict[int, dict[str, Any]] = {}
+
+
+class _ConstantLiarStorage:
+    """A storage proxy that returns the system attrs of the fantasy trials."""
+
+    def __init__(self, storage: BaseStorage) -> None:
+        self._storage = storage
+        self.fantasy_system_attrs: dict[int, dict[str, Any]] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._storage, name)
+
+    def get_trial_system_attrs(self, trial_id: int) -> dict[str, Any]:
+        if trial_id in self.fantasy_system_attrs:
+            return self.fantasy_system_attrs[trial_id]
+        return self._storage.get_trial_system_attrs(trial_id)
+
+
+class _ConstantLiarStudy:
+    """A study proxy that shows the running trials and the pending suggestions as complete.
+
+    The fantasy trials have the worst objective and constraint values observed so far, so that
+    the surrogate model avoids the parameters being evaluated by the other threads. Only the
+    parameters given by the constant liar are made fantasies, so the running trials are not
+    fetched from the storage.
+    """
+
+    def __init__(
+        self,
+        study: Study,
+        search_space: dict[str, BaseDistribution],
+        fantasy_params: Iterable[dict[str, Any]],
+    ) -> None:
+        self._study = study
+        self._storage = _ConstantLiarStorage(study._storage)
+        self._search_space = search_space
+        complete_trials = study._get_trials(
+            deepcopy=False, states=(TrialState.COMPLETE,), use_cache=True
+        )
+        self._fantasy_trials: list[FrozenTrial] = []
+        self._worst_values: np.ndarray | None = None
+        self._worst_constraints: np.ndarray | None = None
+        if len(complete_trials) == 0:
+            return
+
+        values = np.array([t.values for t in complete_trials])
+        is_minimize = np.array([d == StudyDirection.MINIMIZE for d in study.directions])
+        self._worst_values = np.where(is_minimize, values.max(axis=0), values.min(axis=0))
+        constraints = [t.system_attrs.get(_CONSTRAINTS_KEY) for t in complete_trials]
+        self._worst_constraints = (
+            np.max(constraints, axis=0) if all(c is not None for c in constraints) else None
+        )
+        for params in fantasy_params:
+            if search_space.keys() <= params.keys():
+                self.add_fantasy(params)
+
+    def add_fantasy(self, params: dict[str, Any]) -> None:
+        if self._worst_values is None:
+            return
+        system_attrs = {}
+        if self._worst_constraints is not None:
+            system_attrs[_CONSTRAINTS_KEY] = self._worst_constraints.tolist()
+        fantasy_trial = create_trial(
+            params={name: params[name] for name in self._search_space},
+            distributions=self._search_space,
+            values=self._worst_values.tolist(),
+            system_attrs=system_attrs,
+        )
+        # NOTE: Negative IDs never collide with the trials in the storage.
+        fantasy_trial._trial_id = -1 - len(self._fantasy_trials)
+        self._storage.fantasy_system_attrs[fantasy_trial._trial_id] = system_attrs
+        self._fantasy_trials.append(fantasy_trial)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._study, name)
+
+    def _get_trials(
+        self,
+        deepcopy: bool = True,
+        states: Container[TrialState] | None = None,
+        use_cache: bool = False,
+    ) -> list[FrozenTrial]:
+        trials = self._study._get_trials(deepcopy=deepcopy, states=states, use_cache=use_cache)
+        if states is None or TrialState.COMPLETE in states:
+            trials = trials + self._fantasy_trials
+        return trials
+
+
 class AutoSampler(BaseSampler):
     _MAX_BUDGET_FOR_SINGLE_GP = 250
     _MAX_BUDGET_FOR_MULTI_GP_AND_TPE = 250
@@ -96,6 +285,18 @@ class AutoSampler(BaseSampler):
             The ``constraints_func`` will be evaluated after each successful trial.
             The function won't be called when trials fail or they are pruned, but this behavior is
             subject to change in the future releases.
+        share_sampler_across_threads:
+            If :obj:`True`, one sampler instance, e.g., ``GPSampler`` with its fitted Gaussian
+            process, is shared by all the threads of ``study.optimize(n_jobs=...)`` instead of
+            one instance per thread. The sampling is serialized, and ``GPSampler`` regards the
+            trials running in the other threads as complete trials with the worst values
+            observed so far, a.k.a. constant liar, to avoid suggesting the same parameters.
+        batch_size:
+            The number of parameters suggested at once by ``GPSampler`` when
+            ``share_sampler_across_threads=True``. The suggestions are conditioned on each other
+            by the constant liar and handed out to the next trials, so that the surrogate model
+            is updated only once per batch. Must be 1 unless ``share_sampler_across_threads`` is
+            :obj:`True`.
     """
 
     def __init__(
@@ -103,34 +304,63 @@ class AutoSampler(BaseSampler):
         *,
         seed: int | None = None,
         constraints_func: Callable[[FrozenTrial], Sequence[float]] | None = None,
+        share_sampler_across_threads: bool = False,
+        batch_size: int = 1,
     ) -> None:
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, but got {batch_size}.")
+        if batch_size > 1 and not share_sampler_across_threads:
+            raise ValueError("batch_size > 1 requires share_sampler_across_threads=True.")
+
         self._rng = LazyRandomState(seed)
         self._thread_local_sampler = ThreadLocalSampler()
         self._constraints_func = constraints_func
+        self._search_space_tracker = _SearchSpaceTracker()
+        self._share_sampler_across_threads = share_sampler_across_threads
+        self._batch_size = batch_size
+        self._shared_state = _SharedSamplerState() if share_sampler_across_threads else None
+        # The sampler selected for each running trial in the shared mode, which may differ from
+        # the current one if another thread has switched the sampler.
+        self._samplers_by_trial_id: dict[int, BaseSampler] = {}
 
     def __getstate__(self) -> dict[Any, Any]:
         state = self.__dict__.copy()
         del state["_thread_local_sampler"]
+        del state["_shared_state"]
         return state
 
     def __setstate__(self, state: dict[Any, Any]) -> None:
         self.__dict__.update(state)
         self._thread_local_sampler = ThreadLocalSampler()
+        self._shared_state = _SharedSamplerState() if self._share_sampler_across_threads else None
+
+    @property
+    def _sampler_holder(self) -> ThreadLocalSampler | _SharedSamplerState:
+        return self._thread_local_sampler if self._shared_state is None else self._shared_state
 
     @property
     def _sampler(self) -> BaseSampler:
-        if self._thread_local_sampler.sampler is None:
+        if self._sampler_holder.sampler is None:
             # NOTE(nabenabe): Do not do this process in the __init__ method because the
             # substitution at the init does not update attributes in self._thread_local_sampler
             # in each thread.
             seed_for_random_sampler = self._rng.rng.randint(_MAXINT32)
             self._sampler = RandomSampler(seed=seed_for_random_sampler)
 
-        return self._thread_local_sampler.sampler
+        sampler = self._sampler_holder.sampler
+        assert sampler is not None
+        return sampler
 
     @_sampler.setter
     def _sampler(self, sampler: BaseSampler) -> None:
-        self._thread_local_sampler.sampler = sampler
+        if self._shared_state is not None and self._shared_state.sampler is not sampler:
+            self._shared_state.pending_params.clear()
+        self._sampler_holder.sampler = sampler
+
+    def _get_trial_sampler(self, trial: FrozenTrial) -> BaseSampler:
+        if self._shared_state is None:
+            return self._sampler
+        return self._samplers_by_trial_id.get(trial._trial_id, self._sampler)
 
     def _get_tpe_sampler(self, seed: int | None) -> TPESampler:
         # Use ``TPESampler`` if search space includes conditional or categorical parameters.
@@ -147,37 +377,22 @@ class AutoSampler(BaseSampler):
         self._rng.rng.seed()
         self._sampler.reseed_rng()
 
-    def _include_conditional_param(self, study: Study) -> bool:
-        trials = study._get_trials(
-            deepcopy=False, states=(TrialState.COMPLETE, TrialState.PRUNED), use_cache=True
-        )
-        if len(trials) == 0:
-            return False
-
-        param_key = set(trials[0].params)
-        return any(param_key != set(t.params) for t in trials)
-
     def _determine_multi_objective_sampler(
         self, study: Study, trial: FrozenTrial, search_space: dict[str, BaseDistribution]
     ) -> BaseSampler:
         # TODO(nabenabe): Consider any better way to early-return for runtime performance.
         seed = self._rng.rng.randint(_MAXINT32)
-        if self._include_conditional_param(study):
+        if self._search_space_tracker.include_conditional_param:
             if not isinstance(self._sampler, TPESampler):
                 return self._get_tpe_sampler(seed)
             else:
                 return self._sampler
 
-        complete_trials = study._get_trials(
-            deepcopy=False, states=(TrialState.COMPLETE,), use_cache=True
-        )
-        n_complete_trials = len(complete_trials)
+        n_complete_trials = self._search_space_tracker.n_complete_trials
         n_objectives = len(study.directions)
         if n_complete_trials < self._MAX_BUDGET_FOR_MULTI_GP_AND_TPE:
-            if (
-                n_objectives >= 4
-                or any(isinstance(d, CategoricalDistribution) for d in search_space.values())
-                or self._include_conditional_param(study)
+            if n_objectives >= 4 or any(
+                isinstance(d, CategoricalDistribution) for d in search_space.values()
             ):
                 if not isinstance(self._sampler, TPESampler):
                     return self._get_tpe_sampler(seed)
@@ -199,15 +414,13 @@ class AutoSampler(BaseSampler):
             return self._sampler
 
         seed = self._rng.rng.randint(_MAXINT32)
-        if any(
-            isinstance(d, CategoricalDistribution) for d in search_space.values()
-        ) or self._include_conditional_param(study):
+        if (
+            any(isinstance(d, CategoricalDistribution) for d in search_space.values())
+            or self._search_space_tracker.include_conditional_param
+        ):
             return self._get_tpe_sampler(seed)
 
-        complete_trials = study._get_trials(
-            deepcopy=False, states=(TrialState.COMPLETE,), use_cache=True
-        )
-        if len(complete_trials) < self._MAX_BUDGET_FOR_SINGLE_GP:
+        if self._search_space_tracker.n_complete_trials < self._MAX_BUDGET_FOR_SINGLE_GP:
             # Use ``GPSampler`` if search space is numerical and
             # len(complete_trials) < _MAX_BUDGET_FOR_SINGLE_GP.
             if not isinstance(self._sampler, GPSampler):
@@ -217,6 +430,9 @@ class AutoSampler(BaseSampler):
                 # Use ``CmaEsSampler`` if search space is numerical and
                 # len(complete_trials) > _MAX_BUDGET_FOR_SINGLE_GP.
                 # Warm start CMA-ES with the first _MAX_BUDGET_FOR_SINGLE_GP complete trials.
+                complete_trials = study._get_trials(
+                    deepcopy=False, states=(TrialState.COMPLETE,), use_cache=True
+                )
                 complete_trials.sort(key=lambda trial: trial.datetime_complete)
                 warm_start_trials = complete_trials[: self._MAX_BUDGET_FOR_SINGLE_GP]
                 return CmaEsSampler(
@@ -238,20 +454,59 @@ class AutoSampler(BaseSampler):
     def infer_relative_search_space(
         self, study: Study, trial: FrozenTrial
     ) -> dict[str, BaseDistribution]:
-        return self._sampler.infer_relative_search_space(study, trial)
+        return self._get_trial_sampler(trial).infer_relative_search_space(study, trial)
+
+    def _sample_relative_with_constant_liar(
+        self,
+        study: Study,
+        trial: FrozenTrial,
+        search_space: dict[str, BaseDistribution],
+        sampler: GPSampler,
+    ) -> dict[str, Any]:
+        state = self._shared_state
+        assert state is not None
+        if state.pending_search_space != search_space:
+            state.pending_params.clear()
+            state.pending_search_space = search_space
+
+        if len(state.pending_params) == 0:
+            # NOTE: The running params are copied because the other threads may remove their
+            # trials in after_trial.
+            running_params = list(state.running_params.copy().values())
+            liar_study = _ConstantLiarStudy(study, search_space, running_params)
+            for _ in range(self._batch_size):
+                params = sampler.sample_relative(cast("Study", liar_study), trial, search_space)
+                if len(params) == 0:
+                    # GPSampler samples independently during the startup trials.
+                    break
+                state.pending_params.append(params)
+                liar_study.add_fantasy(params)
+
+        if len(state.pending_params) == 0:
+            return {}
+        params = state.pending_params.popleft()
+        state.running_params[trial._trial_id] = params
+        return params
 
     def sample_relative(
         self, study: Study, trial: FrozenTrial, search_space: dict[str, BaseDistribution]
     ) -> dict[str, Any]:
-        if len(study.directions) > 1 and not isinstance(
-            self._sampler, (NSGAIISampler, NSGAIIISampler)
-        ):
+        sampler = self._get_trial_sampler(trial)
+        if len(study.directions) > 1 and not isinstance(sampler, (NSGAIISampler, NSGAIIISampler)):
             # NOTE(nabenabe): Warm-starting for multi-objective optimization.
             generation_key = (
                 NSGAII_GENERATION_KEY if len(study.directions) < 4 else NSGAIII_GENERATION_KEY
             )
             study._storage.set_trial_system_attr(trial._trial_id, generation_key, 0)
-        return self._sampler.sample_relative(study, trial, search_space)
+        if self._shared_state is None:
+            return sampler.sample_relative(study, trial, search_space)
+
+        with self._shared_state.sampling_lock:
+            if isinstance(sampler, GPSampler) and search_space != {}:
+                return self._sample_relative_with_constant_liar(
+                    study, trial, search_space, sampler
+                )
+            return sampler.sample_relative(study, trial, search_space)
 
     def sample_independent(
         self,
@@ -260,23 +515,35 @@ class AutoSampler(BaseSampler):
         param_name: str,
         param_distribution: BaseDistribution,
     ) -> Any:
-        return self._sampler.sample_independent(study, trial, param_name, param_distribution)
+        sampler = self._get_trial_sampler(trial)
+        if self._shared_state is None:
+            return sampler.sample_independent(study, trial, param_name, param_distribution)
 
-    def before_trial(self, study: Study, trial: FrozenTrial) -> None:
+        with self._shared_state.sampling_lock:
+            return sampler.sample_independent(study, trial, param_name, param_distribution)
+
+    def _select_sampler(self, study: Study, trial: FrozenTrial) -> BaseSampler:
         # NOTE(nabenabe): Sampler must be updated in this method. If, for example, it is updated in
         # infer_relative_search_space, the sampler for before_trial and that for sample_relative,
         # after_trial might be different, meaning that the sampling routine could be incompatible.
-        if (
-            len(study._get_trials(deepcopy=False, states=(TrialState.COMPLETE,), use_cache=True))
-            != 0
-        ):
-            search_space = IntersectionSearchSpace().calculate(study)
+        self._search_space_tracker.update(study)
+        if self._search_space_tracker.n_complete_trials != 0:
+            search_space = self._search_space_tracker.search_space
             self._sampler = self._determine_sampler(study, trial, search_space)
+        return self._sampler
+
+    def before_trial(self, study: Study, trial: FrozenTrial) -> None:
+        if self._shared_state is None:
+            sampler = self._select_sampler(study, trial)
+        else:
+            with self._shared_state.selection_lock:
+                sampler = self._select_sampler(study, trial)
+                self._samplers_by_trial_id[trial._trial_id] = sampler
 
-        sampler_name = self._sampler.__class__.__name__
+        sampler_name = sampler.__class__.__name__
         _logger.debug(f"Sample trial#{trial.number} with {sampler_name}.")
         study._storage.set_trial_system_attr(trial._trial_id, _SAMPLER_KEY, sampler_name)
-        self._sampler.before_trial(study, trial)
+        sampler.before_trial(study, trial)
 
     def after_trial(
         self,
@@ -286,9 +553,13 @@ class AutoSampler(BaseSampler):
         values: Sequence[float] | None,
     ) -> None:
         assert state in [TrialState.COMPLETE, TrialState.FAIL, TrialState.PRUNED]
-        if isinstance(self._sampler, RandomSampler) and self._constraints_func is not None:
+        sampler = self._get_trial_sampler(trial)
+        if isinstance(sampler, RandomSampler) and self._constraints_func is not None:
             # NOTE(nabenabe): Since RandomSampler does not handle constraints, we need to
             # separately set the constraints here.
             _process_constraints_after_trial(self._constraints_func, study, trial, state)
 
-        self._sampler.after_trial(study, trial, state, values)
+        sampler.after_trial(study, trial, state, values)
+        self._samplers_by_trial_id.pop(trial._trial_id, None)
+        if self._shared_state is not None:
+            self._shared_state.running_params.pop(trial._trial_id, None)
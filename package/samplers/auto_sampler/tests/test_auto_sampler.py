@@ -9,9 +9,10 @@ import pytest
 
 # TODO(nabaenabe): Add the CI for this sampler.
 
-AutoSampler = optunahub.load_local_module(
+auto_sampler_module = optunahub.load_local_module(
     package="samplers/auto_sampler", registry_root="package/"
-).AutoSampler
+)
+AutoSampler = auto_sampler_module.AutoSampler
 
 parametrize_constraints = pytest.mark.parametrize("use_constraint", [True, False])
 
@@ -272,5 +273,84 @@ def test_multi_thread() -> None:
     assert "CmaEsSampler" in sampler_names
 
 
-def test_picklize() -> None:
-    pickle.loads(pickle.dumps(AutoSampler()))
+@pytest.mark.parametrize("batch_size", [1, 3])
+def test_share_sampler_across_threads(batch_size: int) -> None:
+    n_trials = 30
+    auto_sampler = AutoSampler(seed=0, share_sampler_across_threads=True, batch_size=batch_size)
+    study = optuna.create_study(sampler=auto_sampler)
+    study.optimize(objective, n_trials=n_trials, n_jobs=4)
+    sampler_names = _get_used_sampler_names(study)
+    assert len(study.get_trials(states=(optuna.trial.TrialState.COMPLETE,))) == n_trials
+    assert "GPSampler" in sampler_names
+    assert auto_sampler._samplers_by_trial_id == {}
+    # Every thread uses the same GPSampler.
+    assert auto_sampler._shared_state.sampler is auto_sampler._sampler
+
+
+def test_constant_liar_study_shows_running_trials_as_complete() -> None:
+    auto_sampler = AutoSampler(seed=0, share_sampler_across_threads=True, batch_size=2)
+    study = optuna.create_study(sampler=auto_sampler)
+    study.optimize(objective, n_trials=15)
+    worst_value = max(t.value for t in study.trials)
+    running_trials = [study.ask() for _ in range(3)]
+    for t in running_trials:
+        objective(t)
+    running_params = auto_sampler._shared_state.running_params
+    assert sorted(running_params) == [t._trial_id for t in running_trials]
+
+    search_space = optuna.search_space.IntersectionSearchSpace().calculate(study)
+    liar_study = auto_sampler_module._sampler._ConstantLiarStudy(
+        study, search_space, running_params.values()
+    )
+    complete_trials = liar_study._get_trials(
+        deepcopy=False, states=(optuna.trial.TrialState.COMPLETE,)
+    )
+    assert len(complete_trials) == 15 + len(running_trials)
+    fantasy_trials = complete_trials[15:]
+    assert [t.params for t in fantasy_trials] == [t.params for t in running_trials]
+    assert all(t.value == worst_value for t in fantasy_trials)
+
+    # The finished trials are no longer shown as fantasies.
+    study.tell(running_trials[0], 0.0)
+    assert sorted(running_params) == [t._trial_id for t in running_trials[1:]]
+
+
+def test_batch_size_requires_sharing() -> None:
+    with pytest.raises(ValueError):
+        AutoSampler(batch_size=2)
+
+
+@pytest.mark.parametrize("share_sampler_across_threads", [True, False])
+def test_picklize(share_sampler_across_threads: bool) -> None:
+    pickle.loads(
+        pickle.dumps(AutoSampler(share_sampler_across_threads=share_sampler_across_threads))
+    )
+
+
+def test_search_space_tracker_with_trials_finished_out_of_order() -> None:
+    study = optuna.create_study(sampler=optuna.samplers.RandomSampler(seed=0))
+    tracker = AutoSampler()._search_space_tracker
+    running_trials = [study.ask() for _ in range(3)]
+    for t in running_trials:
+        t.suggest_float("x", -5, 5)
+    running_trials[2].suggest_int("y", -5, 5)
+    running_trials[1].suggest_float("z", -5, 5)
+
+    def _check(n_complete_trials: int, include_conditional_param: bool) -> None:
+        tracker.update(study)
+        assert tracker.n_complete_trials == n_complete_trials
+        assert tracker.include_conditional_param == include_conditional_param
+        assert tracker.search_space == optuna.search_space.IntersectionSearchSpace().calculate(
+            study
+        )
+
+    _check(0, False)
+    study.tell(running_trials[2], 1.0)
+    _check(1, False)
+    study.tell(running_trials[0], state=optuna.trial.TrialState.FAIL)
+    _check(1, False)
+    # The pruned trial is taken into account only for the conditional parameters.
+    study.tell(running_trials[1], state=optuna.trial.TrialState.PRUNED)
+    _check(1, True)
+    study.optimize(objective, n_trials=2)
+    _check(3, True)
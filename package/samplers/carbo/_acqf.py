@@ -28,6 +28,15 @@ class BaseAcquisitionFunc(ABC):
         val.backward()  # type: ignore
         return val.item(), x_tensor.grad.detach().numpy()  # type: ignore
 
+    def eval_acqf_with_grad_batched(self, x: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # NOTE: The acquisition value of each point depends only on the point itself, so the
+        # gradient of the sum gives the gradient of each value by a single backward pass.
+        assert x.ndim == 2
+        x_tensor = torch.from_numpy(x).requires_grad_(True)
+        vals = self.eval_acqf(x_tensor)
+        vals.sum().backward()  # type: ignore
+        return vals.detach().numpy(), x_tensor.grad.detach().numpy()  # type: ignore
+
 
 class UCB(BaseAcquisitionFunc):
     def __init__(self, gpr: GPRegressor, beta: float) -> None:
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from typing import TYPE_CHECKING
 
@@ -18,6 +19,7 @@ from ._gp import convert_inf
 from ._gp import GPRegressor
 from ._gp import KernelParamsTensor
 from ._optim import suggest_by_carbo
+from ._scipy_blas_thread_patch import single_blas_thread_if_scipy_v1_15_or_newer
 
 
 if TYPE_CHECKING:
@@ -117,6 +119,7 @@ class CARBOSampler(BaseSampler):
         local_ratio: float = 0.1,
         # n_local_search is a power of 2 to suppress the warning in Sobol.
         n_local_search: int = 16,
+        n_threads_for_constraints: int = 1,
     ) -> None:
         self._rng = LazyRandomState(seed)
         self._independent_sampler = independent_sampler or optuna.samplers.RandomSampler(seed=seed)
@@ -133,6 +136,8 @@ class CARBOSampler(BaseSampler):
         assert 0 < local_ratio < 1
         self._local_ratio = local_ratio
         self._n_local_search = n_local_search
+        assert n_threads_for_constraints >= 1
+        self._n_threads_for_constraints = n_threads_for_constraints
 
     def _preproc(
         self, study: Study, trials: list[FrozenTrial], search_space: dict[str, BaseDistribution]
@@ -152,6 +157,28 @@ class CARBOSampler(BaseSampler):
 
         return X_train, y_train
 
+    def _fit_constraints_gprs(
+        self,
+        X_train: torch.Tensor,
+        C_train: torch.Tensor,
+        cache_list: Sequence[torch.Tensor | None],
+    ) -> list[GPRegressor]:
+        def _fit(cache: torch.Tensor | None, c_train: torch.Tensor) -> GPRegressor:
+            return GPRegressor(X_train, c_train, kernel_params=cache).fit_kernel_params(
+                self._log_prior, self._minimum_noise, self._deterministic
+            )
+
+        n_threads = min(self._n_threads_for_constraints, C_train.shape[-1])
+        if n_threads <= 1:
+            return [_fit(cache, c_train) for cache, c_train in zip(cache_list, C_train.T)]
+
+        # The GPs are independent of each other given X_train, and most of the fitting time is
+        # spent in torch and BLAS, which release the GIL. The BLAS thread setting is changed once
+        # here because changing it in each thread concurrently is not thread-safe.
+        with single_blas_thread_if_scipy_v1_15_or_newer():
+            with ThreadPoolExecutor(max_workers=n_threads) as executor:
+                return list(executor.map(_fit, cache_list, C_train.T))
+
     def sample_relative(
         self, study: Study, trial: FrozenTrial, search_space: dict[str, BaseDistribution]
     ) -> dict[str, Any]:
@@ -184,11 +211,9 @@ class CARBOSampler(BaseSampler):
             stded_c_vals, means, stdevs = _standardize_values(-constraint_vals)
             constraints_threshold_list = (-means / np.maximum(EPS, stdevs)).tolist()
             C_train = torch.from_numpy(stded_c_vals)
-            constraints_gpr_list = [
-                GPRegressor(X_train, c_train, kernel_params=cache).fit_kernel_params(
-                    self._log_prior, self._minimum_noise, self._deterministic
-                )
-                for cache, c_train in zip(_cache_list, C_train.T)
+            constraints_gpr_list = self._fit_constraints_gprs(X_train, C_train, _cache_list)
+            self._constraints_kernel_params_cache_list = [
+                constraints_gpr.kernel_params.clone() for constraints_gpr in constraints_gpr_list
             ]
         robust_params, worst_robust_params, worst_robust_acqf_val = suggest_by_carbo(
             gpr=gpr,
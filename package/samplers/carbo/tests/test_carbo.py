@@ -1,19 +1,24 @@
 from __future__ import annotations
 
 from collections.abc import Sequence
+import importlib
 import warnings
 
+import numpy as np
 import optuna
 from optuna.samplers._base import _CONSTRAINTS_KEY
 from optuna.trial import FrozenTrial
 import optunahub
 import pytest
+import torch
 
 
 # NOTE(nabenabe): This file content is mostly copied from the Optuna repository.
-CARBOSampler = optunahub.load_local_module(
-    package="samplers/carbo", registry_root="package/"
-).CARBOSampler
+carbo = optunahub.load_local_module(package="samplers/carbo", registry_root="package/")
+CARBOSampler = carbo.CARBOSampler
+_acqf = importlib.import_module(f"{carbo.__name__}._acqf")
+_gp = importlib.import_module(f"{carbo.__name__}._gp")
+_optim = importlib.import_module(f"{carbo.__name__}._optim")
 
 
 @pytest.mark.parametrize("constraint_value", [-1.0, 0.0, 1.0, -float("inf"), float("inf")])
@@ -67,3 +72,50 @@ def test_constraints_func_nan() -> None:
     assert all(0 <= x <= 1 for x in trials[0].params.values())  # The params are normal.
     assert trials[0].values == list(trials[0].params.values())  # The values are normal.
     assert trials[0].system_attrs[_CONSTRAINTS_KEY] is None  # None is set for constraints.
+
+
+def test_constraints_gprs_fitted_in_threads() -> None:
+    def objective(trial: optuna.Trial) -> float:
+        x = trial.suggest_float("x", 0, 1)
+        y = trial.suggest_float("y", 0, 1)
+        trial.set_user_attr("c", (x - y, x + y - 1.0, x * y - 0.2))
+        return x**2 + y
+
+    params_list = []
+    for n_threads in [1, 3]:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", optuna.exceptions.ExperimentalWarning)
+            sampler = CARBOSampler(
+                seed=0,
+                n_startup_trials=2,
+                constraints_func=lambda t: t.user_attrs["c"],
+                n_local_search=4,
+                n_threads_for_constraints=n_threads,
+            )
+        study = optuna.create_study(sampler=sampler)
+        study.optimize(objective, n_trials=6)
+        assert sampler._constraints_kernel_params_cache_list is not None
+        assert len(sampler._constraints_kernel_params_cache_list) == 3
+        params_list.append([t.params for t in study.trials])
+
+    assert params_list[0] == params_list[1]
+
+
+def test_batched_gradient_descent() -> None:
+    rng = np.random.RandomState(0)
+    X_train = torch.from_numpy(rng.random((20, 3)))
+    y_train = torch.from_numpy(rng.normal(size=20))
+    gpr = _gp.GPRegressor(X_train, y_train, kernel_params=torch.ones(5, dtype=torch.float64))
+    gpr._cache_matrix()
+    acqf = _acqf.CombinedUCB(gpr, None, None, rho=1e3, beta=4.0)
+    initial_params = rng.random((8, 3))
+    bounds = np.stack([_optim._create_bounds(x, local_radius=0.1) for x in initial_params])
+    params, fvals = _optim._gradient_descent(acqf, initial_params, bounds)
+    assert params.shape == (8, 3) and fvals.shape == (8,)
+    assert np.all((bounds[..., 0] <= params) & (params <= bounds[..., 1]))
+    assert np.allclose(acqf.eval_acqf_no_grad(params), fvals)
+    # Each start reaches the same local minimum as the optimization from the start alone.
+    for x, b, f in zip(initial_params, bounds, fvals):
+        _, f_alone = _optim._gradient_descent(acqf, x[np.newaxis], b[np.newaxis])
+        assert f <= acqf.eval_acqf_no_grad(x[np.newaxis])[0]
+        assert np.isclose(f, f_alone[0], atol=1e-4)
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-import copy
+import base64
+from collections import OrderedDict
 import math
 import pickle
+import threading
 from typing import Any
 from typing import Callable
 from typing import Dict
@@ -41,14 +43,27 @@ _logger = logging.get_logger(__name__)
 _EPS = 1e-10
 # The value of system_attrs must be less than 2046 characters on RDBStorage.
 _SYSTEM_ATTR_MAX_LENGTH = 2045
+# The number of deserialized optimizers kept in memory.
+_OPTIMIZER_CACHE_SIZE = 8
 
 
 class _CmaEsAttrKeys(NamedTuple):
     optimizer: Callable[[], str]
+    hex_optimizer: Callable[[], str]
     generation: Callable[[], str]
     popsize: Callable[[], str]
 
 
+class _TrialRecord(NamedTuple):
+    # A view of a trial used for sampling. The value of a pruned trial is its last intermediate
+    # value, and the params and system_attrs refer to those of the trial without copies.
+    trial_id: int
+    params: Dict[str, Any]
+    value: float
+    generation: int
+    system_attrs: Dict[str, Any]
+
+
 class CatCmaSampler(BaseSampler):
     """A sampler to solve mixed-categorical optimization using `cmaes <https://github.com/CyberAgentAILab/cmaes>`__ as the backend.
 
@@ -118,6 +133,10 @@ class CatCmaSampler(BaseSampler):
         self._intersection_search_space = IntersectionSearchSpace()
         self._consider_pruned_trials = consider_pruned_trials
         self._initial_popsize = popsize
+        # The optimizers keyed by the trial id and the generation where they are stored, which
+        # are reused instead of being deserialized from the storage in every trial.
+        self._optimizer_cache: OrderedDict[Tuple[int, int], "CmaClass"] = OrderedDict()
+        self._optimizer_lock = threading.Lock()
         self._cat_param = cat_param
         self._margin = margin
         self._min_eigenvalue = min_eigenvalue
@@ -146,6 +165,16 @@ class CatCmaSampler(BaseSampler):
         study: "optuna.Study",
         trial: "optuna.trial.FrozenTrial",
         search_space: Dict[str, BaseDistribution],
+    ) -> Dict[str, Any]:
+        # The cached optimizers are not shared among threads during sampling.
+        with self._optimizer_lock:
+            return self._sample_relative(study, trial, search_space)
+
+    def _sample_relative(
+        self,
+        study: "optuna.Study",
+        trial: "optuna.trial.FrozenTrial",
+        search_space: Dict[str, BaseDistribution],
     ) -> Dict[str, Any]:
         self._raise_error_if_multi_objective(study)
 
@@ -192,8 +221,10 @@ class CatCmaSampler(BaseSampler):
             else:
                 popsize = self._initial_popsize
 
-        optimizer = self._restore_optimizer(completed_trials)
-        if optimizer is None:
+        optimizer_trial = self._get_optimizer_trial(completed_trials)
+        if optimizer_trial is not None:
+            optimizer = self._restore_optimizer(optimizer_trial)
+        else:
             optimizer = self._init_optimizer(trans, cat_num, population_size=self._initial_popsize)
 
         solution_trials = self._get_solution_trials(completed_trials, optimizer.generation)
@@ -209,7 +240,6 @@ class CatCmaSampler(BaseSampler):
             solutions: List[Tuple[Tuple[np.ndarray, np.ndarray], float]] = []
 
             for t in solution_trials[:popsize]:
-                assert t.value is not None, "completed trials must have a value"
                 # Convert Optuna's representation to cmaes.CatCma's internal representation.
 
                 # Convert numerical parameters
@@ -232,13 +262,21 @@ class CatCmaSampler(BaseSampler):
                 y = t.value if study.direction == StudyDirection.MINIMIZE else -t.value
                 solutions.append(((x, c), y))  # type: ignore
 
+            if optimizer_trial is not None:
+                # The cached optimizer is updated in place by tell.
+                self._optimizer_cache.pop(self._optimizer_cache_key(optimizer_trial), None)
             optimizer.tell(solutions)
 
             # Store optimizer.
-            optimizer_str = pickle.dumps(optimizer).hex()
+            optimizer_bytes = pickle.dumps(optimizer)
+            optimizer_str = base64.b64encode(optimizer_bytes).decode("ascii")
             optimizer_attrs = self._split_optimizer_str(optimizer_str)
             for key in optimizer_attrs:
                 study._storage.set_trial_system_attr(trial._trial_id, key, optimizer_attrs[key])
+            # The deserialized optimizer is cached so that the sampling does not depend on
+            # whether the optimizer is restored from the cache or from the storage.
+            optimizer = pickle.loads(optimizer_bytes)
+            self._cache_optimizer((trial._trial_id, optimizer.generation), optimizer)
 
         # Caution: optimizer should update its seed value.
         seed = self._cma_rng.rng.randint(1, 2**16) + trial.number
@@ -269,6 +307,9 @@ class CatCmaSampler(BaseSampler):
         attr_prefix = "cma:"
 
         def optimizer_key_template() -> str:
+            return attr_prefix + "optimizer_base64"
+
+        def hex_optimizer_key_template() -> str:
             return attr_prefix + "optimizer"
 
         def generation_attr_key_template() -> str:
@@ -279,15 +320,16 @@ class CatCmaSampler(BaseSampler):
 
         return _CmaEsAttrKeys(
             optimizer_key_template,
+            hex_optimizer_key_template,
             generation_attr_key_template,
             popsize_attr_key_template,
         )
 
-    def _concat_optimizer_attrs(self, optimizer_attrs: Dict[str, str]) -> str:
-        return "".join(
-            optimizer_attrs["{}:{}".format(self._attr_keys.optimizer(), i)]
-            for i in range(len(optimizer_attrs))
-        )
+    def _concat_optimizer_attrs(self, system_attrs: Dict[str, Any], key: str) -> str:
+        optimizer_strs: List[str] = []
+        while "{}:{}".format(key, len(optimizer_strs)) in system_attrs:
+            optimizer_strs.append(system_attrs["{}:{}".format(key, len(optimizer_strs))])
+        return "".join(optimizer_strs)
 
     def _split_optimizer_str(self, optimizer_str: str) -> Dict[str, str]:
         optimizer_len = len(optimizer_str)
@@ -298,24 +340,47 @@ class CatCmaSampler(BaseSampler):
             attrs["{}:{}".format(self._attr_keys.optimizer(), i)] = optimizer_str[start:end]
         return attrs
 
-    def _restore_optimizer(
-        self,
-        completed_trials: "List[optuna.trial.FrozenTrial]",
-    ) -> Optional["CmaClass"]:
-        # Restore a previous CatCma object.
+    def _get_optimizer_trial(self, completed_trials: List[_TrialRecord]) -> Optional[_TrialRecord]:
+        # The latest trial storing a CatCma object.
+        keys = [
+            "{}:0".format(self._attr_keys.optimizer()),
+            "{}:0".format(self._attr_keys.hex_optimizer()),
+        ]
         for trial in reversed(completed_trials):
-            optimizer_attrs = {
-                key: value
-                for key, value in trial.system_attrs.items()
-                if key.startswith(self._attr_keys.optimizer())
-            }
-            if len(optimizer_attrs) == 0:
-                continue
-
-            optimizer_str = self._concat_optimizer_attrs(optimizer_attrs)
-            return pickle.loads(bytes.fromhex(optimizer_str))
+            if any(key in trial.system_attrs for key in keys):
+                return trial
         return None
 
+    def _optimizer_cache_key(self, optimizer_trial: _TrialRecord) -> Tuple[int, int]:
+        return optimizer_trial.trial_id, optimizer_trial.generation
+
+    def _cache_optimizer(self, key: Tuple[int, int], optimizer: "CmaClass") -> None:
+        self._optimizer_cache[key] = optimizer
+        self._optimizer_cache.move_to_end(key)
+        while len(self._optimizer_cache) > _OPTIMIZER_CACHE_SIZE:
+            self._optimizer_cache.popitem(last=False)
+
+    def _restore_optimizer(self, optimizer_trial: _TrialRecord) -> "CmaClass":
+        # Restore a previous CatCma object.
+        key = self._optimizer_cache_key(optimizer_trial)
+        optimizer = self._optimizer_cache.get(key)
+        if optimizer is not None:
+            self._optimizer_cache.move_to_end(key)
+            return optimizer
+
+        system_attrs = optimizer_trial.system_attrs
+        if "{}:0".format(self._attr_keys.optimizer()) in system_attrs:
+            optimizer_str = self._concat_optimizer_attrs(system_attrs, self._attr_keys.optimizer())
+            optimizer = pickle.loads(base64.b64decode(optimizer_str))
+        else:
+            # The optimizer stored in the hex format by the older versions.
+            optimizer_str = self._concat_optimizer_attrs(
+                system_attrs, self._attr_keys.hex_optimizer()
+            )
+            optimizer = pickle.loads(bytes.fromhex(optimizer_str))
+        self._cache_optimizer(key, optimizer)
+        return optimizer
+
     def _init_optimizer(
         self,
         trans: _SearchSpaceTransform,
@@ -373,11 +438,12 @@ class CatCmaSampler(BaseSampler):
             study, trial, param_name, param_distribution
         )
 
-    def _get_trials(self, study: "optuna.Study") -> List[FrozenTrial]:
+    def _get_trials(self, study: "optuna.Study") -> List[_TrialRecord]:
+        generation_attr_key = self._attr_keys.generation()
         complete_trials = []
         for t in study._get_trials(deepcopy=False, use_cache=True):
             if t.state == TrialState.COMPLETE:
-                complete_trials.append(t)
+                value = t.value
             elif (
                 t.state == TrialState.PRUNED
                 and len(t.intermediate_values) > 0
@@ -386,17 +452,23 @@ class CatCmaSampler(BaseSampler):
                 _, value = max(t.intermediate_values.items())
                 if value is None:
                     continue
-                # We rewrite the value of the trial `t` for sampling, so we need a deepcopy.
-                copied_t = copy.deepcopy(t)
-                copied_t.value = value
-                complete_trials.append(copied_t)
+            else:
+                continue
+            complete_trials.append(
+                _TrialRecord(
+                    t._trial_id,
+                    t.params,
+                    value,
+                    t.system_attrs.get(generation_attr_key, -1),
+                    t.system_attrs,
+                )
+            )
         return complete_trials
 
     def _get_solution_trials(
-        self, trials: List[FrozenTrial], generation: int
-    ) -> List[FrozenTrial]:
-        generation_attr_key = self._attr_keys.generation()
-        return [t for t in trials if generation == t.system_attrs.get(generation_attr_key, -1)]
+        self, trials: List[_TrialRecord], generation: int
+    ) -> List[_TrialRecord]:
+        return [t for t in trials if generation == t.generation]
 
     def before_trial(self, study: optuna.Study, trial: FrozenTrial) -> None:
         self._independent_sampler.before_trial(study, trial)
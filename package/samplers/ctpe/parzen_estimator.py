@@ -1,17 +1,58 @@
 from __future__ import annotations
 
 from collections.abc import Callable
+from collections.abc import Sequence
+from typing import Dict
 from typing import NamedTuple
 
 import numpy as np
 from optuna.distributions import BaseDistribution
 from optuna.distributions import CategoricalDistribution
+from optuna.distributions import FloatDistribution
+from optuna.distributions import IntDistribution
+from optuna.samplers._tpe import _truncnorm
 from optuna.samplers._tpe.parzen_estimator import _ParzenEstimator
 from optuna.samplers._tpe.probability_distributions import _BatchedCategoricalDistributions
 from optuna.samplers._tpe.probability_distributions import _BatchedDiscreteTruncNormDistributions
 from optuna.samplers._tpe.probability_distributions import _BatchedDistributions
 from optuna.samplers._tpe.probability_distributions import _BatchedTruncNormDistributions
 from optuna.samplers._tpe.probability_distributions import _MixtureOfProductDistribution
+from optuna.trial import FrozenTrial
+
+
+# The maximum number of (sample, kernel, parameter) elements evaluated at once by
+# _BatchedMixtures.log_pdf to bound the memory usage for large n_ei_candidates.
+_MAX_LOG_PDF_BATCH_ELEMENTS = 1 << 22
+
+
+# NOTE: _unique_inverse_2d and _log_gauss_mass_unique are copied from Optuna v4.5 because they
+# are not available in the older versions.
+def _unique_inverse_2d(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    This function is a quicker version of:
+        np.unique(np.concatenate([a[:, None], b[:, None]], axis=-1), return_inverse=True).
+    """
+    assert a.shape == b.shape and len(a.shape) == 1
+    order = np.argsort(b)
+    # Stable sorting is required for the tie breaking.
+    order = order[np.argsort(a[order], kind="stable")]
+    a_order = a[order]
+    b_order = b[order]
+    is_first_occurrence = np.empty_like(a, dtype=bool)
+    is_first_occurrence[0] = True
+    is_first_occurrence[1:] = (a_order[1:] != a_order[:-1]) | (b_order[1:] != b_order[:-1])
+    inv = np.empty(a_order.size, dtype=int)
+    inv[order] = np.cumsum(is_first_occurrence) - 1
+    return a_order[is_first_occurrence], b_order[is_first_occurrence], inv
+
+
+def _log_gauss_mass_unique(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    This function reduces the log Gaussian probability mass computation by avoiding the
+    duplicated evaluations using the np.unique_inverse(...) equivalent operation.
+    """
+    a_uniq, b_uniq, inv = _unique_inverse_2d(a.ravel(), b.ravel())
+    return _truncnorm._log_gauss_mass(a_uniq, b_uniq)[inv].reshape(a.shape)
 
 
 class _CustomizableParzenEstimatorParameters(NamedTuple):
@@ -29,44 +70,49 @@ class _CustomizableParzenEstimatorParameters(NamedTuple):
 
 def _bandwidth_hyperopt(
     mus: np.ndarray,
-    low: float,
-    high: float,
-    step: float | None,
+    low: np.ndarray,
+    high: np.ndarray,
+    step: np.ndarray,
+    sorted_indices: np.ndarray | None = None,
 ) -> np.ndarray:
-    step_or_0 = step or 0
-    sorted_indices = np.argsort(mus)
-    sorted_mus_with_endpoints = np.empty(len(mus) + 2, dtype=float)
-    sorted_mus_with_endpoints[0] = low - step_or_0 / 2
-    sorted_mus_with_endpoints[1:-1] = mus[sorted_indices]
-    sorted_mus_with_endpoints[-1] = high + step_or_0 / 2
+    # NOTE: Each column of ``mus`` is a parameter and ``step`` is 0 for continuous parameters.
+    if sorted_indices is None:
+        sorted_indices = np.argsort(mus, axis=0, kind="stable")
+    sorted_mus_with_endpoints = np.empty((len(mus) + 2, mus.shape[1]), dtype=float)
+    sorted_mus_with_endpoints[0] = low - step / 2
+    sorted_mus_with_endpoints[1:-1] = np.take_along_axis(mus, sorted_indices, axis=0)
+    sorted_mus_with_endpoints[-1] = high + step / 2
     sorted_sigmas = np.maximum(
         sorted_mus_with_endpoints[1:-1] - sorted_mus_with_endpoints[0:-2],
         sorted_mus_with_endpoints[2:] - sorted_mus_with_endpoints[1:-1],
     )
-    return sorted_sigmas[np.argsort(sorted_indices)]
+    sigmas = np.empty_like(sorted_sigmas)
+    np.put_along_axis(sigmas, sorted_indices, sorted_sigmas, axis=0)
+    return sigmas
 
 
 def _bandwidth_optuna(
     n_observations: int,
     consider_prior: bool,
-    domain_range: float,
+    domain_range: np.ndarray,
     dim: int,
 ) -> np.ndarray:
     SIGMA0_MAGNITUDE = 0.2
     sigma = SIGMA0_MAGNITUDE * max(n_observations, 1) ** (-1.0 / (dim + 4)) * domain_range
-    return np.full(shape=(n_observations + consider_prior,), fill_value=sigma)
+    return np.tile(sigma, (n_observations + consider_prior, 1))
 
 
 def _bandwidth_scott(mus: np.ndarray) -> np.ndarray:
-    std = np.std(mus, ddof=int(mus.size > 1))
-    IQR = np.subtract.reduce(np.percentile(mus, [75, 25]))
-    return np.full_like(mus, 1.059 * min(IQR / 1.34, std) * mus.size**-0.2)
+    n_mus = len(mus)
+    std = np.std(mus, axis=0, ddof=int(n_mus > 1))
+    IQR = np.subtract.reduce(np.percentile(mus, [75, 25], axis=0))
+    return np.tile(1.059 * np.minimum(IQR / 1.34, std) * n_mus**-0.2, (n_mus, 1))
 
 
 def _clip_bandwidth(
     sigmas: np.ndarray,
     n_observations: int,
-    domain_range: float,
+    domain_range: np.ndarray,
     consider_prior: bool,
     consider_magic_clip: bool,
     b_magic_exponent: float,
@@ -80,7 +126,7 @@ def _clip_bandwidth(
         )
         minsigma = bandwidth_factor * domain_range
     else:
-        minsigma = 1e-12
+        minsigma = np.full_like(domain_range, 1e-12)
 
     clipped_sigmas = np.asarray(np.clip(sigmas, minsigma, maxsigma))
     if consider_prior:
@@ -89,6 +135,99 @@ def _clip_bandwidth(
     return clipped_sigmas
 
 
+class _SharedObservations:
+    """Observations of trials shared among the estimators built from subsets of the trials.
+
+    c-TPE builds a pair of estimators for every constraint from different splits of the same
+    trials. The internal representations are computed once here and, for the hyperopt bandwidth,
+    the numerical observations are sorted once and the order of each subset is obtained by
+    filtering, which is linear in the number of observations.
+
+    ``trial_indices`` maps the trial numbers to the rows of ``observations``, or to -1 for the
+    trials without some parameters in ``search_space``.
+    """
+
+    def __init__(
+        self,
+        observations: dict[str, np.ndarray],
+        search_space: dict[str, BaseDistribution],
+        trial_indices: dict[int, int] | None = None,
+    ) -> None:
+        self._observations = observations
+        self._search_space = search_space
+        self._trial_indices = trial_indices or {}
+        self._sorted_indices: np.ndarray | None = None
+
+    @property
+    def search_space(self) -> dict[str, BaseDistribution]:
+        return self._search_space
+
+    def take(self, indices: np.ndarray) -> _ObservationSubset:
+        """Return the observations at ``indices``."""
+        return _ObservationSubset(self, indices)
+
+    def take_trials(self, trials: Sequence[FrozenTrial]) -> _ObservationSubset | None:
+        """Return the observations of ``trials``, or None if some of them are not shared."""
+        indices = [self._trial_indices.get(t.number) for t in trials]
+        if any(i is None for i in indices):
+            return None
+        return self.take(np.asarray([i for i in indices if i is not None and i >= 0], dtype=int))
+
+    def take_sorted_indices(self, indices: np.ndarray) -> np.ndarray:
+        """Return the column-wise sorted order of the numerical observations at ``indices``.
+
+        Ties are ordered as in the stable sort of the subset if ``indices`` is increasing.
+        """
+        if self._sorted_indices is None:
+            numerical_observations = [
+                np.asarray(self._observations[param], dtype=float)
+                for param, dist in self._search_space.items()
+                if not isinstance(dist, CategoricalDistribution)
+            ]
+            n_observations = len(next(iter(self._observations.values()), []))
+            numerical_observations_2d = np.reshape(
+                numerical_observations, (len(numerical_observations), n_observations)
+            )
+            self._sorted_indices = np.argsort(numerical_observations_2d.T, axis=0, kind="stable")
+
+        n_observations, n_params = self._sorted_indices.shape
+        local_indices = np.full(n_observations, -1)
+        local_indices[indices] = np.arange(len(indices))
+        sorted_local_indices = local_indices[self._sorted_indices].T
+        return sorted_local_indices[sorted_local_indices >= 0].reshape(n_params, len(indices)).T
+
+
+class _ObservationSubset(Dict[str, np.ndarray]):
+    """The observations at ``indices`` of :class:`_SharedObservations`.
+
+    :class:`_CustomizableParzenEstimator` takes the sorted order of the numerical observations
+    from the shared ones instead of sorting them again.
+    """
+
+    def __init__(self, shared_observations: _SharedObservations, indices: np.ndarray) -> None:
+        super().__init__(
+            {param: values[indices] for param, values in shared_observations._observations.items()}
+        )
+        self._shared_observations = shared_observations
+        self._indices = indices
+
+    def sorted_indices(self) -> np.ndarray:
+        return self._shared_observations.take_sorted_indices(self._indices)
+
+
+def _insert_prior(sorted_indices: np.ndarray, mus: np.ndarray) -> np.ndarray:
+    # The prior is the last row of ``mus`` and is placed after the observations of the same value
+    # to be consistent with the stable sort.
+    n_observations, n_params = sorted_indices.shape
+    sorted_mus = np.take_along_axis(mus[:-1], sorted_indices, axis=0)
+    prior_positions = np.sum(sorted_mus <= mus[-1], axis=0)
+    is_prior = np.arange(n_observations + 1)[:, np.newaxis] == prior_positions
+    sorted_indices_with_prior = np.empty((n_params, n_observations + 1), dtype=int)
+    sorted_indices_with_prior[is_prior.T] = n_observations
+    sorted_indices_with_prior[~is_prior.T] = sorted_indices.T.ravel()
+    return sorted_indices_with_prior.T
+
+
 class _CustomizableParzenEstimator(_ParzenEstimator):
     def __init__(
         self,
@@ -96,6 +235,7 @@ class _CustomizableParzenEstimator(_ParzenEstimator):
         search_space: dict[str, BaseDistribution],
         parameters: _CustomizableParzenEstimatorParameters,
         predetermined_weights: np.ndarray | None = None,
+        sorted_indices: np.ndarray | None = None,
     ) -> None:
         # NOTE(nabenabe): consider_prior has been removed at Optuna v4.4.
         # cf. https://github.com/optuna/optuna/pull/6007
@@ -106,6 +246,12 @@ class _CustomizableParzenEstimator(_ParzenEstimator):
                 raise ValueError("Prior weight must be positive.")
 
         self._search_space = search_space
+        if (
+            sorted_indices is None
+            and isinstance(observations, _ObservationSubset)
+            and parameters.bandwidth_strategy == "hyperopt"
+        ):
+            sorted_indices = observations.sorted_indices()
 
         transformed_observations = self._transform(observations)
 
@@ -124,37 +270,77 @@ class _CustomizableParzenEstimator(_ParzenEstimator):
             assert parameters.prior_weight is not None
             weights = np.append(weights, [parameters.prior_weight])
         weights /= weights.sum()
+        numerical_distributions = self._calculate_numerical_distributions_at_once(
+            transformed_observations, parameters, sorted_indices
+        )
         self._mixture_distribution = _MixtureOfProductDistribution(
             weights=weights,
             distributions=[
-                self._calculate_distributions(
-                    transformed_observations[:, i], param, search_space[param], parameters
+                (
+                    numerical_distributions[param]
+                    if param in numerical_distributions
+                    else self._calculate_categorical_distributions(
+                        transformed_observations[:, i], param, dist, parameters
+                    )
                 )
-                for i, param in enumerate(search_space)
+                for i, (param, dist) in enumerate(search_space.items())
             ],
         )
 
-    def _calculate_numerical_distributions(
+    def _calculate_numerical_distributions_at_once(
         self,
-        observations: np.ndarray,
-        low: float,
-        high: float,
-        step: float | None,
+        transformed_observations: np.ndarray,
         parameters: _CustomizableParzenEstimatorParameters,
-    ) -> _BatchedDistributions:
-        domain_range = high - low + (step or 0)
-        consider_prior = parameters.consider_prior or len(observations) == 0
+        sorted_indices: np.ndarray | None,
+    ) -> dict[str, _BatchedDistributions]:
+        """Build the kernels of all the numerical parameters from the 2-D observation matrix.
+
+        ``sorted_indices`` is the column-wise sorted order of the numerical observations, e.g.,
+        given by :class:`_SharedObservations`, and the observations are sorted if it is omitted.
+        """
+        columns: list[int] = []
+        lows: list[float] = []
+        highs: list[float] = []
+        steps: list[float | None] = []
+        for i, dist in enumerate(self._search_space.values()):
+            if isinstance(dist, CategoricalDistribution):
+                continue
+            assert isinstance(dist, (FloatDistribution, IntDistribution))
+            low, high, step = dist.low, dist.high, dist.step
+            if dist.log:
+                # TODO(contramundum53): This is a hack and should be fixed.
+                if step is not None:
+                    low, high, step = low - step / 2, high + step / 2, None
+                low, high = np.log(low), np.log(high)
+            columns.append(i)
+            lows.append(low)
+            highs.append(high)
+            steps.append(step)
+
+        if len(columns) == 0:
+            return {}
+
+        observations = transformed_observations[:, columns]
+        n_observations = len(observations)
+        low = np.asarray(lows, dtype=float)
+        high = np.asarray(highs, dtype=float)
+        is_discrete = np.asarray([step is not None for step in steps])
+        step = np.asarray([step or 0 for step in steps], dtype=float)
+        domain_range = high - low + step
+        consider_prior = parameters.consider_prior or n_observations == 0
 
         if consider_prior:
-            mus = np.append(observations, [0.5 * (low + high)])
+            mus = np.vstack([observations, 0.5 * (low + high)])
+            if sorted_indices is not None:
+                sorted_indices = _insert_prior(sorted_indices, mus)
         else:
-            mus = observations.copy()
+            mus = observations
 
         if parameters.bandwidth_strategy == "hyperopt":
-            sigmas = _bandwidth_hyperopt(mus, low, high, step)
+            sigmas = _bandwidth_hyperopt(mus, low, high, step, sorted_indices)
         elif parameters.bandwidth_strategy == "optuna":
             sigmas = _bandwidth_optuna(
-                n_observations=len(observations),
+                n_observations=n_observations,
                 consider_prior=consider_prior,
                 domain_range=domain_range,
                 dim=len(self._search_space),
@@ -166,7 +352,7 @@ class _CustomizableParzenEstimator(_ParzenEstimator):
 
         sigmas = _clip_bandwidth(
             sigmas=sigmas,
-            n_observations=len(observations),
+            n_observations=n_observations,
             domain_range=domain_range,
             consider_magic_clip=parameters.consider_magic_clip,
             consider_prior=consider_prior,
@@ -174,15 +360,24 @@ class _CustomizableParzenEstimator(_ParzenEstimator):
             min_bandwidth_factor=parameters.min_bandwidth_factor,
         )
 
-        if step is not None and parameters.use_min_bandwidth_discrete:
+        if parameters.use_min_bandwidth_discrete and np.any(is_discrete):
             # NOTE(nabenabe0928): This hack is specifically for c-TPE.
-            n_grids = int((high - low) / step + 1)
-            sigmas = np.maximum(sigmas, domain_range / n_grids)
+            n_grids = np.floor((high[is_discrete] - low[is_discrete]) / step[is_discrete] + 1)
+            sigmas[:, is_discrete] = np.maximum(
+                sigmas[:, is_discrete], domain_range[is_discrete] / n_grids
+            )
 
-        if step is None:
-            return _BatchedTruncNormDistributions(mus, sigmas, low, high)
-        else:
-            return _BatchedDiscreteTruncNormDistributions(mus, sigmas, low, high, step)
+        params = list(self._search_space)
+        return {
+            params[i]: (
+                _BatchedDiscreteTruncNormDistributions(
+                    mus[:, j], sigmas[:, j], low[j], high[j], step[j]
+                )
+                if is_discrete[j]
+                else _BatchedTruncNormDistributions(mus[:, j], sigmas[:, j], low[j], high[j])
+            )
+            for j, i in enumerate(columns)
+        }
 
     def _calculate_categorical_distributions(
         self,
@@ -212,3 +407,121 @@ class _CustomizableParzenEstimator(_ParzenEstimator):
             weights[-1] = 1.0 / n_choices
 
         return _BatchedCategoricalDistributions(weights)
+
+
+def _concat_distributions(distributions: list[_BatchedDistributions]) -> _BatchedDistributions:
+    d0 = distributions[0]
+    if isinstance(d0, _BatchedCategoricalDistributions):
+        return _BatchedCategoricalDistributions(np.concatenate([d.weights for d in distributions]))
+
+    mu = np.concatenate([d.mu for d in distributions])  # type: ignore[union-attr]
+    sigma = np.concatenate([d.sigma for d in distributions])  # type: ignore[union-attr]
+    if isinstance(d0, _BatchedTruncNormDistributions):
+        return _BatchedTruncNormDistributions(mu, sigma, d0.low, d0.high)
+    else:
+        assert isinstance(d0, _BatchedDiscreteTruncNormDistributions)
+        return _BatchedDiscreteTruncNormDistributions(mu, sigma, d0.low, d0.high, d0.step)
+
+
+class _BatchedMixtures:
+    """Mixtures of Parzen estimators over the same search space fused into one set of kernels.
+
+    The kernels of all the mixtures are concatenated so that sampling from every mixture and
+    evaluating every sample against every mixture are performed in single vectorized passes
+    instead of one pass per mixture.
+    """
+
+    def __init__(self, mpes: list[_ParzenEstimator]) -> None:
+        assert len(mpes) > 0
+        mixtures = [mpe._mixture_distribution for mpe in mpes]
+        self._mixtures = mixtures
+        # NOTE(nabenabe): All the estimators share the search space, so does the transformation.
+        self._mpe = mpes[0]
+        self._weights = [m.weights for m in mixtures]
+        sizes = np.asarray([len(w) for w in self._weights])
+        self._offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        self._sizes = sizes
+        self._log_weights = np.log(np.concatenate(self._weights))
+        self._distributions = [
+            _concat_distributions([m.distributions[i] for m in mixtures])
+            for i in range(len(mixtures[0].distributions))
+        ]
+
+    @property
+    def n_mixtures(self) -> int:
+        return len(self._sizes)
+
+    def sample(self, rng: np.random.RandomState, size: int) -> dict[str, np.ndarray]:
+        """Draw ``size`` samples from each mixture and concatenate them in the mixture order.
+
+        Each mixture is sampled by itself so that the random numbers are drawn in the same order
+        as sampling from the Parzen estimators one by one, which keeps the seeded results.
+        """
+        samples = np.concatenate([m.sample(rng, size) for m in self._mixtures])
+        return self._mpe._untransform(samples)
+
+    def log_pdf(self, samples_dict: dict[str, np.ndarray]) -> np.ndarray:
+        """Evaluate the log densities of all the mixtures.
+
+        Returns:
+            An array of shape ``(n_mixtures, n_samples)``.
+        """
+        x = self._mpe._transform(samples_dict)
+        n_elements_per_sample = len(self._log_weights) * max(1, len(self._distributions))
+        chunk_size = max(1, _MAX_LOG_PDF_BATCH_ELEMENTS // n_elements_per_sample)
+        return np.concatenate(
+            [
+                self._log_pdf(x[start : start + chunk_size])
+                for start in range(0, len(x), chunk_size)
+            ],
+            axis=-1,
+        )
+
+    def _log_pdf(self, x: np.ndarray) -> np.ndarray:
+        weighted_log_pdf = np.tile(self._log_weights, (len(x), 1))
+        cont_dists: list[_BatchedTruncNormDistributions] = []
+        cont_inds: list[int] = []
+        for i, d in enumerate(self._distributions):
+            if isinstance(d, _BatchedCategoricalDistributions):
+                xi = x[:, i, np.newaxis, np.newaxis].astype(np.int64)
+                weighted_log_pdf += np.log(np.take_along_axis(d.weights[np.newaxis], xi, axis=-1))[
+                    ..., 0
+                ]
+            elif isinstance(d, _BatchedTruncNormDistributions):
+                cont_dists.append(d)
+                cont_inds.append(i)
+            else:
+                assert isinstance(d, _BatchedDiscreteTruncNormDistributions)
+                xi_uniq, xi_inv = np.unique(x[:, i], return_inverse=True)
+                mu_uniq, sigma_uniq, mu_sigma_inv = _unique_inverse_2d(d.mu, d.sigma)
+                weighted_log_pdf += _log_gauss_mass_unique(
+                    ((xi_uniq - d.step / 2)[:, np.newaxis] - mu_uniq) / sigma_uniq,
+                    ((xi_uniq + d.step / 2)[:, np.newaxis] - mu_uniq) / sigma_uniq,
+                )[np.ix_(xi_inv, mu_sigma_inv)]
+                weighted_log_pdf -= _truncnorm._log_gauss_mass(
+                    (d.low - d.step / 2 - mu_uniq) / sigma_uniq,
+                    (d.high + d.step / 2 - mu_uniq) / sigma_uniq,
+                )[mu_sigma_inv]
+
+        if len(cont_inds) > 0:
+            mus_cont = np.asarray([d.mu for d in cont_dists]).T
+            sigmas_cont = np.asarray([d.sigma for d in cont_dists]).T
+            weighted_log_pdf += _truncnorm.logpdf(
+                x[:, np.newaxis, cont_inds],
+                a=(np.asarray([d.low for d in cont_dists]) - mus_cont) / sigmas_cont,
+                b=(np.asarray([d.high for d in cont_dists]) - mus_cont) / sigmas_cont,
+                loc=mus_cont,
+                scale=sigmas_cont,
+            ).sum(axis=-1)
+
+        # Log-sum-exp over the kernels of each mixture.
+        max_ = np.maximum.reduceat(weighted_log_pdf, self._offsets, axis=1)
+        # We need to avoid (-inf) - (-inf) when the probability is zero.
+        max_[np.isneginf(max_)] = 0
+        with np.errstate(divide="ignore"):  # Suppress warning in log(0).
+            sum_exp = np.add.reduceat(
+                np.exp(weighted_log_pdf - np.repeat(max_, self._sizes, axis=1)),
+                self._offsets,
+                axis=1,
+            )
+            return (np.log(sum_exp) + max_).T
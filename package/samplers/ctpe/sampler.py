@@ -3,11 +3,13 @@ from __future__ import annotations
 from collections.abc import Callable
 from collections.abc import Sequence
 from typing import Any
+from typing import NamedTuple
 
 import numpy as np
 from optuna.distributions import BaseDistribution
 from optuna.logging import get_logger
 from optuna.samplers import TPESampler
+from optuna.samplers._base import _CONSTRAINTS_KEY
 from optuna.samplers._tpe.parzen_estimator import _ParzenEstimator
 from optuna.study import Study
 from optuna.study import StudyDirection
@@ -16,13 +18,28 @@ from optuna.trial import TrialState
 
 from .components import GammaFunc
 from .components import WeightFunc
+from .parzen_estimator import _BatchedMixtures
 from .parzen_estimator import _CustomizableParzenEstimator
 from .parzen_estimator import _CustomizableParzenEstimatorParameters
+from .parzen_estimator import _SharedObservations
 
 
 _logger = get_logger(f"optuna.{__name__}")
 
 
+class _TrialSplits(NamedTuple):
+    # The key identifies the set of completed trials used to build the splits.
+    key: tuple[int, tuple[int, ...]]
+    # The (below, above) trials for each constraint followed by the objective.
+    splits: list[tuple[list[FrozenTrial], list[FrozenTrial]]]
+    quantiles: list[float]
+    # The Parzen estimators built from the splits keyed by the search space.
+    parzen_estimators: dict[
+        tuple[tuple[str, BaseDistribution], ...],
+        tuple[list[_ParzenEstimator], list[_ParzenEstimator]],
+    ]
+
+
 class cTPESampler(TPESampler):
     def __init__(
         self,
@@ -78,6 +95,12 @@ class cTPESampler(TPESampler):
             categorical_prior_weight=categorical_prior_weight,
             use_min_bandwidth_discrete=use_min_bandwidth_discrete,
         )
+        # The observations shared among the Parzen estimators being built, which are returned
+        # by _get_internal_repr instead of being computed for each estimator.
+        self._shared_observations: _SharedObservations | None = None
+        # Constraint values keyed by study ID and trial number.
+        self._constraints_cache: dict[int, dict[int, np.ndarray]] = {}
+        self._trial_splits: _TrialSplits | None = None
 
     def _warning_multi_objective_for_ctpe(self, study: Study) -> None:
         """TODO: Use this routine once c-TPE supports multi-objective optimization.
@@ -101,68 +124,127 @@ class cTPESampler(TPESampler):
         """
         self._raise_error_if_multi_objective(study)
 
+    def _get_constraints_vals(self, study: Study, trials: list[FrozenTrial]) -> np.ndarray:
+        # NOTE(nabenabe): The constraint values of a trial never change once it is completed, so
+        # the values stored by ``after_trial`` or computed before are reused.
+        cache = self._constraints_cache.setdefault(study._study_id, {})
+        constraints_vals = []
+        for t in trials:
+            vals = cache.get(t.number)
+            if vals is None:
+                stored_vals = t.system_attrs.get(_CONSTRAINTS_KEY)
+                vals = np.asarray(
+                    stored_vals if stored_vals is not None else self._constraints_func(t),
+                    dtype=float,
+                )
+                cache[t.number] = vals
+            constraints_vals.append(vals)
+        return np.asarray(constraints_vals)
+
+    def _split_trials_for_constraints_and_objective(
+        self, study: Study, trials: list[FrozenTrial]
+    ) -> _TrialSplits:
+        key = (study._study_id, tuple(t.number for t in trials))
+        trial_splits = self._trial_splits
+        if trial_splits is not None and trial_splits.key == key:
+            # No new trials have finished since the last call.
+            return trial_splits
+
+        constraints_vals = self._get_constraints_vals(study, trials)
+        splits: list[tuple[list[FrozenTrial], list[FrozenTrial]]] = []
+        quantiles: list[float] = []
+        for constraint_vals in constraints_vals.T:
+            is_satisfied = (constraint_vals <= 0) | (constraint_vals == min(constraint_vals))
+            satisfied_trials = [t for t, include in zip(trials, is_satisfied) if include]
+            unsatisfied_trials = [t for t, exclude in zip(trials, is_satisfied) if not exclude]
+            splits.append((satisfied_trials, unsatisfied_trials))
+            quantiles.append(len(satisfied_trials) / max(1, len(trials)))
+
+        n_below_feasible = self._gamma(len(trials))
+        below_trials, above_trials = _split_trials_for_ctpe(
+            study, trials, n_below_feasible, is_feasible=np.all(constraints_vals <= 0, axis=-1)
+        )
+        splits.append((below_trials, above_trials))
+        quantiles.append(len(below_trials) / max(1, len(trials)))
+
+        trial_splits = _TrialSplits(key, splits, quantiles, parzen_estimators={})
+        self._trial_splits = trial_splits
+        return trial_splits
+
+    def _get_internal_repr(
+        self, trials: list[FrozenTrial], search_space: dict[str, BaseDistribution]
+    ) -> dict[str, np.ndarray]:
+        shared_observations = self._shared_observations
+        if shared_observations is not None and shared_observations.search_space == search_space:
+            observations = shared_observations.take_trials(trials)
+            if observations is not None:
+                return observations
+        return super()._get_internal_repr(trials, search_space)
+
     def _build_parzen_estimators_for_constraints_and_get_quantiles(
         self,
         trials: list[FrozenTrial],
         study: Study,
         search_space: dict[str, BaseDistribution],
-        constraints_vals: np.ndarray,
     ) -> tuple[list[_ParzenEstimator], list[_ParzenEstimator], list[float]]:
-        mpes_below: list[_ParzenEstimator] = []
-        mpes_above: list[_ParzenEstimator] = []
-        quantiles: list[float] = []
-        for constraint_vals in constraints_vals.T:
-            is_satisfied = (constraint_vals <= 0) | (constraint_vals == min(constraint_vals))
-            satisfied_trials = [t for t, include in zip(trials, is_satisfied) if include]
-            unsatisfied_trials = [t for t, exclude in zip(trials, is_satisfied) if not exclude]
-            mpes_below.append(
-                self._build_parzen_estimator(
-                    study, search_space, satisfied_trials, handle_below=False
-                )
-            )
-            mpes_above.append(
-                self._build_parzen_estimator(
-                    study, search_space, unsatisfied_trials, handle_below=False
-                )
+        trial_splits = self._split_trials_for_constraints_and_objective(study, trials)
+        search_space_key = tuple(search_space.items())
+        parzen_estimators = trial_splits.parzen_estimators.get(search_space_key)
+        if parzen_estimators is None:
+            n_splits = len(trial_splits.splits)
+            # Every split partitions the same trials, so the internal representations are
+            # computed, and sorted if necessary, only once for all the estimators.
+            trial_indices: dict[int, int] = {}
+            n_observations = 0
+            for t in trials:
+                # NOTE: The params of the complete trials are used as they are.
+                if search_space.keys() <= t.params.keys():
+                    trial_indices[t.number] = n_observations
+                    n_observations += 1
+                else:
+                    trial_indices[t.number] = -1
+            shared_observations = _SharedObservations(
+                super()._get_internal_repr(trials, search_space), search_space, trial_indices
             )
-            quantiles.append(len(satisfied_trials) / max(1, len(trials)))
 
-        return mpes_below, mpes_above, quantiles
+            mpes_below: list[_ParzenEstimator] = []
+            mpes_above: list[_ParzenEstimator] = []
+            self._shared_observations = shared_observations
+            try:
+                for i, (trials_below, trials_above) in enumerate(trial_splits.splits):
+                    # Only the last split is for the objective, whose below trials are handled by
+                    # the weights for multi-objective optimization.
+                    is_objective = i == n_splits - 1
+                    mpes_below.append(
+                        self._build_parzen_estimator(
+                            study, search_space, trials_below, handle_below=is_objective
+                        )
+                    )
+                    mpes_above.append(
+                        self._build_parzen_estimator(
+                            study, search_space, trials_above, handle_below=False
+                        )
+                    )
+            finally:
+                self._shared_observations = None
+            parzen_estimators = (mpes_below, mpes_above)
+            trial_splits.parzen_estimators[search_space_key] = parzen_estimators
+
+        mpes_below, mpes_above = parzen_estimators
+        return mpes_below, mpes_above, trial_splits.quantiles
 
     def _sample(
         self, study: Study, trial: FrozenTrial, search_space: dict[str, BaseDistribution]
     ) -> dict[str, Any]:
         self._warning_multi_objective_for_ctpe(study)
         trials = study._get_trials(deepcopy=False, states=(TrialState.COMPLETE,), use_cache=True)
-        constraints_vals = np.asarray([self._constraints_func(t) for t in trials])
         (mpes_below, mpes_above, quantiles) = (
             self._build_parzen_estimators_for_constraints_and_get_quantiles(
-                trials, study, search_space, constraints_vals
+                trials, study, search_space
             )
         )
 
-        n_below_feasible = self._gamma(len(trials))
-        below_trials, above_trials = _split_trials_for_ctpe(
-            study, trials, n_below_feasible, is_feasible=np.all(constraints_vals <= 0, axis=-1)
-        )
-        mpes_below.append(
-            self._build_parzen_estimator(study, search_space, below_trials, handle_below=True)
-        )
-        mpes_above.append(
-            self._build_parzen_estimator(study, search_space, above_trials, handle_below=False)
-        )
-        quantiles.append(len(below_trials) / max(1, len(trials)))
-
-        _samples_below: dict[str, list[np.ndarray]] = {
-            param_name: [] for param_name in search_space
-        }
-        for mpe in mpes_below:
-            for param_name, samples in mpe.sample(self._rng.rng, self._n_ei_candidates).items():
-                _samples_below[param_name].append(samples)
-
-        samples_below = {
-            param_name: np.hstack(samples) for param_name, samples in _samples_below.items()
-        }
+        samples_below = _BatchedMixtures(mpes_below).sample(self._rng.rng, self._n_ei_candidates)
         acq_func_vals = self._compute_acquisition_func(
             samples_below, mpes_below, mpes_above, quantiles
         )
@@ -181,8 +263,9 @@ class cTPESampler(TPESampler):
     ) -> np.ndarray:
         _EPS = 1e-12
         assert len(mpes_above) == len(mpes_below) == len(quantiles)
-        lls_above = np.asarray([mpe_above.log_pdf(samples) for mpe_above in mpes_above])
-        lls_below = np.asarray([mpe_below.log_pdf(samples) for mpe_below in mpes_below])
+        # Evaluate all the samples against all the mixtures in a single vectorized pass.
+        lls = _BatchedMixtures(mpes_below + mpes_above).log_pdf(samples)
+        lls_below, lls_above = lls[: len(mpes_below)], lls[len(mpes_below) :]
         _q = np.asarray(quantiles)[:, np.newaxis]
         log_first_term = np.log(_q + _EPS)
         log_second_term = np.log(1.0 - _q + _EPS) + lls_above - lls_below
@@ -29,9 +29,9 @@ import optunahub
 import pytest
 
 
-cTPESampler = optunahub.load_local_module(
-    package="samplers/ctpe", registry_root="package/"
-).cTPESampler
+ctpe = optunahub.load_local_module(package="samplers/ctpe", registry_root="package/")
+cTPESampler = ctpe.cTPESampler
+_BatchedMixtures = ctpe.parzen_estimator._BatchedMixtures
 
 
 def dummy_constraints(trial: FrozenTrial) -> tuple[float]:
@@ -910,3 +910,154 @@ def test_trial_relative_params(
         return -1
 
     study.optimize(objective, n_trials=10, n_jobs=n_jobs)
+
+
+@pytest.mark.parametrize("multivariate", [True, False])
+def test_constraints_func_is_called_once_per_trial(multivariate: bool) -> None:
+    n_calls: dict[int, int] = {}
+
+    def constraints(trial: FrozenTrial) -> tuple[float, float]:
+        n_calls[trial.number] = n_calls.get(trial.number, 0) + 1
+        return trial.params["x"] - 5.0, trial.params["y"] - 5.0
+
+    sampler = cTPESampler(
+        n_startup_trials=5, multivariate=multivariate, constraints_func=constraints
+    )
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(
+        lambda t: t.suggest_float("x", -10, 10) + t.suggest_float("y", -10, 10), n_trials=20
+    )
+    # ``after_trial`` evaluates the constraints and the sampler reuses the stored values.
+    assert n_calls == {i: 1 for i in range(20)}
+    assert sampler._trial_splits is not None
+    assert len(sampler._trial_splits.splits) == 3
+
+
+def test_batched_mixtures_log_pdf() -> None:
+    search_space = {
+        "x": FloatDistribution(-5, 5),
+        "y": FloatDistribution(1e-3, 1.0, log=True),
+        "z": IntDistribution(0, 10),
+        "c": CategoricalDistribution(["a", "b", "c"]),
+    }
+
+    def constraints(trial: FrozenTrial) -> tuple[float, float]:
+        return trial.params["x"], trial.params["z"] - 5
+
+    sampler = cTPESampler(n_startup_trials=5, constraints_func=constraints, seed=0)
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(
+        lambda t: sum(
+            float(t._suggest(name, d)) if name != "c" else 0.0 for name, d in search_space.items()
+        ),
+        n_trials=20,
+    )
+    trials = study.get_trials(deepcopy=False, states=(TrialState.COMPLETE,))
+    mpes_below, mpes_above, _ = sampler._build_parzen_estimators_for_constraints_and_get_quantiles(
+        trials, study, search_space
+    )
+    mpes = mpes_below + mpes_above
+    batched_mixtures = _BatchedMixtures(mpes_below)
+    samples = batched_mixtures.sample(np.random.RandomState(0), 32)
+    assert all(len(v) == 32 * len(mpes_below) for v in samples.values())
+    for name, dist in search_space.items():
+        assert all(dist._contains(v) for v in samples[name])
+    # The random numbers are drawn in the same order as sampling from each estimator.
+    rng = np.random.RandomState(0)
+    samples_by_mpe = [mpe.sample(rng, 32) for mpe in mpes_below]
+    for name in search_space:
+        np.testing.assert_array_equal(
+            samples[name], np.concatenate([s[name] for s in samples_by_mpe])
+        )
+
+    expected = np.asarray([mpe.log_pdf(samples) for mpe in mpes])
+    actual = _BatchedMixtures(mpes).log_pdf(samples)
+    np.testing.assert_allclose(actual, expected)
+
+
+@pytest.mark.parametrize("consider_prior", [True, False])
+def test_parzen_estimator_with_shared_sorted_indices(consider_prior: bool) -> None:
+    search_space = {
+        "x": FloatDistribution(-5, 5),
+        "y": FloatDistribution(1e-3, 1.0, log=True),
+        "z": IntDistribution(0, 4),
+        "c": CategoricalDistribution(["a", "b", "c"]),
+    }
+    rng = np.random.RandomState(0)
+    n_trials = 30
+    observations = {
+        "x": rng.uniform(-5, 5, n_trials),
+        "y": np.exp(rng.uniform(np.log(1e-3), 0, n_trials)),
+        # Many ties and the prior at the center of the range.
+        "z": rng.randint(0, 5, n_trials).astype(float),
+        "c": rng.randint(0, 3, n_trials).astype(float),
+    }
+    parameters = ctpe.parzen_estimator._CustomizableParzenEstimatorParameters(
+        consider_prior=consider_prior,
+        prior_weight=1.0,
+        consider_magic_clip=True,
+        weights=lambda n: np.ones(n),
+        multivariate=True,
+        b_magic_exponent=np.inf,
+        min_bandwidth_factor=0.01,
+        bandwidth_strategy="hyperopt",
+        use_min_bandwidth_discrete=True,
+        categorical_prior_weight=0.2,
+    )
+    shared_observations = ctpe.parzen_estimator._SharedObservations(observations, search_space)
+    indices = np.sort(rng.permutation(n_trials)[:17])
+    subset = shared_observations.take(indices)
+    mpe = ctpe.parzen_estimator._CustomizableParzenEstimator(
+        dict(subset), search_space, parameters
+    )
+    mpe_with_sorted_indices = ctpe.parzen_estimator._CustomizableParzenEstimator(
+        subset,
+        search_space,
+        parameters,
+        sorted_indices=shared_observations.take_sorted_indices(indices),
+    )
+    for d1, d2 in zip(
+        mpe._mixture_distribution.distributions,
+        mpe_with_sorted_indices._mixture_distribution.distributions,
+    ):
+        for v1, v2 in zip(d1, d2):
+            np.testing.assert_array_equal(v1, v2)
+
+
+def test_get_internal_repr_with_shared_observations() -> None:
+    search_space = {"x": FloatDistribution(-5, 5), "c": CategoricalDistribution(["a", "b"])}
+    sampler = cTPESampler(constraints_func=dummy_constraints)
+    trials = [
+        optuna.create_trial(
+            params={"x": i - 5.0, "c": "ab"[i % 2]},
+            distributions=search_space,
+            value=float(i),
+        )
+        for i in range(10)
+    ]
+    trials.append(
+        optuna.create_trial(params={"x": 0.5}, distributions={"x": search_space["x"]}, value=0.0)
+    )
+    for number, trial in enumerate(trials):
+        trial.number = number
+    trial_indices = {number: number for number in range(10)}
+    trial_indices[10] = -1
+    sampler._shared_observations = ctpe.parzen_estimator._SharedObservations(
+        sampler._get_internal_repr(trials, search_space), search_space, trial_indices
+    )
+    for subset in [trials[::2], trials[7:], trials[:0]]:
+        observations = sampler._get_internal_repr(subset, search_space)
+        assert isinstance(observations, ctpe.parzen_estimator._ObservationSubset)
+        expected = super(cTPESampler, sampler)._get_internal_repr(subset, search_space)
+        assert observations.keys() == expected.keys()
+        for param, values in expected.items():
+            np.testing.assert_array_equal(observations[param], values)
+
+    # Falls back to the observations computed from the trials not shared.
+    unknown_trial = optuna.create_trial(
+        params={"x": 1.0, "c": "a"}, distributions=search_space, value=0.0
+    )
+    unknown_trial.number = 100
+    observations = sampler._get_internal_repr([unknown_trial], search_space)
+    assert not isinstance(observations, ctpe.parzen_estimator._ObservationSubset)
+    np.testing.assert_array_equal(observations["x"], [1.0])
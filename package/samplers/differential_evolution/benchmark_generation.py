@@ -0,0 +1,97 @@
+"""
+Micro-benchmark for the trial-vector generation of DESampler.
+
+This script compares the per-individual loop, which was used to build a generation before,
+with the vectorized generation kernel in ``DESampler._generate_trial_vectors``.
+Run it from the root of the registry:
+
+$ python package/samplers/differential_evolution/benchmark_generation.py
+
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable
+import time
+from typing import Any
+
+import numpy as np
+import optunahub
+
+
+DESampler = optunahub.load_local_module(
+    package="samplers/differential_evolution", registry_root="package/"
+).DESampler
+
+
+def generate_trial_vectors_loop(sampler: Any, active_indices: list[int]) -> np.ndarray:
+    """The previous implementation that builds one trial vector per individual.
+
+    Args:
+        sampler:
+            The DESampler whose population and bounds are already initialized.
+        active_indices:
+            Indices of active dimensions in the current trial's search space.
+
+    Returns:
+        Array of trial vectors (population_size x len(active_indices)).
+    """
+    rng = sampler._rng.rng
+    population_size = sampler.population_size
+    trial_vectors = np.zeros((population_size, len(active_indices)))
+    lower = sampler.lower_bound[active_indices]
+    upper = sampler.upper_bound[active_indices]
+
+    for i in range(population_size):
+        indices = [idx for idx in range(population_size) if idx != i]
+        r1, r2, r3 = rng.choice(indices, 3, replace=False)
+        valid_population = np.nan_to_num(
+            sampler.population[:, active_indices], nan=(lower + upper) / 2
+        )
+        mutant = valid_population[r1] + sampler.F * (valid_population[r2] - valid_population[r3])
+        mutant = np.clip(mutant, lower, upper)
+        trial = np.copy(valid_population[i])
+        crossover_mask = rng.rand(len(active_indices)) < sampler.CR
+        if not np.any(crossover_mask):
+            crossover_mask[rng.randint(len(active_indices))] = True
+        trial[crossover_mask] = mutant[crossover_mask]
+        trial_vectors[i] = trial
+
+    return trial_vectors
+
+
+def build_sampler(population_size: int, dim: int, seed: int = 0) -> Any:
+    sampler = DESampler(population_size=population_size, seed=seed)
+    sampler.dim = dim
+    sampler.lower_bound = np.full(dim, -5.0)
+    sampler.upper_bound = np.full(dim, 5.0)
+    sampler.population = sampler._rng.rng.uniform(-5.0, 5.0, size=(population_size, dim))
+    # Emulate dimensions that were added in later trials.
+    sampler.population[: population_size // 2, -1] = np.nan
+    return sampler
+
+
+def measure(func: Callable[[], Any], n_repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n_repeats):
+        func()
+    return (time.perf_counter() - start) / n_repeats
+
+
+def main() -> None:
+    dim = 100
+    active_indices = list(range(dim))
+    print(f"{'population_size':>15} {'loop [ms]':>12} {'vectorized [ms]':>16} {'speedup':>8}")
+    for population_size in [20, 50, 100, 200, 500, 1000, 2000]:
+        sampler = build_sampler(population_size, dim)
+        n_repeats = max(1, 2000 // population_size)
+        t_loop = measure(lambda: generate_trial_vectors_loop(sampler, active_indices), n_repeats)
+        t_vec = measure(lambda: sampler._generate_trial_vectors(active_indices), n_repeats)
+        print(
+            f"{population_size:>15} {t_loop * 1e3:>12.3f} {t_vec * 1e3:>16.3f} "
+            f"{t_loop / t_vec:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
 import time
 from typing import Any
+from typing import cast
 
 import numpy as np
 import optuna
@@ -82,6 +84,8 @@ class DESampler(optunahub.samplers.SimpleBaseSampler):
             Last processed generation.
         current_gen_vectors:
             Trial vectors for the current generation.
+        _generation_trials:
+            Parameters and values of completed trials keyed by generation and trial ID.
     """
 
     def __init__(
@@ -131,6 +135,7 @@ class DESampler(optunahub.samplers.SimpleBaseSampler):
         # Generation management
         self.last_processed_gen = -1
         self.current_gen_vectors: np.ndarray | None = None
+        self._generation_trials: dict[int, dict[int, tuple[dict[str, Any], float]]] = {}
 
     def _determine_pop_size(
         self, search_space: dict[str, optuna.distributions.BaseDistribution] | None
@@ -215,43 +220,70 @@ class DESampler(optunahub.samplers.SimpleBaseSampler):
         if not isinstance(self.population_size, int):
             raise ValueError("Population size must be resolved to an integer before this point.")
 
-        trial_vectors = np.zeros((self.population_size, len(active_indices)))
+        if self.population is None or self.lower_bound is None or self.upper_bound is None:
+            raise ValueError(
+                "Population, lower_bound, and upper_bound must be initialized before this operation."
+            )
 
-        for i in range(self.population_size):
-            # Select three random distinct individuals for mutation
-            indices = [idx for idx in range(self.population_size) if idx != i]
-            r1, r2, r3 = self._rng.rng.choice(indices, 3, replace=False)
+        n = self.population_size
+        n_active = len(active_indices)
+        rng = self._rng.rng
+        lower = self.lower_bound[active_indices]
+        upper = self.upper_bound[active_indices]
 
-            if self.population is None or self.lower_bound is None or self.upper_bound is None:
-                raise ValueError(
-                    "Population, lower_bound, and upper_bound must be initialized before this operation."
-                )
+        # Handle NaN values by filling with default (mean of bounds) once for the whole generation
+        population = self.population[:, active_indices]
+        valid_population = np.where(np.isnan(population), (lower + upper) / 2, population)
 
-            # Handle NaN values by filling with default (mean of bounds)
-            valid_population = np.nan_to_num(
-                self.population[:, active_indices],
-                nan=(self.lower_bound[active_indices] + self.upper_bound[active_indices]) / 2,
-            )
+        # Select three random distinct individuals for each target without building index lists
+        r1, r2, r3 = self._select_distinct_indices(n)
 
-            # Mutation: v = x_r1 + F * (x_r2 - x_r3) for active indices only
-            mutant = valid_population[r1] + self.F * (valid_population[r2] - valid_population[r3])
-            # Clip mutant vector to bounds for active dimensions
-            mutant = np.clip(
-                mutant, self.lower_bound[active_indices], self.upper_bound[active_indices]
-            )
+        # Mutation: v = x_r1 + F * (x_r2 - x_r3) for active indices only
+        mutants = valid_population[r1] + self.F * (valid_population[r2] - valid_population[r3])
+        # Clip mutant vectors to bounds for active dimensions
+        mutants = np.clip(mutants, lower, upper)
+
+        # Crossover: combine target vectors with mutant vectors
+        crossover_mask = rng.rand(n, n_active) < self.CR
 
-            # Crossover: combine target vector with mutant vector
-            trial = np.copy(valid_population[i])
-            crossover_mask = self._rng.rng.rand(len(active_indices)) < self.CR
+        # Ensure at least one parameter is taken from mutant vector for each individual
+        rows = np.flatnonzero(~crossover_mask.any(axis=1))
+        crossover_mask[rows, rng.randint(n_active, size=rows.size)] = True
 
-            # Ensure at least one parameter is taken from mutant vector
-            if not np.any(crossover_mask):
-                crossover_mask[self._rng.rng.randint(len(active_indices))] = True
-            trial[crossover_mask] = mutant[crossover_mask]
+        return np.where(crossover_mask, mutants, valid_population)
 
-            trial_vectors[i] = trial
+    def _select_distinct_indices(self, n: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Select indices r1, r2, r3 for every individual in a vectorized manner.
 
-        return trial_vectors
+        For each individual ``i``, ``r1``, ``r2`` and ``r3`` are drawn uniformly without
+        replacement from the population excluding ``i`` itself.
+
+        Args:
+            n:
+                The population size.
+
+        Returns:
+            tuple:
+                A tuple of three integer arrays of shape ``(n,)``.
+        """
+        if n < 4:
+            raise ValueError("Population size must be at least 4 to select r1, r2 and r3.")
+
+        rng = self._rng.rng
+        # Draw from a range shrinking by one per pick and skip already drawn values so that
+        # (r1, r2, r3) is a uniform sample without replacement from n - 1 candidates.
+        r1 = rng.randint(n - 1, size=n)
+        r2 = rng.randint(n - 2, size=n)
+        r2 += r2 >= r1
+        r3 = rng.randint(n - 3, size=n)
+        low = np.minimum(r1, r2)
+        high = np.maximum(r1, r2)
+        r3 += r3 >= low
+        r3 += r3 >= high
+
+        # Map the candidates back to population indices, skipping the target individual.
+        target = np.arange(n)
+        return r1 + (r1 >= target), r2 + (r2 >= target), r3 + (r3 >= target)
 
     def _debug_print(self, message: str) -> None:
         """Print debug message if debug mode is enabled.
@@ -288,8 +320,14 @@ class DESampler(optunahub.samplers.SimpleBaseSampler):
             self.last_time = current_time
             self.last_trial_count = n_completed
 
-    def _get_generation_trials(self, study: optuna.study.Study, generation: int) -> list:
-        """Get all completed trials for a specific generation.
+    def _get_generation_trials(
+        self, study: optuna.study.Study, generation: int
+    ) -> list[tuple[dict[str, Any], float]]:
+        """Get the parameters and values of all completed trials for a specific generation.
+
+        The trials are collected incrementally in ``after_trial``. Trials that finished in other
+        processes, e.g., in a resumed or distributed study, are fetched from the storage by
+        ``_resync_generation`` only when the generation is not complete yet.
 
         Args:
             study:
@@ -299,17 +337,81 @@ class DESampler(optunahub.samplers.SimpleBaseSampler):
 
         Returns:
             list:
-                A list of completed trials for the specified generation.
+                A list of ``(params, value)`` of completed trials for the specified generation,
+                sorted by the trial ID.
         """
-        all_trials = study.get_trials(deepcopy=False)
-        return [
-            t
-            for t in all_trials
+        bucket = self._generation_trials.setdefault(generation, {})
+        if len(bucket) < cast(int, self.population_size):
+            self._resync_generation(study, generation, bucket)
+        return [bucket[trial_id] for trial_id in sorted(bucket)]
+
+    def _resync_generation(
+        self,
+        study: optuna.study.Study,
+        generation: int,
+        bucket: dict[int, tuple[dict[str, Any], float]],
+    ) -> None:
+        """Fill the bucket of a generation with trials that finished outside this sampler.
+
+        Since the generation of a trial is determined by its trial ID, only the trial IDs
+        belonging to the generation are looked up, so the cost is O(population_size) regardless
+        of the number of trials in the study.
+
+        Args:
+            study:
+                Optuna study object.
+            generation:
+                The generation number.
+            bucket:
+                The bucket of the generation to fill.
+        """
+        population_size = cast(int, self.population_size)
+        storage = study._storage
+        for trial_id in range(generation * population_size, (generation + 1) * population_size):
+            if trial_id in bucket:
+                continue
+            try:
+                t = storage.get_trial(trial_id)
+            except KeyError:
+                continue
             if (
-                t.state == optuna.trial.TrialState.COMPLETE
-                and t.system_attrs.get("differential_evolution:generation") == generation
-            )
-        ]
+                t.state != optuna.trial.TrialState.COMPLETE
+                or t.system_attrs.get("differential_evolution:generation") != generation
+                or storage.get_trial_id_from_study_id_trial_number(study._study_id, t.number)
+                != trial_id
+            ):
+                continue
+            bucket[trial_id] = (t.params, cast(float, t.value))
+
+    def after_trial(
+        self,
+        study: optuna.study.Study,
+        trial: optuna.trial.FrozenTrial,
+        state: optuna.trial.TrialState,
+        values: Sequence[float] | None,
+    ) -> None:
+        """Register a completed trial to the bucket of its generation.
+
+        Args:
+            study:
+                Optuna study object.
+            trial:
+                The finished trial.
+            state:
+                The state of the finished trial.
+            values:
+                The objective values of the finished trial.
+        """
+        if state != optuna.trial.TrialState.COMPLETE or values is None:
+            return
+        generation = trial.system_attrs.get("differential_evolution:generation")
+        # Trials of the already processed generations are not used anymore.
+        if generation is None or generation < self.last_processed_gen:
+            return
+        self._generation_trials.setdefault(generation, {})[trial._trial_id] = (
+            trial.params,
+            values[0],
+        )
 
     def reseed_rng(self) -> None:
         """Reseed the random number generator for the sampler."""
@@ -440,7 +542,7 @@ class DESampler(optunahub.samplers.SimpleBaseSampler):
                 self._debug_print(f"\nProcessing generation {prev_gen}")
 
                 # Get fitness and parameter values from previous generation
-                trial_fitness = np.array([sign * t.value for t in prev_trials])
+                trial_fitness = np.array([sign * value for _, value in prev_trials])
 
                 # Initialize trial_vectors with uniform size, using NaN or a default value for missing parameters
                 trial_vectors = np.full(
@@ -448,10 +550,10 @@ class DESampler(optunahub.samplers.SimpleBaseSampler):
                     np.nan,  # Placeholder for missing parameters
                 )
 
-                for i, t in enumerate(prev_trials):
+                for i, (params, _) in enumerate(prev_trials):
                     for j, name in enumerate(self.numerical_params):
-                        if name in t.params:  # Only include active parameters
-                            trial_vectors[i, j] = t.params[name]
+                        if name in params:  # Only include active parameters
+                            trial_vectors[i, j] = params[name]
 
                 if self.fitness is None:
                     raise ValueError("Fitness array must be initialized before this operation.")
@@ -473,6 +575,11 @@ class DESampler(optunahub.samplers.SimpleBaseSampler):
                 self.current_gen_vectors = self._generate_trial_vectors(active_indices)
                 self.last_processed_gen = current_generation
 
+                # Drop the buckets of the processed generations to keep the index bounded.
+                for generation in list(self._generation_trials):
+                    if generation <= prev_gen:
+                        self._generation_trials.pop(generation, None)
+
         # Ensure we have trial vectors for current generation
         if self.current_gen_vectors is None:
             self.current_gen_vectors = self._generate_trial_vectors(active_indices)
@@ -54,8 +54,7 @@ import pytest
 
 # NOTE(nabenabe): This file content is mostly copied from the Optuna repository.
 The_Sampler = optunahub.load_local_module(
-    package="package/samplers/differential_evolution",
-    registry_root="/home/j/experiments/optunahub-registry",
+    package="samplers/differential_evolution", registry_root="package/"
 ).DESampler
 
 
@@ -755,3 +754,52 @@ def test_cache_is_invalidated(
             return -1
 
         study.optimize(objective, n_trials=10, n_jobs=n_jobs)
+
+
+@pytest.mark.parametrize("population_size", [4, 5, 20, 200])
+def test_generate_trial_vectors(population_size: int) -> None:
+    sampler = The_Sampler(population_size=population_size, seed=0)
+    dim = 3
+    sampler.lower_bound = np.zeros(dim)
+    sampler.upper_bound = np.full(dim, 10.0)
+    sampler.population = sampler._rng.rng.uniform(0.0, 10.0, size=(population_size, dim))
+    sampler.population[:, 1] = np.nan
+
+    r1, r2, r3 = sampler._select_distinct_indices(population_size)
+    target = np.arange(population_size)
+    for r in (r1, r2, r3):
+        assert np.all((0 <= r) & (r < population_size))
+        assert np.all(r != target)
+    assert np.all((r1 != r2) & (r2 != r3) & (r1 != r3))
+
+    active_indices = [0, 1]
+    trial_vectors = sampler._generate_trial_vectors(active_indices)
+    assert trial_vectors.shape == (population_size, len(active_indices))
+    assert np.all((0.0 <= trial_vectors) & (trial_vectors <= 10.0))
+    # NaN values of a newly added dimension are filled with the mean of the bounds.
+    assert np.all(trial_vectors[:, 1] == 5.0)
+
+
+def test_generation_trials_are_resynced_from_storage() -> None:
+    population_size = 4
+    search_space = {"x": FloatDistribution(-5, 5)}
+
+    def objective(trial: Trial) -> float:
+        return trial.suggest_float("x", -5, 5) ** 2
+
+    sampler = The_Sampler(search_space, population_size=population_size, seed=0)
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(objective, n_trials=2 * population_size)
+    assert sampler.last_processed_gen == 1
+    # The processed generations are dropped from the index.
+    assert list(sampler._generation_trials) == [1]
+
+    # A sampler of a resumed study does not see the previous trials in ``after_trial``.
+    sampler = The_Sampler(search_space, population_size=population_size, seed=0)
+    study = optuna.load_study(study_name=study.study_name, storage=study._storage, sampler=sampler)
+    with patch.object(study, "get_trials", wraps=study.get_trials) as mock_get_trials:
+        study.optimize(objective, n_trials=population_size)
+    assert sampler.last_processed_gen == 2
+    assert list(sampler._generation_trials) == [2]
+    # The completed trials are not rescanned to build a generation.
+    mock_get_trials.assert_not_called()
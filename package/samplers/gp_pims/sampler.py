@@ -2,16 +2,20 @@ from __future__ import annotations
 
 from abc import ABCMeta
 from abc import abstractmethod
-from abc.collections import Callable
+from collections.abc import Callable
 import time
 from typing import Any
 
 import GPy
+from GPy.inference.latent_function_inference.posterior import PosteriorExact
 import numpy as np
 import optuna
 from optuna.distributions import FloatDistribution
 import optunahub
 from scipy import optimize
+from scipy.linalg import cho_solve
+from scipy.linalg import cholesky
+from scipy.linalg import solve_triangular
 from scipy.stats import qmc
 
 
@@ -21,7 +25,11 @@ class RFM_RBF:
     """
 
     def __init__(
-        self, lengthscales: float, input_dim: int, variance: float = 1, basis_dim: int = 1000
+        self,
+        lengthscales: float | np.ndarray,
+        input_dim: int,
+        variance: float = 1,
+        basis_dim: int = 1000,
     ) -> None:
         self.basis_dim = basis_dim
         self.std = np.sqrt(variance)
@@ -47,6 +55,33 @@ class RFM_RBF:
         )
         return X_transform_grad
 
+    def weighted_sum_with_grad(
+        self, X: np.ndarray, weights: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return transform(X[j]).dot(weights[:, j]) and its gradient w.r.t. X[j] for each j at once.
+
+        Parameter
+        -----------------------
+        X: numpy array
+            inputs with the shape of (num_weights, N, input_dim)
+        weights: numpy array
+            weights of the basis with the shape of (basis_dim, num_weights)
+
+        Return
+        -----------------------
+        values: numpy array
+            (num_weights, N)
+        gradients: numpy array
+            (num_weights, N, input_dim)
+        """
+        coef = self.std * np.sqrt(2 / self.basis_dim)
+        X_transform = X.dot(self.random_weights.T) + self.random_offset
+        weights_T = weights.T[:, np.newaxis, :]
+        values = coef * (np.cos(X_transform) * weights_T).sum(axis=-1)
+        gradients = -coef * (np.sin(X_transform) * weights_T).dot(self.random_weights)
+        return values, gradients
+
 
 def minimize(
     func: Callable,
@@ -86,7 +121,88 @@ def minimize(
     return x[min_index], func_values[min_index]
 
 
+def maximize_sample_paths(
+    rbf_features: RFM_RBF,
+    weights_sample: np.ndarray,
+    start_points: np.ndarray,
+    bounds: np.ndarray,
+    top_ratio: float = 0.1,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Maximize all the sample paths transform(x).dot(weights_sample[:, j]) jointly.
+
+    Each sample path is evaluated at all the start points at once, and L-BFGS-B starts only from
+    the best top_ratio of them for each sample path. Since the sum of the sample paths over the
+    starts and the paths is separable, it is maximized by a single L-BFGS-B, where each iteration
+    evaluates all the starts of all the sample paths by one batched computation.
+
+    Return
+    -----------------------
+    max_inputs: numpy array
+        (sampling_num, input_dim)
+    max_values: numpy array
+        (sampling_num, )
+    """
+    num_paths = np.shape(weights_sample)[1]
+    num_start, input_dim = np.shape(start_points)
+    num_local_search = max(1, int(np.ceil(num_start * top_ratio)))
+
+    values, _ = rbf_features.weighted_sum_with_grad(
+        np.broadcast_to(start_points, (num_paths, num_start, input_dim)), weights_sample
+    )
+    top_idx = np.argpartition(-values, num_local_search - 1, axis=1)[:, :num_local_search]
+    x0s = start_points[top_idx]
+
+    def minus_sample_paths(x: np.ndarray) -> tuple[float, np.ndarray]:
+        values, gradients = rbf_features.weighted_sum_with_grad(
+            x.reshape(num_paths, num_local_search, input_dim), weights_sample
+        )
+        return -values.sum(), -gradients.ravel()
+
+    x_opt, _, _ = optimize.fmin_l_bfgs_b(
+        minus_sample_paths,
+        x0=x0s.ravel(),
+        bounds=np.tile(np.asarray(bounds).T, (num_paths * num_local_search, 1)),
+    )
+    x_opt = x_opt.reshape(num_paths, num_local_search, input_dim)
+    values, _ = rbf_features.weighted_sum_with_grad(x_opt, weights_sample)
+    max_index = np.argmax(values, axis=1)
+    path_index = np.arange(num_paths)
+    return x_opt[path_index, max_index], values[path_index, max_index]
+
+
+def extend_cholesky(
+    L: np.ndarray, K_cross: np.ndarray, K_new: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Extend the lower Cholesky factor L of K to that of [[K, K_cross], [K_cross^T, K_new]].
+
+    Only the new rows are computed, which costs O(n^2 m) for m new rows instead of O((n + m)^3)
+    for the decomposition from scratch. numpy.linalg.LinAlgError is raised if the Schur complement
+    is not positive definite.
+
+    Return
+    -----------------------
+    L_extended: numpy array
+        (n + m, n + m)
+    L_cross: numpy array
+        the new off-diagonal block of L_extended with the shape of (m, n)
+    """
+    L_cross = solve_triangular(L, K_cross, lower=True).T
+    L_new = np.linalg.cholesky(K_new - L_cross.dot(L_cross.T))
+    n, m = np.shape(L_cross)[1], np.shape(L_new)[0]
+    L_extended = np.zeros((n + m, n + m))
+    L_extended[:n, :n] = L
+    L_extended[n:, :n] = L_cross
+    L_extended[n:, n:] = L_new
+    return L_extended, L_cross
+
+
 class GPy_model(GPy.models.GPRegression):
+    # The Cholesky factor of the kernel matrix and the kernel matrix extended by add_XY, which are
+    # consumed by the next parameters_changed instead of the inference from scratch.
+    _extended_woodbury_chol: tuple[np.ndarray, np.ndarray] | None = None
+
     def __init__(
         self,
         X: np.ndarray,
@@ -111,10 +227,12 @@ class GPy_model(GPy.models.GPRegression):
 
     def minus_predict_gradients(self, x: np.ndarray) -> np.ndarray:
         x = np.atleast_2d(x)
-        # This returns a tuple with the gradient of the mean in [0] and the gradient of the variance in [1]
-        # mu_jac = np.array(list(super().predictive_gradients(x))[0]).ravel()
-        mu_jac = super().predictive_gradients(x)[0].ravel()
-        return -1 * mu_jac
+        # The gradient of the mean in predictive_gradients, which is computed here by itself since
+        # predictive_gradients also computes that of the variance with the inverse kernel matrix.
+        mu_jac = self.kern.gradients_X(
+            self.posterior.woodbury_vector.T, x, self._predictive_variable
+        )
+        return -1 * mu_jac.ravel() * np.ravel(self.std)
 
     def posterior_covariance_between_points(self, X1: np.ndarray, X2: np.ndarray) -> np.ndarray:
         Kx1 = self.kern.K(X1, self.X)
@@ -141,13 +259,47 @@ class GPy_model(GPy.models.GPRegression):
         super().optimize()
         super().optimize_restarts(num_restarts=num_restarts)
 
+    def parameters_changed(self) -> None:
+        if self._extended_woodbury_chol is None:
+            super().parameters_changed()
+            return
+
+        woodbury_chol, K = self._extended_woodbury_chol
+        self._extended_woodbury_chol = None
+        Y_normalized = np.asarray(self.Y_normalized)
+        alpha = cho_solve((woodbury_chol, True), Y_normalized)
+        self.posterior = PosteriorExact(woodbury_chol=woodbury_chol, woodbury_vector=alpha, K=K)
+        # The same log marginal likelihood as ExactGaussianInference. The gradients are not
+        # updated since they are computed again whenever the kernel parameters change.
+        self._log_marginal_likelihood = 0.5 * (
+            -Y_normalized.size * np.log(2 * np.pi)
+            - Y_normalized.shape[1] * 2 * np.sum(np.log(np.diag(woodbury_chol)))
+            - np.sum(alpha * Y_normalized)
+        )
+
     def add_XY(self, X: np.ndarray, Y: np.ndarray) -> None:
         new_X = np.r_[self.X, X]
         new_Y = np.r_[self.Y, Y]
 
-        fidelity_sort_index = np.argsort(new_X[:, -1])
-        new_X = new_X[fidelity_sort_index]
-        new_Y = new_Y[fidelity_sort_index]
+        # The kernel parameters are not changed by the new data, so the Cholesky factor of the
+        # kernel matrix is extended only by the new rows in O(n^2) instead of the O(n^3) inference.
+        K = self.posterior._K
+        if K is not None:
+            K_cross = self.kern.K(self.X, X)
+            K_new = self.kern.K(X)
+            # The same noise and jitter as ExactGaussianInference.
+            variance = self.likelihood.gaussian_variance(self.Y_metadata)
+            K_new_noisy = K_new + np.eye(len(X)) * (variance + 1e-8)
+            try:
+                woodbury_chol, _ = extend_cholesky(
+                    self.posterior.woodbury_chol, K_cross, K_new_noisy
+                )
+                self._extended_woodbury_chol = (
+                    woodbury_chol,
+                    np.block([[K, K_cross], [K_cross.T, K_new]]),
+                )
+            except np.linalg.LinAlgError:
+                self._extended_woodbury_chol = None
         self.set_XY(new_X, new_Y)
 
         if self.normalizer is not None:
@@ -226,6 +378,11 @@ class BO_core(object):
         self.top_number = 50
         self.preprocessing_time = 0.0
         self.max_inputs = None
+        # The RFM basis, which is sampled in the first call of _update_rfm_cache.
+        self.rbf_features: RFM_RBF
+        self._rfm_cache_key: tuple[np.ndarray, np.ndarray] | None = None
+        self._X_train_features: np.ndarray = np.empty((0, 0))
+        self._gram_cholesky: np.ndarray = np.empty((0, 0))
 
     def update(self, X: np.ndarray, Y: np.ndarray, optimize: bool = False) -> None:
         self.GPmodel.add_XY(X, Y)
@@ -284,39 +441,31 @@ class BO_core(object):
     def sampling_RFM(
         self, pool_X: np.ndarray | None = None, MES_correction: bool = True
     ) -> tuple[np.ndarray, np.ndarray]:
-        # 基底をサンプリング, n_compenontsは基底数, random_stateは基底サンプリング時のseed的なの
-        basis_dim = 500 + np.shape(self.GPmodel.X)[0]
-        self.rbf_features = RFM_RBF(
-            lengthscales=self.GPmodel[".*rbf.lengthscale"].values,
-            input_dim=self.input_dim,
-            basis_dim=basis_dim,
+        lengthscales = self.GPmodel[".*rbf.lengthscale"].values
+        noise_var = self.GPmodel[".*Gaussian_noise.variance"].values
+        self._update_rfm_cache(lengthscales, noise_var)
+        X_train_features = self._X_train_features
+        gram_cholesky = (self._gram_cholesky, True)
+        data_num = np.shape(X_train_features)[0]
+
+        # The weights follow N(A^-1 Phi^T y, noise_var * A^-1) with A = Phi^T Phi + noise_var * I.
+        # We sample them by Matheron's rule instead of inverting the (basis_dim, basis_dim)
+        # matrix A:
+        #     w = w0 + Phi^T (Phi Phi^T + noise_var * I)^-1 (y - Phi w0 - e),
+        # where w0 ~ N(0, I) and e ~ N(0, noise_var * I), which only requires the Cholesky
+        # decomposition of the (data_num, data_num) matrix.
+        prior_weights = np.random.normal(
+            0, 1, size=(self.rbf_features.basis_dim, self.sampling_num)
         )
-        X_train_features = self.rbf_features.transform(self.GPmodel.X)
-
-        max_sample = np.zeros(self.sampling_num)
-        max_inputs = list()
-
-        A_inv = np.linalg.inv(
-            (X_train_features.T).dot(X_train_features)
-            + np.eye(self.rbf_features.basis_dim)
-            * self.GPmodel[".*Gaussian_noise.variance"].values
-        )
-        weights_mean = A_inv.dot(X_train_features.T).dot(
+        noise = np.sqrt(noise_var) * np.random.normal(0, 1, size=(data_num, self.sampling_num))
+        residuals = (
             (self.GPmodel.Y - self.GPmodel.mean) / self.GPmodel.std
+            - X_train_features.dot(prior_weights)
+            - noise
         )
-        weights_var = A_inv * self.GPmodel[".*Gaussian_noise.variance"].values
-
-        try:
-            L = np.linalg.cholesky(weights_var)
-        except np.linalg.LinAlgError as e:
-            print("In RFM-based sampling,", e)
-            L = np.linalg.cholesky(weights_var + 1e-5 * np.eye(np.shape(weights_var)[0]))
-
-        # 自分で多次元正規乱数のサンプリング
-        standard_normal_rvs = np.random.normal(
-            0, 1, size=(np.size(weights_mean), self.sampling_num)
+        self.weights_sample = prior_weights + X_train_features.T.dot(
+            cho_solve(gram_cholesky, residuals)
         )
-        self.weights_sample = np.c_[weights_mean] + L.dot(standard_normal_rvs)
 
         if pool_X is None:
             num_start = 100 * self.input_dim
@@ -332,34 +481,20 @@ class BO_core(object):
                 mean = mean.ravel()
                 top_idx = np.argpartition(mean, -self.top_number)[-self.top_number :]
                 x0s = np.r_[x0s, self.unique_X[top_idx]]
+
+            max_inputs, max_values = maximize_sample_paths(
+                self.rbf_features, self.weights_sample, x0s, self.bounds
+            )
+            max_sample = max_values * self.GPmodel.std + self.GPmodel.mean
         else:
+            candidates = pool_X
             if np.size(pool_X[(self._upper_bound(pool_X) >= self.y_max).ravel()]) > 0:
-                pool_X = pool_X[(self._upper_bound(pool_X) >= self.y_max).ravel()]
-
-        for j in range(self.sampling_num):
-
-            def BLR(x: np.ndarray) -> np.ndarray:
-                X_features = self.rbf_features.transform(x)
-                sampled_value = X_features.dot(np.c_[self.weights_sample[:, j]])
-                return -(sampled_value * self.GPmodel.std + self.GPmodel.mean).ravel()
+                candidates = pool_X[(self._upper_bound(pool_X) >= self.y_max).ravel()]
 
-            def BLR_gradients(x: np.ndarray) -> np.ndarray:
-                X_features = self.rbf_features.transform_grad(x)
-                sampled_value = X_features.dot(np.c_[self.weights_sample[:, j]])
-                return -(sampled_value * self.GPmodel.std).ravel()
-
-            if pool_X is None:
-                f_min = np.inf
-                x_min = x0s[0]
-
-                x_min, f_min = minimize(BLR, x0s, self.bounds_list, jac=BLR_gradients)
-                max_sample[j] = -1 * f_min
-                max_inputs.append(x_min)
-            else:
-                pool_Y = BLR(pool_X)
-                min_index = np.argmin(pool_Y)
-                max_sample[j] = -1 * pool_Y[min_index]
-                max_inputs.append(pool_X[min_index])
+            pool_Y = self.sample_path(candidates)
+            max_index = np.argmax(pool_Y, axis=0)
+            max_sample = pool_Y[max_index, np.arange(self.sampling_num)]
+            max_inputs = candidates[max_index]
 
         # Values smaller than the observed maximum + 3 times the observed noise are corrected.
         if MES_correction:
@@ -367,7 +502,52 @@ class BO_core(object):
                 self.GPmodel[".*Gaussian_noise.variance"].values
             )
             max_sample[max_sample < correction_value] = correction_value
-        return max_sample, np.array(max_inputs)
+        return max_sample, max_inputs
+
+    def _update_rfm_cache(self, lengthscales: np.ndarray, noise_var: np.ndarray) -> None:
+        """
+        Update the RFM basis, the features of the training inputs and the Cholesky factor of
+        their gram matrix for the current training inputs.
+
+        While the kernel parameters are unchanged, the basis is reused and only the rows for the
+        training inputs added after the last call are computed. The basis is sampled again with
+        basis_dim = 500 + data_num once the kernel parameters are changed.
+        """
+        X = np.asarray(self.GPmodel.X)
+        data_num = np.shape(X)[0]
+        cached_num = 0 if self._rfm_cache_key is None else np.shape(self._X_train_features)[0]
+        if (
+            self._rfm_cache_key is not None
+            and np.array_equal(self._rfm_cache_key[0], lengthscales)
+            and np.array_equal(self._rfm_cache_key[1], noise_var)
+            and cached_num <= data_num
+        ):
+            if cached_num == data_num:
+                return
+            new_features = self.rbf_features.transform(X[cached_num:])
+            try:
+                self._gram_cholesky, _ = extend_cholesky(
+                    self._gram_cholesky,
+                    self._X_train_features.dot(new_features.T),
+                    new_features.dot(new_features.T) + np.eye(data_num - cached_num) * noise_var,
+                )
+                self._X_train_features = np.r_[self._X_train_features, new_features]
+                return
+            except np.linalg.LinAlgError:
+                pass
+
+        # 基底をサンプリング, n_compenontsは基底数, random_stateは基底サンプリング時のseed的なの
+        self.rbf_features = RFM_RBF(
+            lengthscales=lengthscales, input_dim=self.input_dim, basis_dim=500 + data_num
+        )
+        self._X_train_features = self.rbf_features.transform(X)
+        gram = self._X_train_features.dot(self._X_train_features.T) + np.eye(data_num) * noise_var
+        try:
+            self._gram_cholesky = cholesky(gram, lower=True)
+        except np.linalg.LinAlgError as e:
+            print("In RFM-based sampling,", e)
+            self._gram_cholesky = cholesky(gram + 1e-5 * np.eye(data_num), lower=True)
+        self._rfm_cache_key = (np.copy(lengthscales), np.copy(noise_var))
 
     def sample_path(self, X: np.ndarray) -> np.ndarray:
         """
@@ -474,10 +654,18 @@ class PIMSSampler(optunahub.samplers.SimpleBaseSampler):
         self,
         search_space: dict[str, optuna.distributions.BaseDistribution],
         kernel_bounds: np.ndarray,
+        kernel_params_optimize_interval: int = 5,
     ) -> None:
         super().__init__(search_space)
         self._rng = np.random.RandomState()
 
+        if kernel_params_optimize_interval < 1:
+            raise ValueError(
+                "kernel_params_optimize_interval must be at least 1, "
+                f"but got {kernel_params_optimize_interval}."
+            )
+        self.kernel_params_optimize_interval = kernel_params_optimize_interval
+
         self.kernel_bounds = kernel_bounds
         self.bounds = np.zeros_like(kernel_bounds)
 
@@ -525,10 +713,11 @@ class PIMSSampler(optunahub.samplers.SimpleBaseSampler):
             _sign = -1.0 if study.direction == optuna.study.StudyDirection.MINIMIZE else 1.0
             Y_new = _sign * trials[-1].value
 
-            if len(trials) % 5 == 4:
-                self.optimizer.update(np.atleast_2d(X_new), np.atleast_2d(Y_new), optimize=True)
-            else:
-                self.optimizer.update(np.atleast_2d(X_new), np.atleast_2d(Y_new), optimize=False)
+            # The kernel parameters are optimized only once every kernel_params_optimize_interval
+            # trials, and the GP is conditioned on the new observation incrementally otherwise.
+            interval = self.kernel_params_optimize_interval
+            optimize = len(trials) % interval == interval - 1
+            self.optimizer.update(np.atleast_2d(X_new), np.atleast_2d(Y_new), optimize=optimize)
 
         new_inputs = self.optimizer.next_input()
 
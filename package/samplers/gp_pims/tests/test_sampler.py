@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import optuna
+import optunahub
+import pytest
+
+
+pytest.importorskip("GPy")
+
+gp_pims = optunahub.load_local_module(package="samplers/gp_pims", registry_root="package/")
+sampler_module = gp_pims.sampler
+
+
+def _make_bo(data_num: int, input_dim: int, noise_var: float = 1e-2) -> Any:
+    rng = np.random.RandomState(0)
+    X = rng.rand(data_num, input_dim)
+    Y = np.sin(3 * X).sum(axis=1, keepdims=True)
+    bounds = np.array([[0.0] * input_dim, [1.0] * input_dim])
+    kernel_bounds = np.array([[0.1] * input_dim, [1.0] * input_dim])
+    GPmodel = sampler_module.set_gpy_regressor(
+        None, X, Y, kernel_bounds, noise_var=noise_var, optimize=False
+    )
+    return sampler_module.BO_core(X, Y, bounds, kernel_bounds, GPmodel=GPmodel)
+
+
+def test_weighted_sum_with_grad() -> None:
+    np.random.seed(0)
+    rbf_features = sampler_module.RFM_RBF(
+        lengthscales=np.array([0.3, 0.5, 0.2]), input_dim=3, basis_dim=50
+    )
+    rng = np.random.RandomState(1)
+    X = rng.rand(4, 5, 3)
+    weights = rng.normal(size=(50, 4))
+
+    values, gradients = rbf_features.weighted_sum_with_grad(X, weights)
+    assert values.shape == (4, 5)
+    assert gradients.shape == (4, 5, 3)
+    for j in range(4):
+        np.testing.assert_allclose(values[j], rbf_features.transform(X[j]).dot(weights[:, j]))
+
+    eps = 1e-6
+    for i in range(3):
+        step = np.zeros(3)
+        step[i] = eps
+        values_plus, _ = rbf_features.weighted_sum_with_grad(X + step, weights)
+        values_minus, _ = rbf_features.weighted_sum_with_grad(X - step, weights)
+        np.testing.assert_allclose(
+            gradients[..., i], (values_plus - values_minus) / (2 * eps), rtol=1e-5, atol=1e-7
+        )
+
+
+def test_maximize_sample_paths() -> None:
+    np.random.seed(0)
+    rbf_features = sampler_module.RFM_RBF(lengthscales=0.2, input_dim=2, basis_dim=100)
+    weights = np.random.normal(size=(100, 3))
+    start_points = np.random.rand(50, 2)
+    bounds = np.array([[0.0, 0.0], [1.0, 1.0]])
+
+    max_inputs, max_values = sampler_module.maximize_sample_paths(
+        rbf_features, weights, start_points, bounds
+    )
+    assert max_inputs.shape == (3, 2)
+    assert np.all((bounds[0] <= max_inputs) & (max_inputs <= bounds[1]))
+    for j in range(3):
+        path_values = rbf_features.transform(start_points).dot(weights[:, j])
+        np.testing.assert_allclose(
+            max_values[j], rbf_features.transform(max_inputs[j]).dot(weights[:, j])
+        )
+        assert max_values[j] >= path_values.max() - 1e-12
+
+
+def test_sampling_rfm_weights_follow_posterior() -> None:
+    np.random.seed(0)
+    bo = _make_bo(data_num=10, input_dim=2)
+    bo.sampling_num = 20000
+    bo.sampling_RFM(pool_X=np.random.rand(5, 2), MES_correction=False)
+
+    Phi = bo._X_train_features
+    noise_var = bo.GPmodel[".*Gaussian_noise.variance"].values.item()
+    y = ((bo.GPmodel.Y - bo.GPmodel.mean) / bo.GPmodel.std).ravel()
+    A = Phi.T.dot(Phi) + noise_var * np.eye(Phi.shape[1])
+    expected_mean = np.linalg.solve(A, Phi.T.dot(y))
+
+    # The weights whitened by the expected covariance noise_var * A^-1 = noise_var * (R R^T)^-1
+    # follow the standard normal distribution.
+    weights = bo.weights_sample
+    assert weights.shape == (Phi.shape[1], 20000)
+    R = np.linalg.cholesky(A)
+    z = R.T.dot(weights - expected_mean[:, np.newaxis]) / np.sqrt(noise_var)
+    assert np.all(np.abs(z.mean(axis=1)) < 6 / np.sqrt(weights.shape[1]))
+    np.testing.assert_allclose(np.cov(z), np.eye(len(z)), atol=0.06)
+
+
+def test_extend_cholesky() -> None:
+    rng = np.random.RandomState(0)
+    B = rng.normal(size=(8, 8))
+    K = B.dot(B.T) + 1e-2 * np.eye(8)
+    L = np.linalg.cholesky(K[:5, :5])
+
+    L_extended, L_cross = sampler_module.extend_cholesky(L, K[:5, 5:], K[5:, 5:])
+    np.testing.assert_allclose(L_extended, np.linalg.cholesky(K), atol=1e-10)
+    np.testing.assert_allclose(L_cross, L_extended[5:, :5])
+
+    with pytest.raises(np.linalg.LinAlgError):
+        sampler_module.extend_cholesky(L, K[:5, 5:], -np.eye(3))
+
+
+def test_add_xy_matches_inference_from_scratch() -> None:
+    bo = _make_bo(data_num=20, input_dim=3)
+    rng = np.random.RandomState(1)
+    X_new = rng.rand(2, 3)
+    Y_new = np.sin(3 * X_new).sum(axis=1, keepdims=True)
+    bo.GPmodel.add_XY(X_new, Y_new)
+    assert bo.GPmodel._extended_woodbury_chol is None
+
+    expected = sampler_module.GPy_model(
+        X=np.asarray(bo.GPmodel.X),
+        Y=np.asarray(bo.GPmodel.Y),
+        kernel=bo.GPmodel.kern.copy(),
+        noise_var=bo.GPmodel[".*Gaussian_noise.variance"].values.item(),
+    )
+    np.testing.assert_allclose(
+        bo.GPmodel.posterior.woodbury_chol, expected.posterior.woodbury_chol, atol=1e-10
+    )
+    np.testing.assert_allclose(bo.GPmodel.log_likelihood(), expected.log_likelihood(), rtol=1e-10)
+    xs = rng.rand(10, 3)
+    for actual, desired in zip(bo.GPmodel.predict_noiseless(xs), expected.predict_noiseless(xs)):
+        np.testing.assert_allclose(actual, desired, atol=1e-10)
+
+
+def test_rfm_cache_extended_with_new_data() -> None:
+    np.random.seed(0)
+    bo = _make_bo(data_num=10, input_dim=2)
+    pool_X = np.random.rand(5, 2)
+    bo.sampling_RFM(pool_X=pool_X)
+    rbf_features = bo.rbf_features
+
+    bo.update(np.array([[0.3, 0.7]]), np.array([[0.5]]))
+    bo.sampling_RFM(pool_X=pool_X)
+    # The basis is reused and the features and the factor are extended by the new input.
+    assert bo.rbf_features is rbf_features
+    X_train_features = rbf_features.transform(np.asarray(bo.GPmodel.X))
+    np.testing.assert_allclose(bo._X_train_features, X_train_features)
+    noise_var = bo.GPmodel[".*Gaussian_noise.variance"].values.item()
+    gram = X_train_features.dot(X_train_features.T) + noise_var * np.eye(11)
+    np.testing.assert_allclose(bo._gram_cholesky, np.linalg.cholesky(gram), atol=1e-10)
+
+
+def test_sampler() -> None:
+    search_space = {name: optuna.distributions.FloatDistribution(0.0, 1.0) for name in "xy"}
+    sampler = gp_pims.PIMSSampler(search_space, kernel_bounds=np.array([[0.1, 0.1], [1.0, 1.0]]))
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(
+        lambda t: (t.suggest_float("x", 0, 1) - 0.3) ** 2 + t.suggest_float("y", 0, 1), 8
+    )
+    assert all(t.state == optuna.trial.TrialState.COMPLETE for t in study.trials)
@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import base64
 from collections.abc import Sequence
 import math
+import threading
 from typing import Any
+from typing import NamedTuple
 
 import numpy as np
 import optuna
@@ -17,10 +20,64 @@ from optuna.search_space import IntersectionSearchSpace
 from optuna.study._multi_objective import _dominates
 from optuna.study._multi_objective import _fast_non_domination_rank
 from optuna.study._study_direction import StudyDirection
+from optuna.trial import FrozenTrial
 from optuna.trial import TrialState
 
 
 _EPS = 1e-8
+# The elite states of generation g are stored in the slot g % 2 since only those of the last two
+# generations are needed.
+_ELITES_KEY = "mocma:elites:{}"
+
+
+class _EliteState(NamedTuple):
+    sigma: float
+    p_succ: float
+    p_c: np.ndarray
+    cov: np.ndarray
+
+
+def _pack_elites(
+    generation: int, elite_ids: list[int], states: list[_EliteState]
+) -> dict[str, Any]:
+    """Pack the elite states of a generation into a JSON serializable dictionary.
+
+    The states are concatenated into a single float64 array encoded in base64, where only the
+    upper triangular part of each symmetric covariance matrix is stored.
+    """
+    dims = []
+    chunks = [np.empty(0)]
+    for state in states:
+        n_cov = len(state.cov)
+        dims.append([n_cov, len(state.p_c)])
+        chunks.append(np.asarray([state.sigma, state.p_succ], dtype=float))
+        chunks.append(state.p_c)
+        chunks.append(state.cov[np.triu_indices(n_cov)])
+    data = np.concatenate(chunks).astype("<f8").tobytes()
+    return {
+        "generation": generation,
+        "elite_ids": elite_ids,
+        "dims": dims,
+        "states": base64.b64encode(data).decode("ascii"),
+    }
+
+
+def _unpack_elites(packed: dict[str, Any]) -> tuple[list[int], list[_EliteState]]:
+    data = np.frombuffer(base64.b64decode(packed["states"]), dtype="<f8")
+    states = []
+    offset = 0
+    for n_cov, n_p_c in packed["dims"]:
+        sigma, p_succ = data[offset : offset + 2]
+        offset += 2
+        p_c = data[offset : offset + n_p_c].copy()
+        offset += n_p_c
+        triu = np.triu_indices(n_cov)
+        cov = np.empty((n_cov, n_cov))
+        cov[triu] = data[offset : offset + len(triu[0])]
+        cov.T[triu] = cov[triu]
+        offset += len(triu[0])
+        states.append(_EliteState(sigma=float(sigma), p_succ=float(p_succ), p_c=p_c, cov=cov))
+    return list(packed["elite_ids"]), states
 
 
 class MoCmaSampler(BaseSampler):
@@ -58,6 +115,78 @@ class MoCmaSampler(BaseSampler):
         self._popsize = popsize
         self._search_space = search_space
         self._intersection_search_space = IntersectionSearchSpace()
+        # The elite states by generation. Since the states of a generation are never updated
+        # once stored, they are read from the storage only when another worker has advanced the
+        # generation.
+        self._elites_cache: dict[int, tuple[list[int], list[_EliteState]]] = {}
+        # The index of the complete trials by trial id and by generation and instance number,
+        # which is updated with the trials completed in after_trial. It is rebuilt from the
+        # storage only when it misses trials, e.g., completed by other processes or before resume.
+        self._trials_by_id: dict[int, FrozenTrial] = {}
+        self._classified_trials: dict[int, dict[int, list[FrozenTrial]]] = {0: {}}
+        self._completed_trial_ids: list[int] = []
+        self._index_lock = threading.Lock()
+
+    def _add_to_index(self, trial: FrozenTrial) -> None:
+        if trial._trial_id in self._trials_by_id:
+            return
+        self._trials_by_id[trial._trial_id] = trial
+        if "mocma:g" not in trial.system_attrs:
+            # The trial was sampled randomly because the elite states were not available.
+            return
+        instances = self._classified_trials.setdefault(trial.system_attrs["mocma:g"], {})
+        instance = instances.setdefault(trial.system_attrs["mocma:k"], [])
+        instance.append(trial)
+        # Keep the order of trial numbers in case the trials are indexed out of order.
+        instance.sort(key=lambda t: t.number)
+
+    def _update_index(self, study: optuna.Study) -> None:
+        completed_trial_ids, self._completed_trial_ids = self._completed_trial_ids, []
+        for trial_id in completed_trial_ids:
+            trial = study._storage.get_trial(trial_id)
+            if trial.state == TrialState.COMPLETE:
+                self._add_to_index(trial)
+            elif not trial.state.is_finished():
+                # The state is not updated yet by another thread telling the trial.
+                self._completed_trial_ids.append(trial_id)
+
+        n_complete = study._storage.get_n_trials(study._study_id, TrialState.COMPLETE)
+        if n_complete > len(self._trials_by_id):
+            for t in study.get_trials(deepcopy=False, states=[TrialState.COMPLETE]):
+                self._add_to_index(t)
+
+    def _store_elites(
+        self,
+        study: optuna.Study,
+        generation: int,
+        elite_ids: list[int],
+        states: list[_EliteState],
+    ) -> None:
+        study._storage.set_study_system_attr(
+            study._study_id,
+            _ELITES_KEY.format(generation % 2),
+            _pack_elites(generation, elite_ids, states),
+        )
+        self._cache_elites(generation, (elite_ids, states))
+
+    def _load_elites(
+        self, study: optuna.Study, generation: int
+    ) -> tuple[list[int], list[_EliteState]] | None:
+        if generation not in self._elites_cache:
+            packed = study._storage.get_study_system_attrs(study._study_id).get(
+                _ELITES_KEY.format(generation % 2)
+            )
+            if packed is None or packed["generation"] != generation:
+                # The states have not been stored yet or have been already overwritten.
+                return None
+            self._cache_elites(generation, _unpack_elites(packed))
+        return self._elites_cache[generation]
+
+    def _cache_elites(self, generation: int, elites: tuple[list[int], list[_EliteState]]) -> None:
+        self._elites_cache[generation] = elites
+        for g in list(self._elites_cache):
+            if g < generation - 1:
+                del self._elites_cache[g]
 
     def reseed_rng(self) -> None:
         self._rng.rng.seed()
@@ -109,22 +238,12 @@ class MoCmaSampler(BaseSampler):
             self._popsize = 4 + math.floor(3 * math.log(n))
 
         # Compute generation g and instance k.
-        complete_trials = [
-            t for t in study.get_trials(deepcopy=False, states=[TrialState.COMPLETE])
-        ]
-
-        # Classify trials by generation and instance number.
-        classified_trials: dict[int, dict] = {0: {}}
-        g = 0  # current generation
-        for t in complete_trials:
-            g_ = t.system_attrs["mocma:g"]
-            k_ = t.system_attrs["mocma:k"]
-            g = max(g, g_)
-            if g_ not in classified_trials:
-                classified_trials[g_] = {}
-            if k_ not in classified_trials[g_]:
-                classified_trials[g_][k_] = []
-            classified_trials[g_][k_].append(t)
+        with self._index_lock:
+            self._update_index(study)
+            # Trials classified by generation and instance number.
+            classified_trials = {g_: dict(v) for g_, v in self._classified_trials.items()}
+            trials_by_id = dict(self._trials_by_id)
+        g = max(classified_trials)  # current generation
 
         generation_finished = True
         ks = []
@@ -140,9 +259,6 @@ class MoCmaSampler(BaseSampler):
         # This will enhance the performance when n_jobs > 1.
         k = self._rng.rng.choice(ks)
 
-        study._storage.set_trial_system_attr(trial._trial_id, "mocma:g", g)
-        study._storage.set_trial_system_attr(trial._trial_id, "mocma:k", int(k))
-
         # CMA-ES parameters
         sigma = 1 / 6
         d = 1 + math.floor(n / 2)  # damping parameter
@@ -154,7 +270,8 @@ class MoCmaSampler(BaseSampler):
 
         if g == 0:
             # Generate initial parents randomly.
-
+            study._storage.set_trial_system_attr(trial._trial_id, "mocma:g", g)
+            study._storage.set_trial_system_attr(trial._trial_id, "mocma:k", int(k))
             return {}  # Fall back to random sampling.
         elif g == 1 and generation_finished:
             # Set parameters for the first generation (g = 0).
@@ -162,46 +279,40 @@ class MoCmaSampler(BaseSampler):
                 list(sorted(instance, key=lambda x: x.datetime_complete))[0]
                 for instance in classified_trials[g - 1].values()
             ]
-            for a in elites:
-                study._storage.set_study_system_attr(
-                    study._study_id, f"mocma:trial:{a._trial_id}:sigma", sigma
-                )
-                study._storage.set_study_system_attr(
-                    study._study_id,
-                    f"mocma:trial:{a._trial_id}:cov",
-                    np.eye(len(a.params)).tolist(),
-                )
-                study._storage.set_study_system_attr(
-                    study._study_id, f"mocma:trial:{a._trial_id}:p_succ", p_targetsucc
-                )
-                study._storage.set_study_system_attr(
-                    study._study_id,
-                    f"mocma:trial:{a._trial_id}:p_c",
-                    np.zeros(len(a.params)).tolist(),
-                )
-            elite_ids = [e._trial_id for e in elites]
-            study._storage.set_study_system_attr(
-                study._study_id, f"mocma:generation:{g-1}:elite_ids", elite_ids
+            self._store_elites(
+                study,
+                g - 1,
+                [e._trial_id for e in elites],
+                [
+                    _EliteState(
+                        sigma=sigma,
+                        p_succ=p_targetsucc,
+                        p_c=np.zeros(len(a.params)),
+                        cov=np.eye(len(a.params)),
+                    )
+                    for a in elites
+                ],
             )
         elif g >= 2 and generation_finished:
             # This section conducts the parameter updates for g-1 with individuals for g-1 and g-2
             # before generating individuals for generation g.
-            study_system_attrs = study._storage.get_study_system_attrs(study._study_id)
-
-            parents = [
-                [t for t in complete_trials if t._trial_id == eid][0]
-                for eid in study_system_attrs[f"mocma:generation:{g-2}:elite_ids"]
-            ]
+            parent_elites = self._load_elites(study, g - 2)
+            if parent_elites is None:
+                # NOTE: The trial is not tagged with the generation, so that it is not taken as
+                # an offspring without a parent in the next update.
+                return {}  # Fall back to random sampling.
+            parent_ids, parent_states = parent_elites
+
+            parents = [trials_by_id[eid] for eid in parent_ids]
+            parents_by_id = dict(zip(parent_ids, parents))
+            parent_states_by_id = dict(zip(parent_ids, parent_states))
+            states: dict[int, _EliteState] = {}
             # Handling conditional parameters for parents
             # (Discard cma parmeter values for paramaters not in the intersection search space)
-            for a in parents:
+            for a, state in zip(parents, parent_states):
                 indices = [i for i, n in enumerate(a.params) if n in search_space]
                 a.params = {n: a.params[n] for n in search_space}
-                p_c_a = np.asarray(study_system_attrs[f"mocma:trial:{a._trial_id}:p_c"])
-                p_c_a = p_c_a[indices]
-                study._storage.set_study_system_attr(
-                    study._study_id, f"mocma:trial:{a._trial_id}:p_c", p_c_a.tolist()
-                )
+                states[a._trial_id] = state._replace(p_c=state.p_c[indices])
 
             offsprings = [
                 list(sorted(instance, key=lambda x: x.datetime_complete))[0]
@@ -211,39 +322,39 @@ class MoCmaSampler(BaseSampler):
             for a_ in offsprings:
                 a_.params = {n: a_.params[n] for n in search_space}
 
-            # Reload study_system_attrs
-            study_system_attrs = study._storage.get_study_system_attrs(study._study_id)
-
+            updated_states = dict(states)
             for a_ in offsprings:
                 # Find parent a for a_
-                a = [p for p in parents if p._trial_id == a_.system_attrs["mocma:parent_id"]][0]
+                a = parents_by_id[a_.system_attrs["mocma:parent_id"]]
                 lambda_succ = int(_dominates(a_, a, study.directions))
 
                 # Update parent step size
-                p_succ_a = study_system_attrs[f"mocma:trial:{a._trial_id}:p_succ"]
+                p_succ_a = states[a._trial_id].p_succ
                 p_succ_a = (1 - c_p) * p_succ_a + c_p * lambda_succ
-                sigma_a = study_system_attrs[f"mocma:trial:{a._trial_id}:sigma"]
+                sigma_a = states[a._trial_id].sigma
                 sigma_a = sigma_a * math.exp(
                     (1 / d) * ((p_succ_a - p_targetsucc) / (1 - p_targetsucc))
                 )
                 sigma_a = max(sigma_a, _EPS)
-                study._storage.set_study_system_attr(
-                    study._study_id, f"mocma:trial:{a._trial_id}:p_succ", p_succ_a
-                )
-                study._storage.set_study_system_attr(
-                    study._study_id, f"mocma:trial:{a._trial_id}:sigma", sigma_a
+                updated_states[a._trial_id] = updated_states[a._trial_id]._replace(
+                    p_succ=p_succ_a, sigma=sigma_a
                 )
 
                 # Update offspring step size and covariance matrix
-                p_succ_a_ = np.asarray(study_system_attrs[f"mocma:trial:{a_._trial_id}:p_succ"])
+                # The offspring inherited the state of its parent in generation g-2.
+                parent_state = parent_states_by_id[a._trial_id]
+                indices = a_.system_attrs.get(
+                    "mocma:parent_param_indices", list(range(len(parent_state.cov)))
+                )
+                p_succ_a_ = np.asarray(parent_state.p_succ)
                 p_succ_a_ = (1 - c_p) * p_succ_a_ + c_p * lambda_succ
-                sigma_a_ = study_system_attrs[f"mocma:trial:{a_._trial_id}:sigma"]
+                sigma_a_ = parent_state.sigma
                 sigma_a_ = sigma_a_ * math.exp(
                     (1 / d) * ((p_succ_a_ - p_targetsucc) / (1 - p_targetsucc))
                 )
                 sigma_a_ = max(sigma_a_, _EPS)
-                cov_a_ = np.asarray(study_system_attrs[f"mocma:trial:{a_._trial_id}:cov"])
-                p_c = np.asarray(study_system_attrs[f"mocma:trial:{a._trial_id}:p_c"])
+                cov_a_ = parent_state.cov[np.ix_(indices, indices)]
+                p_c = states[a._trial_id].p_c
                 if p_succ_a_ < p_thresh:
                     values_a_ = np.asarray(list(a_.params.values()))
                     values_a = np.asarray(list(a.params.values()))
@@ -256,17 +367,8 @@ class MoCmaSampler(BaseSampler):
                         p_c @ p_c.T + c_c * (2 - c_c) * cov_a_
                     )
 
-                study._storage.set_study_system_attr(
-                    study._study_id, f"mocma:trial:{a_._trial_id}:sigma", float(sigma_a_)
-                )
-                study._storage.set_study_system_attr(
-                    study._study_id, f"mocma:trial:{a_._trial_id}:cov", cov_a_.tolist()
-                )
-                study._storage.set_study_system_attr(
-                    study._study_id, f"mocma:trial:{a_._trial_id}:p_succ", float(p_succ_a_)
-                )
-                study._storage.set_study_system_attr(
-                    study._study_id, f"mocma:trial:{a_._trial_id}:p_c", p_c.tolist()
+                updated_states[a_._trial_id] = _EliteState(
+                    sigma=float(sigma_a_), p_succ=float(p_succ_a_), p_c=p_c, cov=cov_a_
                 )
 
             # Selecting elites
@@ -317,44 +419,33 @@ class MoCmaSampler(BaseSampler):
                     rank_i_vals = np.delete(rank_i_vals, candidate, axis=0)
                     del front_i[candidate]
             elite_ids = [e._trial_id for e in elites]
-            study._storage.set_study_system_attr(
-                study._study_id, f"mocma:generation:{g-1}:elite_ids", elite_ids
-            )
+            self._store_elites(study, g - 1, elite_ids, [updated_states[eid] for eid in elite_ids])
 
-        # Load/reload study_system_attrs after updates
-        study_system_attrs = study._storage.get_study_system_attrs(study._study_id)
+        elites_ = self._load_elites(study, g - 1)
+        if elites_ is None:
+            return {}  # Fall back to random sampling without tagging the trial as above.
+        elite_ids, elite_states = elites_
 
         # Generate individual for generation g and instance k
-        a = [
-            t
-            for t in complete_trials
-            if t._trial_id == study_system_attrs[f"mocma:generation:{g-1}:elite_ids"][k]
-        ][0]
+        a = trials_by_id[elite_ids[k]]
         mean = trans.transform(a.params)
-        sigma = study_system_attrs[f"mocma:trial:{a._trial_id}:sigma"]
-        cov = np.asarray(study_system_attrs[f"mocma:trial:{a._trial_id}:cov"])
-        p_c = np.asarray(study_system_attrs[f"mocma:trial:{a._trial_id}:p_c"])
-        p_succ = study_system_attrs[f"mocma:trial:{a._trial_id}:p_succ"]
+        sigma = elite_states[k].sigma
+        cov = elite_states[k].cov
+        n_parent_params = len(cov)
 
         # Handling conditional parameters
         # (Discard cma parmeter values for paramaters not in the intersection search space)
         indices = np.asarray([i for i, n in enumerate(a.params) if n in search_space])
         cov = cov[np.ix_(indices, indices)]
-        p_c = p_c[indices]
 
+        study._storage.set_trial_system_attr(trial._trial_id, "mocma:g", g)
+        study._storage.set_trial_system_attr(trial._trial_id, "mocma:k", int(k))
         study._storage.set_trial_system_attr(trial._trial_id, "mocma:parent_id", a._trial_id)
-        study._storage.set_study_system_attr(
-            study._study_id, f"mocma:trial:{trial._trial_id}:sigma", float(sigma)
-        )
-        study._storage.set_study_system_attr(
-            study._study_id, f"mocma:trial:{trial._trial_id}:cov", cov.tolist()
-        )
-        study._storage.set_study_system_attr(
-            study._study_id, f"mocma:trial:{trial._trial_id}:p_succ", float(p_succ)
-        )
-        study._storage.set_study_system_attr(
-            study._study_id, f"mocma:trial:{trial._trial_id}:p_c", p_c.tolist()
-        )
+        if len(indices) < n_parent_params:
+            # The state of the parent is restricted to these indices when this trial inherits it.
+            study._storage.set_trial_system_attr(
+                trial._trial_id, "mocma:parent_param_indices", [int(i) for i in indices]
+            )
 
         x = np.clip(
             self._rng.rng.multivariate_normal(mean, sigma**2 * cov),
@@ -394,4 +485,6 @@ class MoCmaSampler(BaseSampler):
         state: TrialState,
         values: Sequence[float] | None,
     ) -> None:
+        if state == TrialState.COMPLETE:
+            self._completed_trial_ids.append(trial._trial_id)
         self._independent_sampler.after_trial(study, trial, state, values)
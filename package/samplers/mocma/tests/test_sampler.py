@@ -27,6 +27,7 @@ from __future__ import annotations
 
 from collections.abc import Callable
 from collections.abc import Sequence
+import json
 import multiprocessing
 from multiprocessing.managers import DictProxy
 import os
@@ -54,7 +55,8 @@ import pytest
 
 
 # Load local MoCmaSampler
-MoCmaSampler = optunahub.load_local_module("samplers/mocma", registry_root="../../").MoCmaSampler
+mocma = optunahub.load_local_module("samplers/mocma", registry_root="../../")
+MoCmaSampler = mocma.MoCmaSampler
 
 popsize = 5
 
@@ -662,3 +664,75 @@ def test_cache_is_invalidated(
         return -1
 
     study.optimize(objective, n_trials=10, n_jobs=n_jobs)
+
+
+def test_elite_states_round_trip() -> None:
+    rng = np.random.RandomState(0)
+    states = []
+    for n_cov, n_p_c in [(3, 3), (4, 2), (1, 1)]:
+        a = rng.rand(n_cov, n_cov)
+        states.append(
+            mocma.mocma._EliteState(
+                sigma=rng.rand(), p_succ=rng.rand(), p_c=rng.rand(n_p_c), cov=a @ a.T
+            )
+        )
+    packed = mocma.mocma._pack_elites(3, [5, 2, 7], states)
+    elite_ids, unpacked = mocma.mocma._unpack_elites(json.loads(json.dumps(packed)))
+
+    assert elite_ids == [5, 2, 7]
+    for expected, actual in zip(states, unpacked):
+        assert actual.sigma == expected.sigma
+        assert actual.p_succ == expected.p_succ
+        np.testing.assert_array_equal(actual.p_c, expected.p_c)
+        np.testing.assert_array_equal(actual.cov, expected.cov)
+
+
+def test_elite_states_stored_per_generation() -> None:
+    sampler = MoCmaSampler(popsize=popsize, seed=0)
+    study = optuna.create_study(sampler=sampler, directions=["minimize", "minimize"])
+    study.optimize(lambda t: (t.suggest_float("x", 0, 1), t.suggest_float("y", 0, 1)), 40)
+
+    system_attrs = study._storage.get_study_system_attrs(study._study_id)
+    assert set(system_attrs) == {"mocma:elites:0", "mocma:elites:1"}
+    generations = sorted(system_attrs[key]["generation"] for key in system_attrs)
+    assert generations[1] == generations[0] + 1
+
+    # Another sampler instance reads the elite states from the storage.
+    study.sampler = MoCmaSampler(popsize=popsize, seed=0)
+    study.optimize(lambda t: (t.suggest_float("x", 0, 1), t.suggest_float("y", 0, 1)), 10)
+    assert all("mocma:parent_id" in t.system_attrs for t in study.trials[-10:])
+
+
+def test_trial_index_rebuilt_on_resume() -> None:
+    study = optuna.create_study(
+        sampler=MoCmaSampler(popsize=popsize, seed=0), directions=["minimize", "minimize"]
+    )
+    study.optimize(lambda t: (t.suggest_float("x", 0, 1), t.suggest_float("y", 0, 1)), 30)
+
+    sampler = MoCmaSampler(popsize=popsize, seed=0)
+    study.sampler = sampler
+    study.optimize(lambda t: (t.suggest_float("x", 0, 1), t.suggest_float("y", 0, 1)), 10)
+
+    # The trials completed after the last sampling are indexed at the next sampling.
+    sampler._update_index(study)
+    complete_trials = study.get_trials(deepcopy=False, states=[TrialState.COMPLETE])
+    assert set(sampler._trials_by_id) == {t._trial_id for t in complete_trials}
+    for t in complete_trials:
+        instance = sampler._classified_trials[t.system_attrs["mocma:g"]][t.system_attrs["mocma:k"]]
+        assert t in instance
+        assert [u.number for u in instance] == sorted(u.number for u in instance)
+
+
+def test_fallback_without_elites_is_not_tagged() -> None:
+    sampler = MoCmaSampler(popsize=popsize, seed=0)
+    study = optuna.create_study(sampler=sampler, directions=["minimize", "minimize"])
+    study.optimize(lambda t: (t.suggest_float("x", 0, 1), t.suggest_float("y", 0, 1)), 20)
+
+    # The elite states are unavailable, e.g., overwritten by another worker.
+    with patch.object(sampler, "_load_elites", return_value=None):
+        study.optimize(lambda t: (t.suggest_float("x", 0, 1), t.suggest_float("y", 0, 1)), 3)
+    assert all("mocma:g" not in t.system_attrs for t in study.trials[-3:])
+
+    # The untagged trials are skipped in the update of the next generations.
+    study.optimize(lambda t: (t.suggest_float("x", 0, 1), t.suggest_float("y", 0, 1)), 20)
+    assert all("mocma:parent_id" in t.system_attrs for t in study.trials[-10:])
@@ -2,14 +2,29 @@
 # flake8: noqa
 from __future__ import annotations
 
+import threading
 from typing import Any
 
 import numpy as np
 import optuna
 import optunahub
+from scipy import optimize
+from scipy.stats import qmc
 
-from gp import GP
-from kern import Rbf
+from .gp import GP
+from .kern import Rbf
+
+
+# The number of the quasi-random candidates of x, which is a power of 2 for the Sobol sequence.
+_N_X_CANDIDATES = 1024
+# The number of the best candidates of x refined by the local search.
+_N_LOCAL_SEARCH = 5
+# The grid of w with 20 points per dimension is replaced with the Sobol sequence of this size
+# once the grid becomes larger than this.
+_MAX_W_QUADRATURE_SIZE = 256
+# The maximum number of the elements of the (n_points, n_train, dim) difference array computed
+# by the kernel in each chunk of the prediction.
+_MAX_CHUNK_ELEMENTS = 1 << 24
 
 
 def get_input_candidate(x_n_grids):
@@ -27,6 +42,20 @@ def get_input_candidate(x_n_grids):
     return xs
 
 
+def get_w_quadrature(wdim):
+    """Return the fixed quadrature points and weights of w for the expectation over w.
+
+    The grid with 20 points per dimension is used as long as it has at most
+    ``_MAX_W_QUADRATURE_SIZE`` points, and the scrambled Sobol sequence with a fixed seed is used
+    otherwise so that the size does not grow exponentially in wdim.
+    """
+    if 20**wdim <= _MAX_W_QUADRATURE_SIZE:
+        ws = get_input_candidate(",".join(["20"] * wdim))
+    else:
+        ws = qmc.Sobol(wdim, scramble=True, seed=0).random(_MAX_W_QUADRATURE_SIZE)
+    return ws, np.ones(len(ws)) / len(ws)
+
+
 class MeanVarianceAnalysisScalarizationSimulatorSampler(optunahub.samplers.SimpleBaseSampler):
     # By default, search space will be estimated automatically like Optuna's built-in samplers.
     # You can fix the search spacd by `search_space` argument of `SimpleSampler` class.
@@ -58,6 +87,10 @@ class MeanVarianceAnalysisScalarizationSimulatorSampler(optunahub.samplers.Simpl
         self._wdim = wdim
         self._xdim = len(search_space) - wdim
         self._alpha = alpha
+        # The GP of the previous trial, which is replaced but never modified so that the other
+        # threads can keep predicting with it.
+        self._model = None
+        self._model_lock = threading.Lock()
 
     # You need to implement sample_relative method.
     # This method returns a dictionary of hyperparameters.
@@ -89,35 +122,104 @@ class MeanVarianceAnalysisScalarizationSimulatorSampler(optunahub.samplers.Simpl
         for i, trial in enumerate(trials):
             Y[i, 0] = _sign * trial.value
 
-        model = GP(X, Y[:, 0], kern=self._kern, noise_var=self._noise_var)
-
-        xs = get_input_candidate(",".join(["100"] * self._xdim))
-        ws = get_input_candidate(",".join(["20"] * self._wdim))
-        xws = get_input_candidate(
-            ",".join(["100"] * self._xdim) + "," + ",".join(["20"] * self._wdim)
-        )
-        pws = np.ones(len(ws)) / len(ws)
-        nx = len(xs)
-        nw = len(ws)
-
-        pos_mu, pos_var = model.predict_f(xws)
-        fucb = (pos_mu + self._beta * np.sqrt(pos_var)).reshape([nx, nw])
-        flcb = (pos_mu - self._beta * np.sqrt(pos_var)).reshape([nx, nw])
-        fmean_ucb = np.sum(fucb * pws, axis=1)
-        fmean_lcb = np.sum(flcb * pws, axis=1)
-        fdev_ucb = fucb - fmean_lcb[:, np.newaxis]
-        fdev_lcb = flcb - fmean_ucb[:, np.newaxis]
-        fsqdev_lcb = ((fdev_ucb * fdev_lcb) > 0) * np.minimum(fdev_ucb**2, fdev_lcb**2)
-        fsqdev_ucb = np.maximum(fdev_ucb**2, fdev_lcb**2)
-        fvar_lcb = np.sum(fsqdev_lcb * pws, axis=1)
-        fvar_ucb = np.sum(fsqdev_ucb * pws, axis=1)
-        fmv_ucb = self._alpha * fmean_ucb - (1 - self._alpha) * np.sqrt(fvar_lcb)
-        next_xidx = fmv_ucb.argmax()
-        xt = xs[next_xidx].flatten()
-        next_widx = pos_var.reshape([nx, nw])[next_xidx, :].argmax()
-        wt = ws[next_widx].flatten()
+        model = self._update_model(X, Y[:, 0])
+        ws, pws = get_w_quadrature(self._wdim)
+
+        # The quasi-random candidates and the observed points are screened, and the best ones
+        # are refined by the local search instead of evaluating a dense grid of x.
+        sobol = qmc.Sobol(self._xdim, scramble=True, seed=self._rng.randint(2**31))
+        xs = np.concatenate([sobol.random(_N_X_CANDIDATES), np.unique(X[:, : self._xdim], axis=0)])
+        fmv_ucb = self._mean_variance_ucb(model, xs, ws, pws)
+        n_local_search = min(_N_LOCAL_SEARCH, len(xs))
+        x0s = xs[np.argpartition(-fmv_ucb, n_local_search - 1)[:n_local_search]]
+        xt = x0s[0]
+        best_fmv_ucb = -np.inf
+        for x0 in x0s:
+            res = optimize.minimize(
+                self._minus_mean_variance_ucb_with_grad,
+                x0=x0,
+                args=(model, ws, pws),
+                jac=True,
+                bounds=[(0.0, 1.0)] * self._xdim,
+                method="L-BFGS-B",
+            )
+            if -res.fun > best_fmv_ucb:
+                xt = res.x
+                best_fmv_ucb = -res.fun
+        xt = np.clip(xt, 0.0, 1.0)
+        pos_var = model.predict_fvar(self._concat_x_w(xt[np.newaxis], ws))
+        wt = ws[pos_var.argmax()].flatten()
 
         params = {}  # type: dict[str, Any]
         for i, n in enumerate(search_space.keys()):
             params[n] = xt[i] if i < self._xdim else wt[i - self._xdim]
         return params
+
+    def _update_model(self, X, y):
+        """Return the GP conditioned on X and y, reusing the GP of the previous trial.
+
+        The previous GP is extended by the new observations as long as its data is a prefix of X
+        and y, e.g., the trials are completed in order, and it is constructed again otherwise.
+        """
+        with self._model_lock:
+            model = self._model
+            if (
+                model is not None
+                and model.n_data <= len(X)
+                and np.array_equal(model.x, X[: model.n_data])
+                and np.array_equal(model.y, y[: model.n_data])
+            ):
+                if model.n_data < len(X):
+                    try:
+                        model = model.add_observations(X[model.n_data :], y[model.n_data :])
+                    except np.linalg.LinAlgError:
+                        model = None
+            else:
+                model = None
+
+            if model is None:
+                model = GP(X, y, kern=self._kern, noise_var=self._noise_var)
+            self._model = model
+        return model
+
+    @staticmethod
+    def _concat_x_w(xs, ws):
+        """Return all the pairs of xs and ws, where the pairs with the same x are contiguous."""
+        return np.concatenate([np.repeat(xs, len(ws), axis=0), np.tile(ws, (len(xs), 1))], axis=1)
+
+    def _minus_mean_variance_ucb_with_grad(self, x, model, ws, pws):
+        """Return the negative UCB at x and its gradient by the finite differences.
+
+        x and the perturbed points are evaluated by a single batched prediction.
+        """
+        step = np.where(x + 1e-6 <= 1.0, 1e-6, -1e-6)
+        xs = np.concatenate([x[np.newaxis], x + np.diag(step)])
+        fmv_ucb = self._mean_variance_ucb(model, xs, ws, pws)
+        return -fmv_ucb[0], -(fmv_ucb[1:] - fmv_ucb[0]) / step
+
+    def _mean_variance_ucb(self, model, xs, ws, pws):
+        """Return the UCB of the scalarized mean-variance objective at each x in xs.
+
+        The pairs of x and w are predicted by chunks of x so that the memory usage is bounded by
+        ``_MAX_CHUNK_ELEMENTS`` regardless of the number of candidates and the dimension.
+        """
+        chunk_size = max(1, _MAX_CHUNK_ELEMENTS // (len(ws) * model.n_data * model.n_dim))
+        fmv_ucb = np.empty(len(xs))
+        for start in range(0, len(xs), chunk_size):
+            xs_chunk = xs[start : start + chunk_size]
+            nx = len(xs_chunk)
+            pos_mu, pos_var = model.predict_f(self._concat_x_w(xs_chunk, ws))
+            # The posterior variance can be slightly negative due to the rounding errors.
+            pos_std = np.sqrt(np.maximum(pos_var, 0.0))
+            fucb = (pos_mu + self._beta * pos_std).reshape([nx, len(ws)])
+            flcb = (pos_mu - self._beta * pos_std).reshape([nx, len(ws)])
+            fmean_ucb = np.sum(fucb * pws, axis=1)
+            fmean_lcb = np.sum(flcb * pws, axis=1)
+            fdev_ucb = fucb - fmean_lcb[:, np.newaxis]
+            fdev_lcb = flcb - fmean_ucb[:, np.newaxis]
+            fsqdev_lcb = ((fdev_ucb * fdev_lcb) > 0) * np.minimum(fdev_ucb**2, fdev_lcb**2)
+            fvar_lcb = np.sum(fsqdev_lcb * pws, axis=1)
+            fmv_ucb[start : start + nx] = self._alpha * fmean_ucb - (1 - self._alpha) * np.sqrt(
+                fvar_lcb
+            )
+        return fmv_ucb
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import numpy as np
+import optuna
+import optunahub
+
+
+mvas = optunahub.load_local_module(package="samplers/mvas", registry_root="package/")
+MeanVarianceAnalysisScalarizationSimulatorSampler = (
+    mvas.MeanVarianceAnalysisScalarizationSimulatorSampler
+)
+
+
+def objective(trial: optuna.Trial) -> float:
+    x = [trial.suggest_float(f"x{i}", 0.0, 1.0) for i in range(2)]
+    w = trial.suggest_float("w", 0.0, 1.0)
+    return (x[0] - 0.5) ** 2 + (x[1] - 0.3) ** 2 + 0.1 * w
+
+
+def test_add_observations_matches_gp_from_scratch() -> None:
+    rng = np.random.RandomState(0)
+    X = rng.rand(30, 3)
+    y = rng.rand(30)
+    kern = mvas.kern.Rbf(3, lengthscale=0.25, outputscale=1.0)
+    gp = mvas.gp.GP(X[:20], y[:20], kern=kern, noise_var=1e-4)
+    extended_gp = gp.add_observations(X[20:], y[20:])
+    expected_gp = mvas.gp.GP(X, y, kern=kern, noise_var=1e-4)
+
+    xs = rng.rand(50, 3)
+    for actual, expected in zip(extended_gp.predict_f(xs), expected_gp.predict_f(xs)):
+        np.testing.assert_allclose(actual, expected, atol=1e-8)
+    # The original GP is left unchanged.
+    assert gp.n_data == 20
+    assert gp.x.shape == (20, 3)
+    assert gp.K_varI_L.shape == (20, 20)
+
+
+def test_multi_thread() -> None:
+    search_space = {
+        name: optuna.distributions.FloatDistribution(0.0, 1.0) for name in ["x0", "x1", "w"]
+    }
+    sampler = MeanVarianceAnalysisScalarizationSimulatorSampler(search_space, wdim=1)
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(objective, n_trials=40, n_jobs=4)
+    assert all(t.state == optuna.trial.TrialState.COMPLETE for t in study.trials)
+    assert len(study.trials) == 40
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from collections.abc import Sequence
+import threading
 from typing import Any
 
 import numpy as np
@@ -8,6 +10,7 @@ import optuna.study.study
 import optunahub
 
 from .generate_initial_simplex import generate_initial_simplex
+from .parallel_simplex import ParallelSimplex
 
 
 class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
@@ -17,7 +20,8 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
 
        Several important matters:
 
-       1. NelderMeadSampler does not support parallel execution, i.e., `n_jobs > 1`.
+       1. NelderMeadSampler does not support parallel execution, i.e., `n_jobs > 1`, unless ``n_parallel_vertices`` is specified.
+       In the parallel mode, the trials started while all the proposed vertices are being evaluated are delegated to independent_sampler.
 
        2. If it is run "define-by-run" (no search space defined), the first trial is ignored because this trial is not involved in the Nelder-Mead algorithm.
 
@@ -39,6 +43,13 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
         seed:
             A seed number.
 
+        n_parallel_vertices:
+            The number of the worst vertices updated in parallel in each iteration.
+            If this argument is not :obj:`None`, the reflection, expansion, and outside and inside contractions of each of them,
+            i.e., ``4 * n_parallel_vertices`` vertices, are proposed at once so that they can be evaluated by concurrent workers.
+            The objective values are reconciled in ``after_trial`` in any order.
+            If :obj:`None`, the vertices are proposed one by one as in the sequential Nelder-Mead method.
+
     """
 
     def __init__(
@@ -47,6 +58,7 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
         centroid: float = 0.5,
         edge: float = 0.5,
         seed: int | None = None,
+        n_parallel_vertices: int | None = None,
     ) -> None:
         super().__init__(search_space)
 
@@ -56,12 +68,14 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
             0.0 < edge <= max(centroid, 1 - centroid)
         ), f"Maximum edge length is {max(centroid, 1 - centroid)}"
 
+        assert (
+            n_parallel_vertices is None or n_parallel_vertices >= 1
+        ), "n_parallel_vertices must be at least 1."
+
         if search_space is None:
             self._NM_state = "estimate_search_space"
-            self._ignore_trial_number = 1
         else:
             self._NM_state = "generate_initial_simplex"
-            self._ignore_trial_number = 0
 
         self._edge = edge
         self._centroid = centroid
@@ -71,6 +85,16 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
         self._coef = {"r": 1.0, "ic": -0.5, "oc": 0.5, "e": 2.0, "s": 0.5}
         self._f: list[float] = []
         self._shrink_num = 0
+        # The number of the trial evaluating the last vertex suggested by the Nelder-Mead
+        # algorithm, and the objective values of such trials received in after_trial.
+        self._last_trial_number: int | None = None
+        self._values: dict[int, float] = {}
+
+        self._n_parallel_vertices = n_parallel_vertices
+        self._parallel_simplex: ParallelSimplex | None = None
+        # The keys of the vertices in the parallel mode by the number of the trial evaluating it.
+        self._parallel_keys: dict[int, tuple[int, int]] = {}
+        self._lock = threading.Lock()
 
         self._independent_sampler = optuna.samplers.RandomSampler(seed=self._seed)
 
@@ -120,6 +144,14 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
 
         return params, out_of_boundary, eval_solution
 
+    def _pop_last_value(self) -> float:
+        """
+        Return the objective value of the trial evaluating the last suggested vertex.
+        NaN is returned if the trial did not complete, as well as if it is still running.
+        """
+        assert self._last_trial_number is not None
+        return self._values.pop(self._last_trial_number, float("nan"))
+
     def search(
         self,
         trial: optuna.trial.FrozenTrial,
@@ -129,8 +161,8 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
     ) -> tuple[dict, bool]:
         # Initialization
         if self._NM_state == "Initialization":
-            if trial.number > self._ignore_trial_number:
-                self._f.append(study.trials_dataframe()["value"].values[-2])
+            if f_val is None and self._last_trial_number is not None:
+                self._f.append(self._pop_last_value())
 
             if f_val == float("inf"):
                 self._f.append(float("inf"))
@@ -144,7 +176,7 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
         # Reflection, Expansion, Outside contraction, Inside Contraction, Shrinkage.
         else:
             if f_val is None:
-                objective_value = study.trials_dataframe()["value"].values[-2]
+                objective_value = self._pop_last_value()
             else:
                 objective_value = f_val
 
@@ -249,6 +281,15 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
     ) -> dict[str, Any]:
         self._raise_error_if_multi_objective(study)
 
+        with self._lock:
+            return self._sample_relative(trial, search_space, study)
+
+    def _sample_relative(
+        self,
+        trial: optuna.trial.FrozenTrial,
+        search_space: dict[str, optuna.distributions.BaseDistribution],
+        study: optuna.study.Study,
+    ) -> dict[str, Any]:
         if search_space == {}:
             self._NM_state = "generate_initial_simplex"
             return {}
@@ -262,6 +303,14 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
                 dim=self._dim, edge=self._edge, centroid=self._edge, rng=self._rng
             )
             self._NM_state = "Initialization"
+            if self._n_parallel_vertices is not None:
+                self._parallel_simplex = ParallelSimplex(
+                    self._y, self._n_parallel_vertices, self._coef
+                )
+                self._NM_state = "Parallel"
+
+        if self._NM_state == "Parallel":
+            return self._sample_parallel(trial, search_space)
 
         params, out_of_boundary = self.search(trial, search_space, study)
 
@@ -273,9 +322,27 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
                 if not out_of_boundary:
                     break
         trial.set_user_attr("simplex", self._current_y)
+        self._last_trial_number = trial.number
 
         return params
 
+    def _sample_parallel(
+        self,
+        trial: optuna.trial.FrozenTrial,
+        search_space: dict[str, optuna.distributions.BaseDistribution],
+    ) -> dict[str, Any]:
+        assert self._parallel_simplex is not None
+        proposal = self._parallel_simplex.ask()
+        if proposal is None:
+            # All the proposed vertices are being evaluated by other trials.
+            return {}
+
+        key, vertex = proposal
+        params, _, _ = self.suggest_eval_param(search_space, vertex)
+        self._parallel_keys[trial.number] = key
+        trial.set_user_attr("simplex", self._parallel_simplex.simplex)
+        return params
+
     def sample_independent(
         self,
         study: optuna.study.Study,
@@ -287,5 +354,32 @@ class NelderMeadSampler(optunahub.samplers.SimpleBaseSampler):
             study, trial, param_name, param_distribution
         )
 
+    def after_trial(
+        self,
+        study: optuna.study.Study,
+        trial: optuna.trial.FrozenTrial,
+        state: optuna.trial.TrialState,
+        values: Sequence[float] | None,
+    ) -> None:
+        # Only the value of the trial evaluating the last suggested vertex is kept, which is
+        # consumed when the next vertex is suggested.
+        with self._lock:
+            if trial.number in self._parallel_keys:
+                assert self._parallel_simplex is not None
+                value = (
+                    values[0]
+                    if state == optuna.trial.TrialState.COMPLETE and values is not None
+                    else float("nan")
+                )
+                self._parallel_simplex.tell(self._parallel_keys.pop(trial.number), value)
+                return
+
+        if trial.number != self._last_trial_number:
+            return
+        if state == optuna.trial.TrialState.COMPLETE and values is not None:
+            self._values[trial.number] = values[0]
+        else:
+            self._values[trial.number] = float("nan")
+
     def reseed_rng(self) -> None:
         self._independent_sampler.reseed_rng()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import numpy as np
+
+
+class ParallelSimplex:
+    """
+    The state of the parallel Nelder-Mead method, which proposes several vertices at once.
+
+    In each iteration, the worst ``n_parallel_vertices`` vertices are updated independently with
+    the centroid of the other vertices as in Lee and Wiswall (2007). The reflection, the expansion
+    and the outside and inside contractions of each of them are proposed at once, and the move of
+    each vertex is decided as in the sequential algorithm after all of them are evaluated. If none
+    of the vertices are improved, the simplex is shrunk toward the best vertex, whose new vertices
+    are also proposed at once.
+
+    The proposed vertices are handed out by :meth:`ask` one by one, and their objective values
+    are given back by :meth:`tell` in any order. Vertices out of the unit hypercube get "inf"
+    without being evaluated as in the extreme barrier method.
+    """
+
+    def __init__(
+        self, initial_simplex: np.ndarray, n_parallel_vertices: int, coef: dict[str, float]
+    ) -> None:
+        self._y = np.array(initial_simplex, dtype=float)
+        self._f = np.full(len(self._y), np.inf)
+        self._n_parallel_vertices = min(n_parallel_vertices, len(self._y) - 1)
+        self._coef = coef
+        self._batch_id = -1
+        self._start_batch("Initialization", self._y.copy())
+
+    @property
+    def simplex(self) -> np.ndarray:
+        return self._y.copy()
+
+    def ask(self) -> tuple[tuple[int, int], np.ndarray] | None:
+        """
+        Return the key and the vertex to evaluate next, or None if all the proposed vertices are
+        handed out and the next ones depend on the objective values not told yet.
+        """
+        while self._next_index < len(self._candidates):
+            index = self._next_index
+            self._next_index += 1
+            if np.isnan(self._values[index]):
+                return (self._batch_id, index), self._candidates[index]
+        return None
+
+    def tell(self, key: tuple[int, int], value: float) -> None:
+        """
+        Give the objective value of the vertex returned by :meth:`ask` with the key.
+        NaN, e.g., for a failed trial, is regarded as "inf".
+        """
+        batch_id, index = key
+        if batch_id != self._batch_id:
+            return
+        self._values[index] = np.inf if np.isnan(value) else value
+        while not np.isnan(self._values).any():
+            self._update_simplex()
+
+    def _start_batch(self, phase: str, candidates: np.ndarray) -> None:
+        self._phase = phase
+        self._batch_id += 1
+        self._candidates = candidates
+        self._next_index = 0
+        self._values = np.full(len(candidates), np.nan)
+        self._values[((candidates < 0.0) | (candidates > 1.0)).any(axis=1)] = np.inf
+
+    def _start_iteration(self) -> None:
+        order = np.argsort(self._f, kind="stable")
+        self._y = self._y[order]
+        self._f = self._f[order]
+        n_retained = len(self._y) - self._n_parallel_vertices
+        yc = self._y[:n_retained].mean(axis=0)
+        direction = yc - self._y[n_retained:]
+        # The reflection, expansion, outside contraction and inside contraction of each vertex.
+        coef = np.array([self._coef["r"], self._coef["e"], self._coef["oc"], self._coef["ic"]])
+        candidates = yc + coef[np.newaxis, :, np.newaxis] * direction[:, np.newaxis, :]
+        self._start_batch("Iteration", candidates.reshape(-1, np.shape(self._y)[1]))
+
+    def _update_simplex(self) -> None:
+        if self._phase == "Initialization":
+            self._f = self._values.copy()
+            self._start_iteration()
+            return
+        if self._phase == "Shrinkage":
+            self._y[1:] = self._candidates
+            self._f[1:] = self._values
+            self._start_iteration()
+            return
+
+        n_retained = len(self._y) - self._n_parallel_vertices
+        f_best = self._f[0]
+        f_retained_worst = self._f[n_retained - 1]
+        improved = False
+        new_vertex: tuple[np.ndarray, float] | None
+        for k, j in enumerate(range(n_retained, len(self._y))):
+            yr, ye, yoc, yic = self._candidates[4 * k : 4 * k + 4]
+            fr, fe, foc, fic = self._values[4 * k : 4 * k + 4]
+            if f_best <= fr < f_retained_worst:
+                new_vertex = (yr, fr)
+            elif fr < f_best:
+                new_vertex = (ye, fe) if fe < fr else (yr, fr)
+            elif fr < self._f[j]:
+                new_vertex = (yoc, foc) if foc <= fr else None
+            else:
+                new_vertex = (yic, fic) if fic < self._f[j] else None
+
+            if new_vertex is not None:
+                self._y[j], self._f[j] = new_vertex
+                improved = True
+
+        if improved:
+            self._start_iteration()
+        else:
+            self._start_batch(
+                "Shrinkage", self._y[0] + self._coef["s"] * (self._y[1:] - self._y[0])
+            )
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+from typing import Any
+
+import numpy as np
+import optuna
+import optunahub
+
+
+nelder_mead = optunahub.load_local_module(package="samplers/nelder_mead", registry_root="package/")
+ParallelSimplex = nelder_mead.parallel_simplex.ParallelSimplex
+
+_COEF = {"r": 1.0, "ic": -0.5, "oc": 0.5, "e": 2.0, "s": 0.5}
+_OPTIMUM = np.array([0.3, 0.6, 0.45])
+
+
+def quadratic(x: np.ndarray) -> float:
+    return float(np.sum((x - _OPTIMUM) ** 2))
+
+
+def _initial_simplex() -> np.ndarray:
+    return np.array(
+        [[0.5, 0.5, 0.5], [0.9, 0.5, 0.5], [0.5, 0.9, 0.5], [0.5, 0.5, 0.9]], dtype=float
+    )
+
+
+def _ask_all(simplex: Any) -> list[tuple[tuple[int, int], np.ndarray]]:
+    proposals = []
+    while (proposal := simplex.ask()) is not None:
+        proposals.append(proposal)
+    return proposals
+
+
+def _run(simplex: Any, n_batches: int, order: str) -> None:
+    rng = np.random.RandomState(0)
+    for _ in range(n_batches):
+        proposals = _ask_all(simplex)
+        assert len(proposals) > 0
+        if order == "reversed":
+            proposals = proposals[::-1]
+        elif order == "shuffled":
+            proposals = [proposals[i] for i in rng.permutation(len(proposals))]
+        for key, vertex in proposals:
+            simplex.tell(key, quadratic(vertex))
+
+
+def test_converges_on_quadratic() -> None:
+    simplex = ParallelSimplex(_initial_simplex(), n_parallel_vertices=2, coef=_COEF)
+    _run(simplex, n_batches=100, order="shuffled")
+    assert min(quadratic(y) for y in simplex.simplex) < 1e-6
+
+
+def test_tell_in_any_order() -> None:
+    simplices = [
+        ParallelSimplex(_initial_simplex(), n_parallel_vertices=2, coef=_COEF) for _ in range(3)
+    ]
+    for simplex, order in zip(simplices, ["sequential", "reversed", "shuffled"]):
+        _run(simplex, n_batches=20, order=order)
+    for simplex in simplices[1:]:
+        np.testing.assert_array_equal(simplex.simplex, simplices[0].simplex)
+
+
+def test_ask_returns_none_while_batch_is_pending() -> None:
+    initial_simplex = _initial_simplex()
+    simplex = ParallelSimplex(initial_simplex, n_parallel_vertices=2, coef=_COEF)
+    proposals = _ask_all(simplex)
+    assert [key for key, _ in proposals] == [(0, i) for i in range(4)]
+    np.testing.assert_array_equal([vertex for _, vertex in proposals], initial_simplex)
+
+    for key, vertex in proposals[:-1]:
+        simplex.tell(key, quadratic(vertex))
+        assert simplex.ask() is None
+    simplex.tell(proposals[-1][0], quadratic(proposals[-1][1]))
+    # The reflection, expansion and contractions of the two worst vertices.
+    proposal = simplex.ask()
+    assert proposal is not None
+    assert proposal[0][0] == 1
+
+
+def test_stale_tell_is_ignored() -> None:
+    simplex = ParallelSimplex(_initial_simplex(), n_parallel_vertices=1, coef=_COEF)
+    proposals = _ask_all(simplex)
+    for key, vertex in proposals:
+        simplex.tell(key, quadratic(vertex))
+    state = simplex.simplex
+    next_proposals = _ask_all(simplex)
+
+    simplex.tell(proposals[0][0], -np.inf)
+    np.testing.assert_array_equal(simplex.simplex, state)
+    assert simplex.ask() is None
+    for key, vertex in next_proposals:
+        simplex.tell(key, quadratic(vertex))
+    assert simplex.ask() is not None
+    assert np.isfinite([quadratic(y) for y in simplex.simplex]).all()
+
+
+def test_vertices_out_of_box_get_inf() -> None:
+    initial_simplex = np.array([[0.0, 0.0], [0.2, 0.0], [0.0, 0.2]])
+    simplex = ParallelSimplex(initial_simplex, n_parallel_vertices=1, coef=_COEF)
+    for key, vertex in _ask_all(simplex):
+        simplex.tell(key, float(np.sum(vertex)))
+
+    # The worst vertex (0.0, 0.2) is moved toward the centroid (0.1, 0.0) of the others, and
+    # only its inside contraction is in the unit square.
+    proposals = _ask_all(simplex)
+    assert len(proposals) == 1
+    np.testing.assert_allclose(proposals[0][1], [0.05, 0.1])
+    simplex.tell(proposals[0][0], 0.15)
+    # The vertices are sorted by their values in the next iteration.
+    np.testing.assert_allclose(simplex.simplex, [[0.0, 0.0], [0.05, 0.1], [0.2, 0.0]])
+
+
+def test_shrinkage() -> None:
+    initial_simplex = np.array([[0.5, 0.5], [0.7, 0.5], [0.5, 0.7]])
+    simplex = ParallelSimplex(initial_simplex, n_parallel_vertices=1, coef=_COEF)
+    for (key, _), value in zip(_ask_all(simplex), [0.0, 1.0, 2.0]):
+        simplex.tell(key, value)
+    # None of the proposed vertices improve the worst vertex.
+    for key, _ in _ask_all(simplex):
+        simplex.tell(key, 10.0)
+
+    proposals = _ask_all(simplex)
+    np.testing.assert_allclose([vertex for _, vertex in proposals], [[0.6, 0.5], [0.5, 0.6]])
+    for (key, _), value in zip(proposals, [0.5, float("nan")]):
+        simplex.tell(key, value)
+    # NaN is regarded as inf, so the shrunk vertex is the worst in the next iteration.
+    np.testing.assert_allclose(simplex.simplex, [[0.5, 0.5], [0.6, 0.5], [0.5, 0.6]])
+    assert simplex.ask() is not None
+
+
+def test_optimize_with_multiple_threads() -> None:
+    search_space = {
+        name: optuna.distributions.FloatDistribution(-5, 5) for name in ["x", "y", "z"]
+    }
+
+    def objective(trial: optuna.Trial) -> float:
+        return sum(trial.suggest_float(name, -5, 5) ** 2 for name in search_space)
+
+    sampler = nelder_mead.NelderMeadSampler(search_space, seed=0, n_parallel_vertices=2)
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(objective, n_trials=300, n_jobs=4)
+    assert len(study.trials) == 300
+    assert sampler._parallel_keys == {}
+    assert study.best_value < 1e-2
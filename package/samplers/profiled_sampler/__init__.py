@@ -0,0 +1,5 @@
+from .sampler import ProfiledSampler
+from .sampler import SamplerCallRecord
+
+
+__all__ = ["ProfiledSampler", "SamplerCallRecord"]
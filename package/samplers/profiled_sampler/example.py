@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import optuna
+import optunahub
+
+
+def objective(trial: optuna.Trial) -> float:
+    x = trial.suggest_float("x", -5, 5)
+    y = trial.suggest_float("y", -5, 5)
+    return x**2 + y**2
+
+
+if __name__ == "__main__":
+    ProfiledSampler = optunahub.load_module("samplers/profiled_sampler").ProfiledSampler
+
+    for package, name in [
+        ("samplers/differential_evolution", "DESampler"),
+        ("samplers/pso", "PSOSampler"),
+        ("samplers/whale_optimization", "WhaleOptimizationSampler"),
+    ]:
+        sampler = ProfiledSampler(getattr(optunahub.load_module(package), name)())
+        study = optuna.create_study(sampler=sampler)
+        study.optimize(objective, n_trials=300)
+
+        print(package)
+        for method, stats in sampler.summary().items():
+            print(
+                f"  {method:>18}: {stats['mean_time'] * 1e3:.3f} ms/call, "
+                f"{stats['mean_storage_calls']:.1f} storage calls/call, "
+                f"{stats['mean_trials_scanned']:.1f} trials scanned/call"
+            )
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+from collections import deque
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import NamedTuple
+from typing import Sequence
+
+import optuna
+from optuna.distributions import BaseDistribution
+from optuna.samplers import BaseSampler
+from optuna.storages import BaseStorage
+from optuna.trial import FrozenTrial
+from optuna.trial import TrialState
+
+
+_PROFILED_METHODS = ("sample_relative", "sample_independent", "after_trial")
+_SYSTEM_ATTR_KEY = "profiled_sampler:stats"
+
+
+class SamplerCallRecord(NamedTuple):
+    """A profile of a single call to a sampler method.
+
+    Attributes:
+        method:
+            The name of the profiled method.
+        trial_number:
+            The number of the trial for which the method was called.
+        elapsed_time:
+            The wall time of the call in seconds.
+        n_storage_calls:
+            The number of storage method calls made during the call.
+        n_trials_scanned:
+            The number of trials fetched from the storage during the call.
+    """
+
+    method: str
+    trial_number: int
+    elapsed_time: float
+    n_storage_calls: int
+    n_trials_scanned: int
+
+
+class _CountingStorage:
+    """A storage proxy that counts the calls and the number of fetched trials."""
+
+    def __init__(self, storage: BaseStorage) -> None:
+        self._storage = storage
+        self.n_calls = 0
+        self.n_trials_scanned = 0
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._storage, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        def _counted(*args: Any, **kwargs: Any) -> Any:
+            self.n_calls += 1
+            result = attr(*args, **kwargs)
+            if isinstance(result, FrozenTrial):
+                self.n_trials_scanned += 1
+            elif isinstance(result, list) and name == "get_all_trials":
+                self.n_trials_scanned += len(result)
+            return result
+
+        return _counted
+
+
+class ProfiledSampler(BaseSampler):
+    """A sampler wrapper that measures the overhead of the wrapped sampler.
+
+    ``sample_relative``, ``sample_independent`` and ``after_trial`` of the wrapped sampler are
+    timed, and the storage calls made inside them are counted through a proxy of the study
+    storage. The profiles are kept in an in-memory ring buffer and, optionally, the per-trial
+    aggregation is stored in the trial system attrs.
+
+    Args:
+        sampler:
+            The sampler to profile, e.g., any ``optunahub.samplers.SimpleBaseSampler`` subclass.
+        buffer_size:
+            The maximum number of call records kept in memory. The oldest records are discarded
+            first.
+        record_in_storage:
+            If :obj:`True`, the per-trial aggregation of the profiles is stored in the trial
+            system attrs under the key ``"profiled_sampler:stats"`` when the trial finishes.
+    """
+
+    def __init__(
+        self,
+        sampler: BaseSampler,
+        *,
+        buffer_size: int = 10000,
+        record_in_storage: bool = False,
+    ) -> None:
+        self._sampler = sampler
+        self._records: deque[SamplerCallRecord] = deque(maxlen=buffer_size)
+        self._record_in_storage = record_in_storage
+        self._stats_by_trial_id: dict[int, dict[str, list[float]]] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def sampler(self) -> BaseSampler:
+        """The wrapped sampler."""
+        return self._sampler
+
+    @property
+    def records(self) -> list[SamplerCallRecord]:
+        """The profiles of the most recent calls in the order of the calls."""
+        with self._lock:
+            return list(self._records)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """Summarize the records kept in memory per profiled method.
+
+        Returns:
+            A dictionary mapping each profiled method to the number of calls, the total and mean
+            wall time in seconds, and the mean numbers of storage calls and scanned trials.
+        """
+        summary: dict[str, dict[str, float]] = {}
+        for method in _PROFILED_METHODS:
+            records = [r for r in self.records if r.method == method]
+            if len(records) == 0:
+                continue
+            total_time = sum(r.elapsed_time for r in records)
+            summary[method] = {
+                "n_calls": len(records),
+                "total_time": total_time,
+                "mean_time": total_time / len(records),
+                "mean_storage_calls": sum(r.n_storage_calls for r in records) / len(records),
+                "mean_trials_scanned": sum(r.n_trials_scanned for r in records) / len(records),
+            }
+        return summary
+
+    def _profile(
+        self,
+        method: str,
+        study: optuna.Study,
+        trial: FrozenTrial,
+        func: Callable[[optuna.Study], Any],
+    ) -> Any:
+        storage = _CountingStorage(study._storage)
+        # NOTE: The wrapped sampler receives a shallow copy of the study so that the storage
+        # calls of other threads are not counted. ``copy.copy`` is not used because it resets
+        # the thread-local trial cache of the study.
+        profiled_study = object.__new__(type(study))
+        profiled_study.__dict__.update(study.__dict__)
+        profiled_study._storage = storage  # type: ignore[assignment]
+        start = time.perf_counter()
+        try:
+            return func(profiled_study)
+        finally:
+            record = SamplerCallRecord(
+                method=method,
+                trial_number=trial.number,
+                elapsed_time=time.perf_counter() - start,
+                n_storage_calls=storage.n_calls,
+                n_trials_scanned=storage.n_trials_scanned,
+            )
+            with self._lock:
+                self._records.append(record)
+                if self._record_in_storage:
+                    stats = self._stats_by_trial_id.setdefault(trial._trial_id, {})
+                    total = stats.setdefault(method, [0, 0.0, 0, 0])
+                    total[0] += 1
+                    total[1] += record.elapsed_time
+                    total[2] += record.n_storage_calls
+                    total[3] += record.n_trials_scanned
+
+    def infer_relative_search_space(
+        self, study: optuna.Study, trial: FrozenTrial
+    ) -> dict[str, BaseDistribution]:
+        return self._sampler.infer_relative_search_space(study, trial)
+
+    def sample_relative(
+        self, study: optuna.Study, trial: FrozenTrial, search_space: dict[str, BaseDistribution]
+    ) -> dict[str, Any]:
+        return self._profile(
+            "sample_relative",
+            study,
+            trial,
+            lambda s: self._sampler.sample_relative(s, trial, search_space),
+        )
+
+    def sample_independent(
+        self,
+        study: optuna.Study,
+        trial: FrozenTrial,
+        param_name: str,
+        param_distribution: BaseDistribution,
+    ) -> Any:
+        return self._profile(
+            "sample_independent",
+            study,
+            trial,
+            lambda s: self._sampler.sample_independent(s, trial, param_name, param_distribution),
+        )
+
+    def before_trial(self, study: optuna.Study, trial: FrozenTrial) -> None:
+        self._sampler.before_trial(study, trial)
+
+    def after_trial(
+        self,
+        study: optuna.Study,
+        trial: FrozenTrial,
+        state: TrialState,
+        values: Sequence[float] | None,
+    ) -> None:
+        self._profile(
+            "after_trial",
+            study,
+            trial,
+            lambda s: self._sampler.after_trial(s, trial, state, values),
+        )
+        if not self._record_in_storage:
+            return
+        with self._lock:
+            stats = self._stats_by_trial_id.pop(trial._trial_id, {})
+        study._storage.set_trial_system_attr(
+            trial._trial_id,
+            _SYSTEM_ATTR_KEY,
+            {
+                method: dict(
+                    zip(
+                        ("n_calls", "elapsed_time", "n_storage_calls", "n_trials_scanned"),
+                        total,
+                    )
+                )
+                for method, total in stats.items()
+            },
+        )
+
+    def reseed_rng(self) -> None:
+        self._sampler.reseed_rng()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from typing import Any
+
+import optuna
+from optuna.distributions import BaseDistribution
+from optuna.distributions import FloatDistribution
+import optunahub
+import pytest
+
+
+module = optunahub.load_local_module(package="samplers/profiled_sampler", registry_root="package/")
+ProfiledSampler = module.ProfiledSampler
+DESampler = optunahub.load_local_module(
+    package="samplers/differential_evolution", registry_root="package/"
+).DESampler
+
+
+def objective(trial: optuna.Trial) -> float:
+    return trial.suggest_float("x", -5, 5) ** 2 + trial.suggest_float("y", -5, 5) ** 2
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_records(n_jobs: int) -> None:
+    sampler = ProfiledSampler(DESampler(seed=0))
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(objective, n_trials=30, n_jobs=n_jobs)
+
+    records = sampler.records
+    assert sum(r.method == "sample_relative" for r in records) == 30
+    assert sum(r.method == "after_trial" for r in records) == 30
+    assert all(r.elapsed_time >= 0.0 for r in records)
+    # DESampler stores the generation and the individual of each relative sample.
+    assert all(
+        r.n_storage_calls >= 2
+        for r in records
+        if r.method == "sample_relative" and r.trial_number > 0
+    )
+
+    summary = sampler.summary()
+    assert summary["sample_relative"]["n_calls"] == 30
+    assert summary["after_trial"]["n_calls"] == 30
+
+
+class _ScanningSampler(optunahub.samplers.SimpleBaseSampler):
+    def sample_relative(
+        self,
+        study: optuna.Study,
+        trial: optuna.trial.FrozenTrial,
+        search_space: dict[str, BaseDistribution],
+    ) -> dict[str, Any]:
+        study.get_trials(deepcopy=False)
+        return {}
+
+
+def test_trials_scanned() -> None:
+    sampler = ProfiledSampler(_ScanningSampler({"x": FloatDistribution(-5, 5)}))
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(objective, n_trials=10)
+    records = [r for r in sampler.records if r.method == "sample_relative"]
+    assert [r.n_storage_calls for r in records] == [1] * 10
+    # The running trial itself is also fetched.
+    assert [r.n_trials_scanned for r in records] == list(range(1, 11))
+
+
+def test_buffer_size() -> None:
+    sampler = ProfiledSampler(DESampler(seed=0), buffer_size=5)
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(objective, n_trials=10)
+    records = sampler.records
+    assert len(records) == 5
+    assert records[-1].trial_number == 9
+
+
+def test_record_in_storage() -> None:
+    search_space = {"x": FloatDistribution(-5, 5), "y": FloatDistribution(-5, 5)}
+    sampler = ProfiledSampler(DESampler(search_space, seed=0), record_in_storage=True)
+    study = optuna.create_study(sampler=sampler)
+    study.optimize(objective, n_trials=5)
+    for trial in study.trials:
+        stats = trial.system_attrs["profiled_sampler:stats"]
+        assert stats["sample_relative"]["n_calls"] == 1
+        assert stats["after_trial"]["n_calls"] == 1
+    assert sampler._stats_by_trial_id == {}
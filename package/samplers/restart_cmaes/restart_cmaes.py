@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+from collections import OrderedDict
 from collections.abc import Callable
 from collections.abc import Sequence
 import math
 import pickle
+import threading
 from typing import Any
 from typing import NamedTuple
 from typing import Union
@@ -31,6 +33,8 @@ _logger = logging.get_logger(__name__)
 _EPS = 1e-10
 # The value of system_attrs must be less than 2046 characters on RDBStorage.
 _SYSTEM_ATTR_MAX_LENGTH = 2045
+# The number of restarts whose states are kept in memory. The older restarts are not resumed.
+_N_RESTART_STATES = 2
 
 
 class _CmaEsAttrKeys(NamedTuple):
@@ -44,6 +48,21 @@ class _CmaEsAttrKeys(NamedTuple):
     large_n_eval: str
 
 
+class _TrialStates(NamedTuple):
+    attrs: dict[str, Any]
+    optimizer_bytes: bytes | None
+
+
+class _RestartState:
+    """The in-memory state of a restart, i.e., the optimizer stored by the latest trial and the
+    generations of the trials not told to the optimizer yet."""
+
+    def __init__(self) -> None:
+        self.optimizer_bytes: bytes | None = None
+        self.optimizer_trial_number = -1
+        self.trial_generations: dict[int, int] = {}
+
+
 class RestartCmaEsSampler(BaseSampler):
     def __init__(
         self,
@@ -58,6 +77,7 @@ class RestartCmaEsSampler(BaseSampler):
         popsize: int | None = None,
         inc_popsize: int = 2,
         store_optimizer_state_in_storage: bool = False,
+        checkpoint_interval: int | None = None,
     ) -> None:
         self._x0 = x0
         self._sigma0 = sigma0
@@ -70,8 +90,21 @@ class RestartCmaEsSampler(BaseSampler):
         self._initial_popsize = popsize
         self._inc_popsize = inc_popsize
         self._store_optimizer_state_in_storage = store_optimizer_state_in_storage
+        self._checkpoint_interval = checkpoint_interval
         if not self._store_optimizer_state_in_storage:
-            self._optimizer_states_by_trial: dict[int, dict[str, Any]] = {}
+            # The states of the running trials, which are committed when the trials complete.
+            self._running_trial_states: dict[int, _TrialStates] = {}
+            # The states of the latest completed trial, or None before any trial completes.
+            self._latest_trial_states: dict[str, Any] | None = None
+            self._latest_trial_number = -1
+            self._restart_states: OrderedDict[int, _RestartState] = OrderedDict()
+            self._states_lock = threading.Lock()
+
+        if checkpoint_interval is not None and checkpoint_interval < 1:
+            raise ValueError(
+                "checkpoint_interval={} is invalid. "
+                "Please specify a positive integer or None.".format(checkpoint_interval)
+            )
 
         if restart_strategy not in (
             "ipop",
@@ -148,8 +181,10 @@ class RestartCmaEsSampler(BaseSampler):
             if self._store_optimizer_state_in_storage:
                 source = latest_trial.system_attrs
             else:
-                latest_trial_id = latest_trial._trial_id
-                source = self._optimizer_states_by_trial.get(latest_trial_id, {})
+                if self._latest_trial_states is None:
+                    # No trial has completed in this process, e.g., the study is resumed.
+                    self._load_checkpoint(completed_trials)
+                source = self._latest_trial_states or {}
 
             attr_defaults = [
                 (self._attr_keys.popsize(), self._initial_popsize),
@@ -188,6 +223,8 @@ class RestartCmaEsSampler(BaseSampler):
         )
 
         optimizer_states: dict[str, Any] = {}
+        optimizer_bytes: bytes | None = None
+        checkpoint = False
 
         if len(solution_trials) >= popsize:
             solutions: list[tuple[np.ndarray, float]] = []
@@ -235,15 +272,17 @@ class RestartCmaEsSampler(BaseSampler):
                 )
 
             # Store optimizer.
-            optimizer_str = pickle.dumps(optimizer).hex()
-            optimizer_attrs = self._split_optimizer_str(optimizer_str, n_restarts)
-            for key in optimizer_attrs:
-                if self._store_optimizer_state_in_storage:
+            optimizer_bytes = pickle.dumps(optimizer)
+            checkpoint = (
+                self._checkpoint_interval is not None
+                and optimizer.generation % self._checkpoint_interval == 0
+            )
+            if self._store_optimizer_state_in_storage or checkpoint:
+                optimizer_attrs = self._split_optimizer_str(optimizer_bytes.hex(), n_restarts)
+                for key in optimizer_attrs:
                     study._storage.set_trial_system_attr(
                         trial._trial_id, key, optimizer_attrs[key]
                     )
-                else:
-                    optimizer_states[key] = optimizer_attrs[key]
 
         # Caution: optimizer should update its seed value.
         seed = self._cma_rng.rng.randint(1, 2**16) + trial.number
@@ -269,12 +308,14 @@ class RestartCmaEsSampler(BaseSampler):
             (self._attr_keys.large_n_eval, large_n_eval),
         ]
 
-        if self._store_optimizer_state_in_storage:
+        if self._store_optimizer_state_in_storage or checkpoint:
             for key, value in attrs:
                 study._storage.set_trial_system_attr(trial._trial_id, key, value)
-        else:
+        if not self._store_optimizer_state_in_storage:
             optimizer_states.update(attrs)
-            self._optimizer_states_by_trial[trial._trial_id] = optimizer_states
+            self._running_trial_states[trial._trial_id] = _TrialStates(
+                optimizer_states, optimizer_bytes
+            )
 
         external_values = trans.untransform(params)
 
@@ -340,15 +381,16 @@ class RestartCmaEsSampler(BaseSampler):
         n_restarts: int = 0,
     ) -> "CmaClass" | None:
         # Restore a previous CMA object.
+        if not self._store_optimizer_state_in_storage:
+            restart_state = self._restart_states.get(n_restarts)
+            if restart_state is None or restart_state.optimizer_bytes is None:
+                return None
+            return pickle.loads(restart_state.optimizer_bytes)
+
         for trial in reversed(completed_trials):
-            items = (
-                trial.system_attrs.items()
-                if self._store_optimizer_state_in_storage
-                else self._optimizer_states_by_trial.get(trial._trial_id, {}).items()
-            )
             optimizer_attrs = {
                 key: value
-                for key, value in items
+                for key, value in trial.system_attrs.items()
                 if key.startswith(self._attr_keys.optimizer(n_restarts))
             }
             if len(optimizer_attrs) == 0:
@@ -444,14 +486,77 @@ class RestartCmaEsSampler(BaseSampler):
         if self._store_optimizer_state_in_storage:
             return [t for t in trials if generation == t.system_attrs.get(generation_attr_key, -1)]
         else:
-            return [
-                t
-                for t in trials
-                if generation
-                == self._optimizer_states_by_trial.get(t._trial_id, {}).get(
-                    generation_attr_key, -1
-                )
+            restart_state = self._restart_states.get(n_restarts)
+            if restart_state is None:
+                return []
+            trial_generations = restart_state.trial_generations
+            return [t for t in trials if generation == trial_generations.get(t._trial_id, -1)]
+
+    def _get_restart_state(self, n_restarts: int) -> _RestartState:
+        restart_state = self._restart_states.get(n_restarts)
+        if restart_state is None:
+            restart_state = self._restart_states[n_restarts] = _RestartState()
+        self._restart_states.move_to_end(n_restarts)
+        while len(self._restart_states) > _N_RESTART_STATES:
+            self._restart_states.popitem(last=False)
+        return restart_state
+
+    def _commit_trial_states(self, trial: FrozenTrial, state: TrialState) -> None:
+        with self._states_lock:
+            trial_states = self._running_trial_states.pop(trial._trial_id, None)
+            if state != TrialState.COMPLETE:
+                return
+            # As with the storage, the states of the trial with the largest number are the latest
+            # even if the trials complete out of order.
+            if trial.number > self._latest_trial_number:
+                self._latest_trial_number = trial.number
+                # The states are empty if the trial is not sampled by CMA-ES.
+                self._latest_trial_states = {} if trial_states is None else trial_states.attrs
+            if trial_states is None:
+                return
+
+            n_restarts = trial_states.attrs[self._attr_keys.n_restarts()]
+            generation = trial_states.attrs[self._attr_keys.generation(n_restarts)]
+            restart_state = self._get_restart_state(n_restarts)
+            if (
+                trial_states.optimizer_bytes is not None
+                and trial.number > restart_state.optimizer_trial_number
+            ):
+                restart_state.optimizer_bytes = trial_states.optimizer_bytes
+                restart_state.optimizer_trial_number = trial.number
+                # The trials of the generations already told are no longer necessary.
+                restart_state.trial_generations = {
+                    t: g for t, g in restart_state.trial_generations.items() if g >= generation
+                }
+            restart_state.trial_generations[trial._trial_id] = generation
+
+    def _load_checkpoint(self, completed_trials: list[FrozenTrial]) -> None:
+        self._latest_trial_states = {}
+        for trial in reversed(completed_trials):
+            n_restarts_attr_key = self._attr_keys.n_restarts()
+            if n_restarts_attr_key not in trial.system_attrs:
+                continue
+
+            n_restarts = trial.system_attrs[n_restarts_attr_key]
+            keys = [
+                self._attr_keys.popsize(),
+                n_restarts_attr_key,
+                self._attr_keys.n_restarts_with_large,
+                self._attr_keys.poptype,
+                self._attr_keys.small_n_eval,
+                self._attr_keys.large_n_eval,
             ]
+            self._latest_trial_states = {key: trial.system_attrs[key] for key in keys}
+            optimizer_attrs = {
+                key: value
+                for key, value in trial.system_attrs.items()
+                if key.startswith(self._attr_keys.optimizer(n_restarts))
+            }
+            optimizer_str = self._concat_optimizer_attrs(optimizer_attrs, n_restarts)
+            restart_state = self._get_restart_state(n_restarts)
+            restart_state.optimizer_bytes = bytes.fromhex(optimizer_str)
+            restart_state.optimizer_trial_number = trial.number
+            return
 
     def before_trial(self, study: optuna.Study, trial: FrozenTrial) -> None:
         self._independent_sampler.before_trial(study, trial)
@@ -463,6 +568,8 @@ class RestartCmaEsSampler(BaseSampler):
         state: TrialState,
         values: Sequence[float] | None,
     ) -> None:
+        if not self._store_optimizer_state_in_storage:
+            self._commit_trial_states(trial, state)
         self._independent_sampler.after_trial(study, trial, state, values)
 
 
@@ -6,6 +6,8 @@ from typing import NamedTuple
 import numpy as np
 from optuna.distributions import BaseDistribution
 from optuna.distributions import CategoricalDistribution
+from optuna.distributions import FloatDistribution
+from optuna.distributions import IntDistribution
 from optuna.samplers._tpe.parzen_estimator import _ParzenEstimator
 from optuna.samplers._tpe.probability_distributions import _BatchedCategoricalDistributions
 from optuna.samplers._tpe.probability_distributions import _BatchedDiscreteTruncNormDistributions
@@ -28,44 +30,47 @@ class _CustomizableParzenEstimatorParameters(NamedTuple):
 
 def _bandwidth_hyperopt(
     mus: np.ndarray,
-    low: float,
-    high: float,
-    step: float | None,
+    low: np.ndarray,
+    high: np.ndarray,
+    step: np.ndarray,
 ) -> np.ndarray:
-    step_or_0 = step or 0
-    sorted_indices = np.argsort(mus)
-    sorted_mus_with_endpoints = np.empty(len(mus) + 2, dtype=float)
-    sorted_mus_with_endpoints[0] = low - step_or_0 / 2
-    sorted_mus_with_endpoints[1:-1] = mus[sorted_indices]
-    sorted_mus_with_endpoints[-1] = high + step_or_0 / 2
+    # NOTE: Each column of ``mus`` is a parameter and ``step`` is 0 for continuous parameters.
+    sorted_indices = np.argsort(mus, axis=0, kind="stable")
+    sorted_mus_with_endpoints = np.empty((len(mus) + 2, mus.shape[1]), dtype=float)
+    sorted_mus_with_endpoints[0] = low - step / 2
+    sorted_mus_with_endpoints[1:-1] = np.take_along_axis(mus, sorted_indices, axis=0)
+    sorted_mus_with_endpoints[-1] = high + step / 2
     sorted_sigmas = np.maximum(
         sorted_mus_with_endpoints[1:-1] - sorted_mus_with_endpoints[0:-2],
         sorted_mus_with_endpoints[2:] - sorted_mus_with_endpoints[1:-1],
     )
-    return sorted_sigmas[np.argsort(sorted_indices)]
+    sigmas = np.empty_like(sorted_sigmas)
+    np.put_along_axis(sigmas, sorted_indices, sorted_sigmas, axis=0)
+    return sigmas
 
 
 def _bandwidth_optuna(
     n_observations: int,
     consider_prior: bool,
-    domain_range: float,
+    domain_range: np.ndarray,
     dim: int,
 ) -> np.ndarray:
     SIGMA0_MAGNITUDE = 0.2
     sigma = SIGMA0_MAGNITUDE * max(n_observations, 1) ** (-1.0 / (dim + 4)) * domain_range
-    return np.full(shape=(n_observations + consider_prior,), fill_value=sigma)
+    return np.tile(sigma, (n_observations + consider_prior, 1))
 
 
 def _bandwidth_scott(mus: np.ndarray) -> np.ndarray:
-    std = np.std(mus, ddof=int(mus.size > 1))
-    IQR = np.subtract.reduce(np.percentile(mus, [75, 25]))
-    return np.full_like(mus, 1.059 * min(IQR / 1.34, std) * mus.size**-0.2)
+    n_mus = len(mus)
+    std = np.std(mus, axis=0, ddof=int(n_mus > 1))
+    IQR = np.subtract.reduce(np.percentile(mus, [75, 25], axis=0))
+    return np.tile(1.059 * np.minimum(IQR / 1.34, std) * n_mus**-0.2, (n_mus, 1))
 
 
 def _clip_bandwidth(
     sigmas: np.ndarray,
     n_observations: int,
-    domain_range: float,
+    domain_range: np.ndarray,
     consider_prior: bool,
     consider_magic_clip: bool,
     b_magic_exponent: float,
@@ -79,7 +84,7 @@ def _clip_bandwidth(
         )
         minsigma = bandwidth_factor * domain_range
     else:
-        minsigma = 1e-12
+        minsigma = np.full_like(domain_range, 1e-12)
 
     clipped_sigmas = np.asarray(np.clip(sigmas, minsigma, maxsigma))
     if consider_prior:
@@ -123,37 +128,70 @@ class _CustomizableParzenEstimator(_ParzenEstimator):
             assert parameters.prior_weight is not None
             weights = np.append(weights, [parameters.prior_weight])
         weights /= weights.sum()
+        numerical_distributions = self._calculate_numerical_distributions_at_once(
+            transformed_observations, parameters
+        )
         self._mixture_distribution = _MixtureOfProductDistribution(
             weights=weights,
             distributions=[
-                self._calculate_distributions(
-                    transformed_observations[:, i], param, search_space[param], parameters
+                (
+                    numerical_distributions[param]
+                    if param in numerical_distributions
+                    else self._calculate_categorical_distributions(
+                        transformed_observations[:, i], param, dist, parameters
+                    )
                 )
-                for i, param in enumerate(search_space)
+                for i, (param, dist) in enumerate(search_space.items())
             ],
         )
 
-    def _calculate_numerical_distributions(
+    def _calculate_numerical_distributions_at_once(
         self,
-        observations: np.ndarray,
-        low: float,
-        high: float,
-        step: float | None,
+        transformed_observations: np.ndarray,
         parameters: _CustomizableParzenEstimatorParameters,
-    ) -> _BatchedDistributions:
-        domain_range = high - low + (step or 0)
-        consider_prior = parameters.consider_prior or len(observations) == 0
+    ) -> dict[str, _BatchedDistributions]:
+        """Build the kernels of all the numerical parameters from the 2-D observation matrix."""
+        columns: list[int] = []
+        lows: list[float] = []
+        highs: list[float] = []
+        steps: list[float | None] = []
+        for i, dist in enumerate(self._search_space.values()):
+            if isinstance(dist, CategoricalDistribution):
+                continue
+            assert isinstance(dist, (FloatDistribution, IntDistribution))
+            low, high, step = dist.low, dist.high, dist.step
+            if dist.log:
+                # TODO(contramundum53): This is a hack and should be fixed.
+                if step is not None:
+                    low, high, step = low - step / 2, high + step / 2, None
+                low, high = np.log(low), np.log(high)
+            columns.append(i)
+            lows.append(low)
+            highs.append(high)
+            steps.append(step)
+
+        if len(columns) == 0:
+            return {}
+
+        observations = transformed_observations[:, columns]
+        n_observations = len(observations)
+        low = np.asarray(lows, dtype=float)
+        high = np.asarray(highs, dtype=float)
+        is_discrete = np.asarray([step is not None for step in steps])
+        step = np.asarray([step or 0 for step in steps], dtype=float)
+        domain_range = high - low + step
+        consider_prior = parameters.consider_prior or n_observations == 0
 
         if consider_prior:
-            mus = np.append(observations, [0.5 * (low + high)])
+            mus = np.vstack([observations, 0.5 * (low + high)])
         else:
-            mus = observations.copy()
+            mus = observations
 
         if parameters.bandwidth_strategy == "hyperopt":
             sigmas = _bandwidth_hyperopt(mus, low, high, step)
         elif parameters.bandwidth_strategy == "optuna":
             sigmas = _bandwidth_optuna(
-                n_observations=len(observations),
+                n_observations=n_observations,
                 consider_prior=consider_prior,
                 domain_range=domain_range,
                 dim=len(self._search_space),
@@ -165,7 +203,7 @@ class _CustomizableParzenEstimator(_ParzenEstimator):
 
         sigmas = _clip_bandwidth(
             sigmas=sigmas,
-            n_observations=len(observations),
+            n_observations=n_observations,
             domain_range=domain_range,
             consider_magic_clip=parameters.consider_magic_clip,
             consider_prior=consider_prior,
@@ -173,10 +211,17 @@ class _CustomizableParzenEstimator(_ParzenEstimator):
             min_bandwidth_factor=parameters.min_bandwidth_factor,
         )
 
-        if step is None:
-            return _BatchedTruncNormDistributions(mus, sigmas, low, high)
-        else:
-            return _BatchedDiscreteTruncNormDistributions(mus, sigmas, low, high, step)
+        params = list(self._search_space)
+        return {
+            params[i]: (
+                _BatchedDiscreteTruncNormDistributions(
+                    mus[:, j], sigmas[:, j], low[j], high[j], step[j]
+                )
+                if is_discrete[j]
+                else _BatchedTruncNormDistributions(mus[:, j], sigmas[:, j], low[j], high[j])
+            )
+            for j, i in enumerate(columns)
+        }
 
     def _calculate_categorical_distributions(
         self,
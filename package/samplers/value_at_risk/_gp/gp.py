@@ -6,10 +6,10 @@ x: (Possibly batched) parameter value(s) to evaluate with the shape of (..., len
 cov_fX_fX: Kernel matrix X = V[f(X)] with the shape of (len(trials), len(trials)).
 cov_fx_fX: Kernel matrix Cov[f(x), f(X)] with the shape of (..., len(trials)).
 cov_fx_fx: Kernel scalar value x = V[f(x)]. This value is constant for the Matern 5/2 kernel.
-cov_Y_Y_inv:
-    The inverse of the covariance matrix (V[f(X) + noise_var])^-1 with the shape of
-    (len(trials), len(trials)).
-cov_Y_Y_inv_Y: `cov_Y_Y_inv @ y` with the shape of (len(trials), ).
+cov_Y_Y_chol:
+    The lower Cholesky factor L of the covariance matrix V[f(X) + noise_var] = L @ L.T with the
+    shape of (len(trials), len(trials)).
+cov_Y_Y_inv_Y: `(V[f(X) + noise_var])^-1 @ y` with the shape of (len(trials), ).
 max_Y: The maximum of Y (Note that we transform the objective values such that it is maximized.)
 d2: The squared distance between two points.
 is_categorical:
@@ -32,11 +32,13 @@ from optuna.logging import get_logger
 if TYPE_CHECKING:
     from collections.abc import Callable
 
+    import scipy.linalg as sl
     import scipy.optimize as so
     import torch
 else:
     from optuna._imports import _LazyImport
 
+    sl = _LazyImport("scipy.linalg")
     so = _LazyImport("scipy.optimize")
     torch = _LazyImport("torch")
 
@@ -102,33 +104,49 @@ class GPRegressor:
         self._is_categorical = is_categorical
         self._X_train = X_train
         self._y_train = y_train
-        self._squared_X_diff = (X_train[..., None, :] - X_train[..., None, :, :]).square()
-        self._squared_X_diff[..., self._is_categorical] = (
-            self._squared_X_diff[..., self._is_categorical] > 0.0
-        ).type(torch.float64)
-        self._cov_Y_Y_inv: torch.Tensor | None = None
+        self._squared_X_diff_cache: torch.Tensor | None = None
+        self._cov_Y_Y_chol: torch.Tensor | None = None
         self._cov_Y_Y_inv_Y: torch.Tensor | None = None
         # TODO(nabenabe): Rename the attributes to private with `_`.
         self.inverse_squared_lengthscales = inverse_squared_lengthscales
         self.kernel_scale = kernel_scale
         self.noise_var = noise_var
+        # The number of times the regressor was conditioned on new observations without
+        # refitting the kernel parameters.
+        self.n_updates_since_refit = 0
 
     @property
     def length_scales(self) -> np.ndarray:
         return 1.0 / np.sqrt(self.inverse_squared_lengthscales.detach().numpy())
 
-    def _cache_matrix(self) -> None:
+    @property
+    def _squared_X_diff(self) -> torch.Tensor:
+        # NOTE: This tensor takes O(len(trials)**2 * len(params)) memory and is necessary only for
+        # the kernel parameter fitting, so it is not built when the fitting is skipped.
+        if self._squared_X_diff_cache is None:
+            X_train = self._X_train
+            squared_X_diff = (X_train[..., None, :] - X_train[..., None, :, :]).square()
+            squared_X_diff[..., self._is_categorical] = (
+                squared_X_diff[..., self._is_categorical] > 0.0
+            ).type(torch.float64)
+            self._squared_X_diff_cache = squared_X_diff
+        return self._squared_X_diff_cache
+
+    def _cache_matrix(self, cov_Y_Y_chol: np.ndarray | None = None) -> None:
         assert (
-            self._cov_Y_Y_inv is None and self._cov_Y_Y_inv_Y is None
+            self._cov_Y_Y_chol is None and self._cov_Y_Y_inv_Y is None
         ), "Cannot call cache_matrix more than once."
-        with torch.no_grad():
-            cov_Y_Y = self.kernel().detach().numpy()
+        if cov_Y_Y_chol is None:
+            with torch.no_grad():
+                cov_Y_Y = self.kernel().detach().numpy()
+
+            cov_Y_Y[np.diag_indices(self._X_train.shape[0])] += self.noise_var.item()
+            cov_Y_Y_chol = np.linalg.cholesky(cov_Y_Y)
 
-        cov_Y_Y[np.diag_indices(self._X_train.shape[0])] += self.noise_var.item()
-        cov_Y_Y_inv = np.linalg.inv(cov_Y_Y)
-        cov_Y_Y_inv_Y = cov_Y_Y_inv @ self._y_train.numpy()
-        # NOTE(nabenabe): Here we use NumPy to guarantee the reproducibility from the past.
-        self._cov_Y_Y_inv = torch.from_numpy(cov_Y_Y_inv)
+        # NOTE: The triangular solves are cheaper and numerically more stable than the explicit
+        # inverse, and the factor can be extended for new observations in O(len(trials)**2).
+        cov_Y_Y_inv_Y = sl.cho_solve((cov_Y_Y_chol, True), self._y_train.numpy())
+        self._cov_Y_Y_chol = torch.from_numpy(cov_Y_Y_chol)
         self._cov_Y_Y_inv_Y = torch.from_numpy(cov_Y_Y_inv_Y)
         self.inverse_squared_lengthscales = self.inverse_squared_lengthscales.detach()
         self.inverse_squared_lengthscales.grad = None
@@ -137,6 +155,55 @@ class GPRegressor:
         self.noise_var = self.noise_var.detach()
         self.noise_var.grad = None
 
+    def condition_on(self, X_train: torch.Tensor, y_train: torch.Tensor) -> GPRegressor:
+        """
+        Return the regressor conditioned on the new training dataset (X_train, y_train) with the
+        kernel parameters of this regressor, i.e., without refitting the kernel parameters.
+
+        If X_train is the training points of this regressor followed by k new points, the
+        Cholesky factor is extended blockwise as:
+            L_new = [[L, 0], [L21, L22]],
+        where L21.T = inv(L) @ cov_Y_Y[:n, n:] and L22 = cholesky(cov_Y_Y[n:, n:] - L21 @ L21.T).
+        This costs O(n**2 * k) flops instead of O((n + k)**3) flops for the refactorization.
+        Note that y_train may differ entirely, e.g., due to the re-standardization, because it
+        only requires the triangular solves.
+        """
+        assert self._cov_Y_Y_chol is not None, "Call cache_matrix before calling condition_on."
+        gpr = GPRegressor(
+            is_categorical=self._is_categorical,
+            X_train=X_train,
+            y_train=y_train,
+            inverse_squared_lengthscales=self.inverse_squared_lengthscales,
+            kernel_scale=self.kernel_scale,
+            noise_var=self.noise_var,
+        )
+        gpr.n_updates_since_refit = self.n_updates_since_refit + 1
+        n_old = self._X_train.shape[0]
+        if X_train.shape[0] < n_old or not torch.equal(X_train[:n_old], self._X_train):
+            gpr._cache_matrix()
+            return gpr
+
+        L11 = self._cov_Y_Y_chol.numpy()
+        X_new = X_train[n_old:]
+        with torch.no_grad():
+            cov_old_new = self.kernel(self._X_train, X_new).numpy()
+            cov_new_new = self.kernel(X_new, X_new).numpy()
+        cov_new_new[np.diag_indices(len(X_new))] += self.noise_var.item()
+        L21 = sl.solve_triangular(L11, cov_old_new, lower=True).T
+        L22 = np.linalg.cholesky(cov_new_new - L21 @ L21.T)
+        gpr._cache_matrix(np.block([[L11, np.zeros_like(L21.T)], [L21, L22]]))
+        return gpr
+
+    def _solve_cov_Y_Y_chol(self, cov_fx_fX: torch.Tensor) -> torch.Tensor:
+        # Compute inv(L) @ cov_fx_fX[..., i, :] for each i in a single triangular solve with the
+        # shape of (len(trials), -1) instead of broadcasting L over the batch dimensions.
+        assert self._cov_Y_Y_chol is not None
+        n_points = self._cov_Y_Y_chol.shape[0]
+        V = torch.linalg.solve_triangular(
+            self._cov_Y_Y_chol, cov_fx_fX.reshape(-1, n_points).T, upper=False
+        )
+        return V.T.reshape(cov_fx_fX.shape)
+
     def kernel(
         self, X1: torch.Tensor | None = None, X2: torch.Tensor | None = None
     ) -> torch.Tensor:
@@ -154,47 +221,71 @@ class GPRegressor:
         """
         if X1 is None:
             assert X2 is None
-            d2 = self._squared_X_diff
-        else:
-            if X2 is None:
-                X2 = self._X_train
-
-            d2 = (X1 - X2) ** 2 if X1.ndim == 1 else (X1[..., None, :] - X2[..., None, :, :]) ** 2
-            if self._is_categorical.any():
-                d2[..., self._is_categorical] = (d2[..., self._is_categorical] > 0.0).type(
-                    torch.float64
-                )
-        d2 = (d2 * self.inverse_squared_lengthscales).sum(dim=-1)
+            return self.kernel_from_squared_diff(self._squared_X_diff)
+        return self.kernel_from_squared_diff(self.squared_diff(X1, X2))
+
+    def squared_diff(self, X1: torch.Tensor, X2: torch.Tensor | None = None) -> torch.Tensor:
+        """
+        Return d2(X1, X2) in `kernel` with the shape of (..., n_A, n_B, len(params)), or with the
+        shape of (len(params), ) if X1 is one point. X2 defaults to the training points.
+
+        Since d2 does not depend on the kernel parameters, it can be shared among the regressors
+        with the same training points, e.g., the objective and the constraints.
+        """
+        if X2 is None:
+            X2 = self._X_train
+
+        d2 = (X1 - X2) ** 2 if X1.ndim == 1 else (X1[..., None, :] - X2[..., None, :, :]) ** 2
+        if self._is_categorical.any():
+            d2[..., self._is_categorical] = (d2[..., self._is_categorical] > 0.0).type(
+                torch.float64
+            )
+        return d2
+
+    def kernel_from_squared_diff(self, squared_X_diff: torch.Tensor) -> torch.Tensor:
+        d2 = (squared_X_diff * self.inverse_squared_lengthscales).sum(dim=-1)
         return Matern52Kernel.apply(d2) * self.kernel_scale  # type: ignore
 
-    def posterior(self, x: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    def posterior(
+        self, x: torch.Tensor, squared_X_diff: torch.Tensor | None = None
+    ) -> tuple[torch.Tensor, torch.Tensor]:
         """
         This method computes the posterior mean and variance given the points `x` where both mean
-        and variance tensors will have the shape of x.shape[:-1].
+        and variance tensors will have the shape of x.shape[:-1]. If `squared_X_diff`, i.e.,
+        `squared_diff(x)`, is given, it is used instead of recomputing it.
 
         The posterior mean and variance are computed as:
             mean = cov_fx_fX @ inv(cov_fX_fX + noise_var * I) @ y, and
             var = cov_fx_fx - cov_fx_fX @ inv(cov_fX_fX + noise_var * I) @ cov_fx_fX.T.
+        The latter is computed as cov_fx_fx - ||inv(L) @ cov_fx_fX.T||**2 where
+        L @ L.T = cov_fX_fX + noise_var * I.
 
         Please note that we clamp the variance to avoid negative values due to numerical errors.
         """
         assert (
-            self._cov_Y_Y_inv is not None and self._cov_Y_Y_inv_Y is not None
+            self._cov_Y_Y_chol is not None and self._cov_Y_Y_inv_Y is not None
         ), "Call cache_matrix before calling posterior."
-        cov_fx_fX = self.kernel(x)
+        if squared_X_diff is None:
+            squared_X_diff = self.squared_diff(x)
+        cov_fx_fX = self.kernel_from_squared_diff(squared_X_diff)
         cov_fx_fx = self.kernel_scale  # kernel(x, x) = kernel_scale
         mean = cov_fx_fX @ self._cov_Y_Y_inv_Y
-        var = cov_fx_fx - (cov_fx_fX * (cov_fx_fX @ self._cov_Y_Y_inv)).sum(dim=-1)
+        var = cov_fx_fx - self._solve_cov_Y_Y_chol(cov_fx_fX).square().sum(dim=-1)
         return mean, torch.clamp(var, min=0.0)
 
-    def joint_posterior(self, x: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor]:
+    def joint_posterior(
+        self, x: torch.Tensor, squared_X_diff: torch.Tensor | None = None
+    ) -> tuple[torch.Tensor, torch.Tensor]:
         assert (
-            self._cov_Y_Y_inv is not None and self._cov_Y_Y_inv_Y is not None
+            self._cov_Y_Y_chol is not None and self._cov_Y_Y_inv_Y is not None
         ), "Call cache_matrix before calling posterior."
-        cov_fx_fX = self.kernel(x)
+        if squared_X_diff is None:
+            squared_X_diff = self.squared_diff(x)
+        cov_fx_fX = self.kernel_from_squared_diff(squared_X_diff)
         cov_fx_fx = self.kernel(x, x)
         mean = cov_fx_fX @ self._cov_Y_Y_inv_Y
-        covar = cov_fx_fx - cov_fx_fX @ self._cov_Y_Y_inv @ cov_fx_fX.transpose(-1, -2)
+        V = self._solve_cov_Y_Y_chol(cov_fx_fX)
+        covar = cov_fx_fx - V @ V.transpose(-1, -2)
         return mean, covar
 
     def marginal_log_likelihood(self) -> torch.Tensor:  # Scalar
@@ -308,7 +399,25 @@ def fit_kernel_params(
     deterministic_objective: bool,
     gpr_cache: GPRegressor | None = None,
     gtol: float = 1e-2,
+    refit_interval: int = 1,
 ) -> GPRegressor:
+    """Fit the kernel parameters to (X, Y) starting from the parameters in ``gpr_cache``.
+
+    If ``refit_interval`` is larger than 1, the kernel parameters in ``gpr_cache`` are reused
+    without refitting, and the regressor is only conditioned on (X, Y) for ``refit_interval - 1``
+    calls between the fittings. See :meth:`GPRegressor.condition_on` for the cost.
+    """
+    if (
+        gpr_cache is not None
+        and gpr_cache.n_updates_since_refit + 1 < refit_interval
+        and len(gpr_cache.inverse_squared_lengthscales) == X.shape[1]
+    ):
+        try:
+            return gpr_cache.condition_on(torch.from_numpy(X), torch.from_numpy(Y))
+        except np.linalg.LinAlgError:
+            # Refit the kernel parameters if the covariance matrix is numerically singular.
+            pass
+
     default_kernel_params = torch.ones(X.shape[1] + 2, dtype=torch.float64)
     # TODO: Move this function into a method of `GPRegressor`
 
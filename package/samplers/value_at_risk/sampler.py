@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 from typing import TYPE_CHECKING
 
@@ -9,6 +10,7 @@ from optuna._experimental import warn_experimental_argument
 from optuna._gp import optim_mixed
 from optuna._gp import prior
 from optuna._gp import search_space as gp_search_space
+from optuna._gp.scipy_blas_thread_patch import single_blas_thread_if_scipy_v1_15_or_newer
 from optuna.samplers._base import _CONSTRAINTS_KEY
 from optuna.samplers._base import _INDEPENDENT_SAMPLING_WARNING_TEMPLATE
 from optuna.samplers._base import _process_constraints_after_trial
@@ -93,6 +95,16 @@ class RobustGPSampler(BaseSampler):
             The input noise standard deviations for each parameter. For example, when
             `{"x": 0.1, "y": 0.2}` is given, the sampler assumes that the input noise of `x` and
             `y` follows `N(0, 0.1**2)` and `N(0, 0.2**2)`, respectively.
+        kernel_params_refit_interval:
+            The interval of the kernel parameter fitting. If this is larger than 1, the kernel
+            parameters are fitted only once every ``kernel_params_refit_interval`` samplings, and
+            the Gaussian processes in between are conditioned on the new observations with the
+            last kernel parameters. This makes the sampling much faster for a large number of
+            trials at the expense of slightly outdated kernel parameters. Defaults to 1, i.e.,
+            the kernel parameters are fitted every time.
+        n_threads_for_constraints:
+            The number of threads used to fit the Gaussian processes of the constraints
+            concurrently. The constraints are fitted one by one if this is 1. Defaults to 1.
     """
 
     def __init__(
@@ -106,6 +118,8 @@ class RobustGPSampler(BaseSampler):
         warn_independent_sampling: bool = True,
         uniform_input_noise_rads: dict[str, float] | None = None,
         normal_input_noise_stdevs: dict[str, float] | None = None,
+        kernel_params_refit_interval: int = 1,
+        n_threads_for_constraints: int = 1,
     ) -> None:
         if uniform_input_noise_rads is None and normal_input_noise_stdevs is None:
             raise ValueError(
@@ -117,6 +131,16 @@ class RobustGPSampler(BaseSampler):
                 "Only one of `uniform_input_noise_rads` and `normal_input_noise_stdevs` "
                 "can be specified."
             )
+        if kernel_params_refit_interval < 1:
+            raise ValueError(
+                "`kernel_params_refit_interval` must be a positive integer, but got "
+                f"{kernel_params_refit_interval}."
+            )
+        if n_threads_for_constraints < 1:
+            raise ValueError(
+                "`n_threads_for_constraints` must be a positive integer, but got "
+                f"{n_threads_for_constraints}."
+            )
         self._uniform_input_noise_rads = uniform_input_noise_rads
         self._normal_input_noise_stdevs = normal_input_noise_stdevs
         self._rng = LazyRandomState(seed)
@@ -132,6 +156,8 @@ class RobustGPSampler(BaseSampler):
         self._deterministic = deterministic_objective
         self._constraints_func = constraints_func
         self._warn_independent_sampling = warn_independent_sampling
+        self._kernel_params_refit_interval = kernel_params_refit_interval
+        self._n_threads_for_constraints = n_threads_for_constraints
 
         if constraints_func is not None:
             warn_experimental_argument("constraints_func")
@@ -146,6 +172,9 @@ class RobustGPSampler(BaseSampler):
         self._feas_prob_confidence_level = 0.95
         self._n_input_noise_samples = 32
         self._n_qmc_samples = 128
+        # The rough upper bound of the memory in bytes used to evaluate the acquisition function
+        # for a batch of candidates. The candidates are evaluated by chunks within the budget.
+        self._acqf_memory_budget: int | None = 1 << 30
 
     def _log_independent_sampling(self, trial: FrozenTrial, param_name: str) -> None:
         msg = _INDEPENDENT_SAMPLING_WARNING_TEMPLATE.format(
@@ -198,24 +227,23 @@ class RobustGPSampler(BaseSampler):
         # NOTE(nabenabe): Flip the sign of constraints since they are always to be minimized.
         standardized_constraint_vals, means, stds = _standardize_values(-constraint_vals)
         if (
-            self._gprs_cache_list is not None
-            and len(self._gprs_cache_list[0].inverse_squared_lengthscales)
+            self._constraints_gprs_cache_list is not None
+            and len(self._constraints_gprs_cache_list[0].inverse_squared_lengthscales)
             != internal_search_space.dim
         ):
             # Clear cache if the search space changes.
             self._constraints_gprs_cache_list = None
 
         is_categorical = internal_search_space.is_categorical
-        constraints_gprs = []
-        constraints_threshold_list = []
         constraints_threshold_list = (-means / np.maximum(EPS, stds)).tolist()
-        for i, vals in enumerate(standardized_constraint_vals.T):
-            cache = (
-                self._constraints_gprs_cache_list[i]
-                if self._constraints_gprs_cache_list is not None
-                else None
-            )
-            gpr = gp.fit_kernel_params(
+        cache_list: list[gp.GPRegressor | None] = (
+            list(self._constraints_gprs_cache_list)
+            if self._constraints_gprs_cache_list is not None
+            else [None] * len(constraints_threshold_list)
+        )
+
+        def _fit(cache: gp.GPRegressor | None, vals: np.ndarray) -> gp.GPRegressor:
+            return gp.fit_kernel_params(
                 X=normalized_params,
                 Y=vals,
                 is_categorical=is_categorical,
@@ -223,8 +251,25 @@ class RobustGPSampler(BaseSampler):
                 minimum_noise=self._minimum_noise,
                 gpr_cache=cache,
                 deterministic_objective=self._deterministic,
+                refit_interval=self._kernel_params_refit_interval,
             )
-            constraints_gprs.append(gpr)
+
+        n_threads = min(self._n_threads_for_constraints, len(cache_list))
+        if n_threads <= 1:
+            constraints_gprs = [
+                _fit(cache, vals)
+                for cache, vals in zip(cache_list, standardized_constraint_vals.T)
+            ]
+        else:
+            # The GPs are independent of each other given the params, and most of the fitting
+            # time is spent in torch and BLAS, which release the GIL. The BLAS thread setting is
+            # changed once here because changing it in each thread concurrently is not
+            # thread-safe.
+            with single_blas_thread_if_scipy_v1_15_or_newer():
+                with ThreadPoolExecutor(max_workers=n_threads) as executor:
+                    constraints_gprs = list(
+                        executor.map(_fit, cache_list, standardized_constraint_vals.T)
+                    )
 
         self._constraints_gprs_cache_list = constraints_gprs
         return constraints_gprs, constraints_threshold_list
@@ -290,6 +335,7 @@ class RobustGPSampler(BaseSampler):
                 n_qmc_samples=self._n_qmc_samples,
                 qmc_seed=self._rng.rng.randint(1 << 30),
                 acqf_type=acqf_type,
+                memory_budget=self._acqf_memory_budget,
                 **noise_kwargs,
             )
         else:
@@ -304,6 +350,7 @@ class RobustGPSampler(BaseSampler):
                 n_qmc_samples=self._n_qmc_samples,
                 qmc_seed=self._rng.rng.randint(1 << 30),
                 acqf_type=acqf_type,
+                memory_budget=self._acqf_memory_budget,
                 **noise_kwargs,
             )
 
@@ -362,6 +409,7 @@ class RobustGPSampler(BaseSampler):
                 minimum_noise=self._minimum_noise,
                 gpr_cache=cache,
                 deterministic_objective=self._deterministic,
+                refit_interval=self._kernel_params_refit_interval,
             )
         ]
         self._gprs_cache_list = gprs_list
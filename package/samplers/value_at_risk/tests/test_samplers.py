@@ -13,6 +13,7 @@ from _pytest.fixtures import SubRequest
 from _pytest.mark.structures import MarkDecorator
 import numpy as np
 import optuna
+from optuna._gp import search_space as gp_search_space
 from optuna.distributions import BaseDistribution
 from optuna.distributions import CategoricalChoiceType
 from optuna.distributions import CategoricalDistribution
@@ -26,11 +27,15 @@ from optuna.trial import Trial
 from optuna.trial import TrialState
 import optunahub
 import pytest
+import torch
 
 
-RobustGPSampler = optunahub.load_local_module(
+value_at_risk = optunahub.load_local_module(
     package="samplers/value_at_risk", registry_root="package/"
-).RobustGPSampler
+)
+RobustGPSampler = value_at_risk.RobustGPSampler
+acqf = value_at_risk._gp.acqf
+gp = value_at_risk._gp.gp
 
 
 def get_gp_sampler(
@@ -827,3 +832,193 @@ def test_trial_relative_params(
         return -1
 
     study.optimize(objective, n_trials=11, n_jobs=n_jobs)
+
+
+def test_gpr_condition_on_new_observations() -> None:
+    rng = np.random.RandomState(0)
+    X = rng.random((20, 3))
+    y = rng.normal(size=20)
+    is_categorical = np.array([False, False, True])
+    X[:, 2] = rng.randint(3, size=20) / 2
+    kernel_params = dict(
+        is_categorical=torch.from_numpy(is_categorical),
+        inverse_squared_lengthscales=torch.tensor([1.0, 2.0, 0.5], dtype=torch.float64),
+        kernel_scale=torch.tensor(1.5, dtype=torch.float64),
+        noise_var=torch.tensor(1e-3, dtype=torch.float64),
+    )
+    gpr = gp.GPRegressor(
+        X_train=torch.from_numpy(X[:15]), y_train=torch.from_numpy(y[:15]), **kernel_params
+    )
+    gpr._cache_matrix()
+    expected = gp.GPRegressor(
+        X_train=torch.from_numpy(X), y_train=torch.from_numpy(y), **kernel_params
+    )
+    expected._cache_matrix()
+    x = torch.from_numpy(rng.random((4, 5, 3)))
+    # Both the extension of the training points and the arbitrary change of them are supported.
+    for X_train in [X, X[::-1].copy()]:
+        y_train = y if X_train is X else y[::-1].copy()
+        updated = gpr.condition_on(torch.from_numpy(X_train), torch.from_numpy(y_train))
+        assert updated.n_updates_since_refit == 1
+        for actual_posterior, expected_posterior in [
+            (updated.posterior(x), expected.posterior(x)),
+            (updated.joint_posterior(x), expected.joint_posterior(x)),
+        ]:
+            for actual, desired in zip(actual_posterior, expected_posterior):
+                assert torch.allclose(actual, desired)
+
+
+def test_kernel_params_refit_interval() -> None:
+    sampler = RobustGPSampler(
+        seed=0,
+        n_startup_trials=2,
+        uniform_input_noise_rads={"x": 0.1},
+        kernel_params_refit_interval=3,
+    )
+    sampler._n_preliminary_samples = 512
+    sampler._n_local_search = 3
+    study = optuna.create_study(sampler=sampler)
+    n_updates_since_refit = []
+    for _ in range(8):
+        trial = study.ask()
+        study.tell(trial, trial.suggest_float("x", -5, 5) ** 2)
+        if sampler._gprs_cache_list is not None:
+            n_updates_since_refit.append(sampler._gprs_cache_list[0].n_updates_since_refit)
+    assert n_updates_since_refit == [0, 1, 2, 0, 1, 2]
+
+    with pytest.raises(ValueError):
+        RobustGPSampler(uniform_input_noise_rads={"x": 0.1}, kernel_params_refit_interval=0)
+
+
+@pytest.mark.parametrize("confidence_level", [0.0, 0.3, 0.5, 0.95, 1.0])
+def test_quantile(confidence_level: float) -> None:
+    samples = torch.from_numpy(np.random.RandomState(0).normal(size=(3, 4, 33)))
+    assert torch.allclose(
+        acqf._quantile(samples, confidence_level),
+        torch.quantile(samples, confidence_level, dim=-1),
+    )
+
+
+@pytest.mark.parametrize("with_constraints", [False, True])
+def test_value_at_risk_chunked_evaluation(with_constraints: bool) -> None:
+    rng = np.random.RandomState(0)
+    search_space = {f"x{i}": FloatDistribution(0.0, 1.0) for i in range(2)}
+    gpr_list = []
+    for _ in range(2):
+        gpr = gp.GPRegressor(
+            is_categorical=torch.zeros(2, dtype=torch.bool),
+            X_train=torch.from_numpy(rng.random((10, 2))),
+            y_train=torch.from_numpy(rng.normal(size=10)),
+            inverse_squared_lengthscales=torch.ones(2, dtype=torch.float64),
+            kernel_scale=torch.tensor(1.0, dtype=torch.float64),
+            noise_var=torch.tensor(1e-2, dtype=torch.float64),
+        )
+        gpr._cache_matrix()
+        gpr_list.append(gpr)
+
+    def _create_acqf(memory_budget: int | None) -> Any:
+        kwargs: dict[str, Any] = dict(
+            gpr=gpr_list[0],
+            search_space=gp_search_space.SearchSpace(search_space),
+            n_input_noise_samples=8,
+            n_qmc_samples=16,
+            qmc_seed=0,
+            acqf_type="mean",
+            uniform_input_noise_rads=torch.tensor([0.1, 0.0], dtype=torch.float64),
+            memory_budget=memory_budget,
+        )
+        if not with_constraints:
+            return acqf.ValueAtRisk(confidence_level=0.95, **kwargs)
+        return acqf.ConstrainedLogValueAtRisk(
+            constraints_gpr_list=gpr_list[1:],
+            constraints_threshold_list=[0.0],
+            objective_confidence_level=0.95,
+            feas_prob_confidence_level=0.95,
+            **kwargs,
+        )
+
+    x = rng.random((50, 2))
+    expected = _create_acqf(memory_budget=None).eval_acqf_no_grad(x)
+    # The budget is smaller than the memory for a single candidate, so each is evaluated alone.
+    actual = _create_acqf(memory_budget=1).eval_acqf_no_grad(x)
+    assert actual.shape == (50,)
+    assert np.allclose(actual, expected)
+
+
+def test_constrained_value_at_risk_shares_squared_diff() -> None:
+    rng = np.random.RandomState(0)
+    X_train = torch.from_numpy(rng.random((10, 3)))
+    X_train[:, 2] = torch.from_numpy(rng.randint(3, size=10) / 2)
+    gpr_list = []
+    for _ in range(3):
+        gpr = gp.GPRegressor(
+            is_categorical=torch.tensor([False, False, True]),
+            X_train=X_train,
+            y_train=torch.from_numpy(rng.normal(size=10)),
+            inverse_squared_lengthscales=torch.from_numpy(rng.random(3) + 0.5),
+            kernel_scale=torch.tensor(1.0, dtype=torch.float64),
+            noise_var=torch.tensor(1e-2, dtype=torch.float64),
+        )
+        gpr._cache_matrix()
+        gpr_list.append(gpr)
+
+    constrained_acqf = acqf.ConstrainedLogValueAtRisk(
+        gpr=gpr_list[0],
+        search_space=gp_search_space.SearchSpace(
+            {
+                "x0": FloatDistribution(0.0, 1.0),
+                "x1": FloatDistribution(0.0, 1.0),
+                "c": CategoricalDistribution(["a", "b", "c"]),
+            }
+        ),
+        constraints_gpr_list=gpr_list[1:],
+        constraints_threshold_list=[0.0, 0.5],
+        objective_confidence_level=0.95,
+        feas_prob_confidence_level=0.95,
+        n_input_noise_samples=8,
+        n_qmc_samples=16,
+        qmc_seed=0,
+        acqf_type="mean",
+        uniform_input_noise_rads=torch.tensor([0.1, 0.05, 0.0], dtype=torch.float64),
+    )
+    assert constrained_acqf._share_training_points
+    assert constrained_acqf._log_prob_at_risk._share_training_points
+    x = rng.random((5, 3))
+    x[:, 2] = rng.randint(3, size=5) / 2
+    shared_vals = constrained_acqf.eval_acqf_no_grad(x)
+    shared_val, shared_grad = constrained_acqf.eval_acqf_with_grad(x[0])
+    constrained_acqf._share_training_points = False
+    constrained_acqf._log_prob_at_risk._share_training_points = False
+    assert np.allclose(shared_vals, constrained_acqf.eval_acqf_no_grad(x))
+    val, grad = constrained_acqf.eval_acqf_with_grad(x[0])
+    assert np.isclose(shared_val, val)
+    assert np.allclose(shared_grad, grad)
+
+
+def test_constraints_gprs_fitted_in_threads() -> None:
+    def objective(trial: optuna.Trial) -> float:
+        x = trial.suggest_float("x", 0, 1)
+        y = trial.suggest_float("y", 0, 1)
+        trial.set_user_attr("c", (x - y, x + y - 1.0, x * y - 0.2))
+        return x**2 + y
+
+    params_list = []
+    for n_threads in [1, 3]:
+        sampler = RobustGPSampler(
+            seed=0,
+            n_startup_trials=2,
+            constraints_func=lambda t: t.user_attrs["c"],
+            uniform_input_noise_rads={"x": 0.1},
+            n_threads_for_constraints=n_threads,
+        )
+        sampler._n_preliminary_samples = 512
+        sampler._n_local_search = 3
+        study = optuna.create_study(sampler=sampler)
+        study.optimize(objective, n_trials=5)
+        assert sampler._constraints_gprs_cache_list is not None
+        assert len(sampler._constraints_gprs_cache_list) == 3
+        params_list.append([t.params for t in study.trials])
+
+    assert params_list[0] == params_list[1]
+    with pytest.raises(ValueError):
+        RobustGPSampler(uniform_input_noise_rads={"x": 0.1}, n_threads_for_constraints=0)